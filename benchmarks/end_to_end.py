@@ -0,0 +1,158 @@
+"""Benchmark a full sync of the tap against a local mock of the Omnivore API.
+
+The mock API runs in a separate process, serving locations, tickets with embedded
+items, menus and reference collections with the configured volume and latency. The
+tap syncs it end to end, writing its messages nowhere, and the records, requests,
+response bytes and time of each stream are reported, along with the wall time,
+throughput and peak RSS of the run.
+
+Time is attributed to the stream of the next message written, which is close to the
+time spent requesting and processing its records while syncing sequentially.
+
+Usage: python -m benchmarks.end_to_end [--locations N] [--tickets N] [--items N]
+    [--menu-items N] [--latency MS] [--max-limit N] [--streams NAME ...]
+    [--config PATH]
+"""
+
+from __future__ import annotations
+
+import argparse
+import collections
+import json
+import multiprocessing
+import resource
+import sys
+import time
+
+import requests
+from singer_sdk import _singerlib as singer
+
+from benchmarks.mock_server import STATS_PATH, serve
+from tap_olo_omnivore.tap import TapOloOmnivore
+
+
+class MessageCounter:
+    """Counts the messages written by a tap instead of writing them."""
+
+    def __init__(self, tap: TapOloOmnivore) -> None:
+        self.tap = tap
+        self.records: collections.Counter = collections.Counter()
+        self.output_bytes: collections.Counter = collections.Counter()
+        self.seconds: collections.Counter = collections.Counter()
+        self.last_message = time.perf_counter()
+
+    def write_message(self, message: singer.Message) -> None:
+        now = time.perf_counter()
+        stream = getattr(message, "stream", None) or "(state)"
+        self.seconds[stream] += now - self.last_message
+        self.last_message = now
+        # Serialize the message as it would be written, as part of the cost.
+        self.output_bytes[stream] += len(self.tap.format_message(message)) + 1
+        if isinstance(message, singer.RecordMessage):
+            self.records[stream] += 1
+
+
+def select_streams(config: dict, names: list[str]) -> dict:
+    """Return a catalog selecting only the named streams."""
+    catalog = TapOloOmnivore(config=config, parse_env_config=False).catalog_dict
+    for entry in catalog["streams"]:
+        for metadata in entry["metadata"]:
+            if not metadata["breadcrumb"]:
+                metadata["metadata"]["selected"] = entry["tap_stream_id"] in names
+    return catalog
+
+
+def run(config: dict, catalog: dict | None) -> tuple[MessageCounter, float]:
+    """Sync the tap, returning the counts of its messages and the wall time."""
+    tap = TapOloOmnivore(config=config, catalog=catalog, parse_env_config=False)
+    counter = MessageCounter(tap)
+    tap.write_message = counter.write_message
+    start = counter.last_message = time.perf_counter()
+    tap.sync_all()
+    return counter, time.perf_counter() - start
+
+
+def report(tap: MessageCounter, stats: dict, elapsed: float) -> None:
+    streams = sorted(set(tap.records) | set(stats) - {"unknown"})
+    print(
+        f"{'stream':<32} {'records':>9} {'requests':>9} {'MB in':>8} "
+        f"{'seconds':>8} {'rec/s':>9}"
+    )
+    for stream in streams:
+        records = tap.records[stream]
+        counts = stats.get(stream, {"requests": 0, "bytes": 0})
+        seconds = tap.seconds[stream]
+        rate = records / seconds if seconds else 0
+        print(
+            f"{stream:<32} {records:>9} {counts['requests']:>9} "
+            f"{counts['bytes'] / 1e6:>8.2f} {seconds:>8.2f} {rate:>9.0f}"
+        )
+    records = sum(tap.records.values())
+    requests_made = sum(counts["requests"] for counts in stats.values())
+    received = sum(counts["bytes"] for counts in stats.values())
+    written = sum(tap.output_bytes.values())
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss *= 1 if sys.platform == "darwin" else 1024
+    print(
+        f"{'total':<32} {records:>9} {requests_made:>9} "
+        f"{received / 1e6:>8.2f} {elapsed:>8.2f} {records / elapsed:>9.0f}"
+    )
+    if stats.get("unknown"):
+        print(f"unrouted requests: {stats['unknown']['requests']}")
+    print(f"output:    {written / 1e6:.2f} MB")
+    print(f"peak RSS:  {peak_rss / 1e6:.0f} MB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--locations", type=int, default=2)
+    parser.add_argument("--tickets", type=int, default=200, help="per location")
+    parser.add_argument("--items", type=int, default=5, help="per ticket")
+    parser.add_argument("--menu-items", type=int, default=100, help="per location")
+    parser.add_argument("--latency", type=float, default=0, help="ms per request")
+    parser.add_argument("--max-limit", type=int, default=100, help="max page size")
+    parser.add_argument(
+        "--offline", type=int, default=0, help="locations listed as offline"
+    )
+    parser.add_argument(
+        "--broken", nargs="+", default=[], help="streams failing at the first location"
+    )
+    parser.add_argument("--streams", nargs="+", help="sync only these streams")
+    parser.add_argument("--config", help="a JSON file of extra tap settings")
+    args = parser.parse_args()
+
+    parent, child = multiprocessing.Pipe()
+    server = multiprocessing.Process(
+        target=serve,
+        args=(child,),
+        kwargs={
+            "locations": args.locations,
+            "tickets": args.tickets,
+            "items": args.items,
+            "menu_items": args.menu_items,
+            "latency": args.latency / 1000,
+            "max_limit": args.max_limit,
+            "offline": args.offline,
+            "broken": args.broken,
+        },
+        daemon=True,
+    )
+    server.start()
+    try:
+        base_url = parent.recv()
+        config = {"api_key": "benchmark", "base_url": base_url}
+        if args.config:
+            with open(args.config) as f:
+                config.update(json.load(f))
+        catalog = select_streams(config, args.streams) if args.streams else None
+        tap, elapsed = run(config, catalog)
+        stats = requests.get(base_url.rsplit("/", 1)[0] + STATS_PATH).json()
+    finally:
+        parent.send("stop")
+        server.join()
+    report(tap, stats, elapsed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Synthetic Omnivore payloads shaped like the real API responses."""
+
+from __future__ import annotations
+
+import json
+import random
+
+BASE_URL = "https://api.omnivore.io/1.0"
+
+
+def make_ticket_item(location_id: str, ticket_id: str, index: int) -> dict:
+    """Return a ticket item with embedded modifiers and discounts."""
+    item_id = str(index + 1)
+    href = f"{BASE_URL}/locations/{location_id}/tickets/{ticket_id}/items/{item_id}/"
+    return {
+        "id": item_id,
+        "name": f"Item {index}",
+        "comment": None,
+        "included_tax": 0,
+        "price": random.randint(100, 3000),
+        "quantity": random.randint(1, 4),
+        "seat": 1,
+        "sent": True,
+        "sent_at": 1700000000 + index,
+        "split": 1,
+        "_links": {
+            "self": {"href": href},
+            "menu_item": {"href": f"{BASE_URL}/locations/{location_id}/menu/items/{index}/"},
+            "modifiers": {"href": f"{href}modifiers/"},
+            "discounts": {"href": f"{href}discounts/"},
+        },
+        "_embedded": {
+            "modifiers": [
+                {
+                    "id": str(modifier),
+                    "name": f"Modifier {modifier}",
+                    "price": random.randint(0, 200),
+                    "quantity": 1,
+                    "comment": None,
+                    "_links": {
+                        "self": {"href": f"{href}modifiers/{modifier}/"},
+                        "menu_modifier": {
+                            "href": f"{BASE_URL}/locations/{location_id}/menu/modifiers/{modifier}/"
+                        },
+                    },
+                }
+                for modifier in range(2)
+            ],
+            "discounts": [],
+        },
+    }
+
+
+def make_ticket(location_id: str, index: int, items: int = 5) -> dict:
+    """Return a ticket with embedded items, payments and totals."""
+    ticket_id = str(1000 + index)
+    href = f"{BASE_URL}/locations/{location_id}/tickets/{ticket_id}/"
+    opened_at = 1700000000 + index * 60
+    return {
+        "id": ticket_id,
+        "auto_send": True,
+        "closed_at": opened_at + 1800,
+        "guest_count": 2,
+        "name": f"Ticket {index}",
+        "open": False,
+        "opened_at": opened_at,
+        "ticket_number": index,
+        "void": False,
+        "totals": {
+            "discounts": 0,
+            "due": 0,
+            "items": 2599,
+            "other_charges": 0,
+            "paid": 2899,
+            "service_charges": 0,
+            "sub_total": 2599,
+            "tax": 300,
+            "tips": 0,
+            "total": 2899,
+        },
+        "_links": {
+            "self": {"href": href},
+            "employee": {"href": f"{BASE_URL}/locations/{location_id}/employees/100/"},
+            "order_type": {"href": f"{BASE_URL}/locations/{location_id}/order_types/1/"},
+            "revenue_center": {
+                "href": f"{BASE_URL}/locations/{location_id}/revenue_centers/1/"
+            },
+            "items": {"href": f"{href}items/"},
+            "payments": {"href": f"{href}payments/"},
+        },
+        "_embedded": {
+            "items": [make_ticket_item(location_id, ticket_id, i) for i in range(items)],
+            "payments": [
+                {
+                    "id": "1",
+                    "amount": 2899,
+                    "change": 0,
+                    "comment": None,
+                    "full_name": None,
+                    "last4": "4242",
+                    "status": None,
+                    "tip": 0,
+                    "type": "card_not_present",
+                    "_links": {
+                        "self": {"href": f"{href}payments/1/"},
+                        "tender_type": {
+                            "href": f"{BASE_URL}/locations/{location_id}/tender_types/1/"
+                        },
+                    },
+                }
+            ],
+            "discounts": [],
+            "service_charges": [],
+            "voided_items": [],
+        },
+    }
+
+
+def make_ticket_page(
+    location_id: str = "L1",
+    tickets: int = 500,
+    start: int = 0,
+    next_href: str | None = None,
+) -> dict:
+    """Return a HAL+JSON page of tickets."""
+    links = {"self": {"href": f"{BASE_URL}/locations/{location_id}/tickets/"}}
+    if next_href:
+        links["next"] = {"href": next_href}
+    return {
+        "count": tickets,
+        "limit": tickets,
+        "_links": links,
+        "_embedded": {
+            "tickets": [make_ticket(location_id, start + i) for i in range(tickets)],
+        },
+    }
+
+
+def encode(document: dict) -> bytes:
+    """Encode a document as the API would send it."""
+    return json.dumps(document, separators=(",", ":")).encode()
@@ -0,0 +1,396 @@
+"""A local HAL+JSON mock of the Omnivore API endpoints used by the streams.
+
+Serves locations, tickets with embedded items and payments, menus with embedded
+price levels, option sets and categories, and small reference collections, paginated
+with ``limit``, ``start`` and ``_links.next`` like the real API. Ticket collections
+honor the ``gte`` and ``lt`` filters of ``where``.
+"""
+
+from __future__ import annotations
+
+import collections
+import json
+import random
+import re
+import threading
+import time
+import typing as t
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing.connection import Connection
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from benchmarks.fixtures import make_ticket
+
+# The routes served, by stream name, from the most to the least specific.
+ROUTES = [
+    ("locations", r"/locations"),
+    ("locations", r"/locations/(?P<location_id>[^/]+)"),
+    ("tickets", r"/locations/(?P<location_id>[^/]+)/tickets"),
+    ("tickets", r"/locations/(?P<location_id>[^/]+)/tickets/(?P<ticket_id>[^/]+)"),
+    (
+        "ticket_item_children",
+        r"/locations/(?P<location_id>[^/]+)/tickets/(?P<ticket_id>[^/]+)"
+        r"/(?P<collection>items|voided_items)/(?P<item_id>[^/]+)"
+        r"/(?P<child>modifiers|discounts)",
+    ),
+    (
+        "ticket_children",
+        r"/locations/(?P<location_id>[^/]+)/tickets/(?P<ticket_id>[^/]+)"
+        r"/(?P<collection>items|payments|discounts|service_charges|voided_items)",
+    ),
+    (
+        "menu",
+        r"/locations/(?P<location_id>[^/]+)/menu"
+        r"/(?P<collection>items|modifiers|modifier_groups|categories)",
+    ),
+    (
+        "menu_children",
+        r"/locations/(?P<location_id>[^/]+)/menu"
+        r"/(?P<collection>items|modifiers|modifier_groups)/(?P<parent_id>[^/]+)"
+        r"/(?P<child>price_levels|option_sets|categories|modifiers)",
+    ),
+    (
+        "reference",
+        r"/locations/(?P<location_id>[^/]+)/(?P<collection>"
+        r"discounts|employees|order_types|revenue_centers|tables|tender_types|"
+        r"void_types)",
+    ),
+]
+
+# The path answering the counters of the server, which is not counted itself.
+STATS_PATH = "/_stats"
+
+# The collection embedded by menu records for each of their child endpoints.
+MENU_CHILDREN = {
+    "price_levels": "price_levels",
+    "option_sets": "option_sets",
+    "categories": "menu_categories",
+    "modifiers": "modifiers",
+}
+
+# The stream names of the menu collections.
+MENU_STREAMS = {
+    "items": "menu_items",
+    "modifiers": "menu_modifiers",
+    "modifier_groups": "menu_modifier_groups",
+    "categories": "menu_categories",
+}
+
+
+class MockOmnivore:
+    """A mock Omnivore API, served on a local port from a background thread.
+
+    Data is generated deterministically when the server starts. Requests and response bytes are
+    counted by stream name, from the route each request matched. The last `offline` locations
+    are listed as offline, and their other endpoints answer 503. The endpoints of the `broken`
+    streams answer 503 at the first location only, like an endpoint a POS does not support.
+
+    Usage:
+        with MockOmnivore(locations=2, tickets=100) as server:
+            config = {"api_key": "x", "base_url": server.base_url}
+    """
+
+    def __init__(
+        self,
+        *,
+        locations: int = 2,
+        tickets: int = 200,
+        items: int = 5,
+        menu_items: int = 100,
+        latency: float = 0.0,
+        max_limit: int = 100,
+        offline: int = 0,
+        broken: t.Collection[str] = (),
+        seed: int = 0,
+    ) -> None:
+        self.locations = locations
+        self.tickets = tickets
+        self.items = items
+        self.menu_items = menu_items
+        self.latency = latency
+        self.max_limit = max_limit
+        self.offline = set(self.location_ids()[locations - offline :]) if offline else set()
+        self.broken = frozenset(broken)
+        self.seed = seed
+        self.requests: collections.Counter = collections.Counter()
+        self.bytes: collections.Counter = collections.Counter()
+        self._lock = threading.Lock()
+        self._tickets: dict[str, list[dict]] = {}
+        self._menus: dict[str, dict[str, list[dict]]] = {}
+        self._routes = [(name, re.compile(f"{p}/?")) for name, p in ROUTES]
+        self._server: ThreadingHTTPServer | None = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        """Return the base URL of the API, to be set as `base_url`."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/1.0"
+
+    def start(self) -> MockOmnivore:
+        """Generate the data, then start serving in a background thread."""
+        self._generate()
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        server.daemon_threads = True
+        server.mock = self
+        self._server = server
+        self._thread = threading.Thread(target=server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def __enter__(self) -> MockOmnivore:
+        return self.start()
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.stop()
+
+    def handle(self, path: str, query: dict[str, str]) -> tuple[str, int, dict]:
+        """Return the stream name, status and document answering a request."""
+        path = path.removeprefix("/1.0")
+        for name, pattern in self._routes:
+            match = pattern.fullmatch(path)
+            if match:
+                location_id = match.groupdict().get("location_id")
+                if name != "locations" and location_id in self.offline:
+                    return name, HTTPStatus.SERVICE_UNAVAILABLE, {"error": "Location is offline"}
+                stream, status, document = getattr(self, f"_route_{name}")(
+                    path, query, **match.groupdict()
+                )
+                if stream in self.broken and location_id == "L1":
+                    return stream, HTTPStatus.SERVICE_UNAVAILABLE, {"error": "Not supported"}
+                return stream, status, document
+        return "unknown", HTTPStatus.NOT_FOUND, {"error": f"No route for {path}"}
+
+    def record(self, stream: str, size: int) -> None:
+        """Count a request of a stream and the size of its response."""
+        with self._lock:
+            self.requests[stream] += 1
+            self.bytes[stream] += size
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """Return the requests and response bytes counted, by stream name."""
+        with self._lock:
+            return {
+                stream: {"requests": count, "bytes": self.bytes[stream]}
+                for stream, count in self.requests.items()
+            }
+
+    # Data
+
+    def location_ids(self) -> list[str]:
+        return [f"L{index + 1}" for index in range(self.locations)]
+
+    def location(self, location_id: str) -> dict:
+        if location_id in self.offline:
+            return {
+                **self._location(location_id),
+                "status": "offline",
+                "health": {"healthy": False, "tickets": {"status": "error"}},
+            }
+        return self._location(location_id)
+
+    def _location(self, location_id: str) -> dict:
+        return {
+            "id": location_id,
+            "name": f"Location {location_id}",
+            "display_name": f"Location {location_id}",
+            "status": "online",
+            "pos_type": "mock",
+            "timezone": "America/New_York",
+            "health": {"healthy": True, "tickets": {"status": "ok"}},
+        }
+
+    def _generate(self) -> None:
+        """Generate the data of every location, so that requests only encode it."""
+        for location_id in self.location_ids():
+            random.seed(f"{self.seed}-{location_id}")
+            self._tickets[location_id] = [
+                make_ticket(location_id, i, self.items) for i in range(self.tickets)
+            ]
+            self._menus[location_id] = self._generate_menu(location_id)
+
+    def _generate_menu(self, location_id: str) -> dict[str, list[dict]]:
+        rng = random.Random(f"{self.seed}-{location_id}-menu")
+        categories = [
+            {"id": str(i), "name": f"Category {i}", "level": 0, "pos_id": str(i)}
+            for i in range(max(1, self.menu_items // 20))
+        ]
+
+        def children(count: int) -> dict:
+            return {
+                "price_levels": [
+                    {
+                        "id": str(level),
+                        "name": f"Level {level}",
+                        "price_per_unit": rng.randint(100, 3000),
+                        "barcodes": [],
+                    }
+                    for level in range(2)
+                ],
+                "option_sets": [],
+                "menu_categories": rng.sample(categories, min(count, len(categories))),
+            }
+
+        def menu_record(prefix: str, index: int) -> dict:
+            return {
+                "id": f"{prefix}{index}",
+                "name": f"{prefix} {index}",
+                "pos_id": str(index),
+                "open": False,
+                "in_stock": True,
+                "price_per_unit": rng.randint(100, 3000),
+                "_embedded": children(1),
+            }
+
+        items = [menu_record("I", i) for i in range(self.menu_items)]
+        modifiers = [menu_record("M", i) for i in range(self.menu_items)]
+        groups = [
+            {
+                "id": f"G{i}",
+                "name": f"Group {i}",
+                "pos_id": str(i),
+                "_embedded": {"modifiers": modifiers[i * 5 : i * 5 + 5]},
+            }
+            for i in range(max(1, self.menu_items // 5))
+        ]
+        return {
+            "items": items,
+            "modifiers": modifiers,
+            "modifier_groups": groups,
+            "categories": categories,
+        }
+
+    # Routes
+
+    def _route_locations(self, path, query, location_id=None):
+        if location_id is not None:
+            if location_id not in self.location_ids():
+                return "locations", HTTPStatus.NOT_FOUND, {"error": "Not found"}
+            return "locations", HTTPStatus.OK, self.location(location_id)
+        records = [self.location(i) for i in self.location_ids()]
+        return "locations", HTTPStatus.OK, self._page(path, query, "locations", records)
+
+    def _route_tickets(self, path, query, location_id, ticket_id=None):
+        tickets = self._tickets.get(location_id, [])
+        if ticket_id is not None:
+            ticket = next((r for r in tickets if r["id"] == ticket_id), None)
+            if ticket is None:
+                return "tickets", HTTPStatus.NOT_FOUND, {"error": "Not found"}
+            return "tickets", HTTPStatus.OK, ticket
+        records = [r for r in tickets if _matches(r, query.get("where", ""))]
+        return "tickets", HTTPStatus.OK, self._page(path, query, "tickets", records)
+
+    def _route_ticket_children(self, path, query, location_id, ticket_id, collection):
+        ticket = next(
+            (r for r in self._tickets.get(location_id, []) if r["id"] == ticket_id), {}
+        )
+        records = ticket.get("_embedded", {}).get(collection, [])
+        if collection == "voided_items":
+            stream = "voided_ticket_items"
+        else:
+            stream = f"ticket_{collection}"
+        return stream, HTTPStatus.OK, self._page(path, query, collection, records)
+
+    def _route_ticket_item_children(
+        self, path, query, location_id, ticket_id, collection, item_id, child
+    ):
+        ticket = next(
+            (r for r in self._tickets.get(location_id, []) if r["id"] == ticket_id), {}
+        )
+        items = ticket.get("_embedded", {}).get(collection, [])
+        item = next((r for r in items if r["id"] == item_id), {})
+        records = item.get("_embedded", {}).get(child, [])
+        prefix = "voided_ticket_item" if collection == "voided_items" else "ticket_item"
+        stream = f"{prefix}_{child}"
+        return stream, HTTPStatus.OK, self._page(path, query, child, records)
+
+    def _route_menu(self, path, query, location_id, collection):
+        records = self._menus.get(location_id, {}).get(collection, [])
+        document = self._page(path, query, collection, records)
+        return MENU_STREAMS[collection], HTTPStatus.OK, document
+
+    def _route_menu_children(self, path, query, location_id, collection, parent_id, child):
+        parents = self._menus.get(location_id, {}).get(collection, [])
+        parent = next((r for r in parents if r["id"] == parent_id), {})
+        key = MENU_CHILDREN[child]
+        records = parent.get("_embedded", {}).get(key, [])
+        stream = f"{MENU_STREAMS[collection][:-1]}_{child}"
+        return stream, HTTPStatus.OK, self._page(path, query, key, records)
+
+    def _route_reference(self, path, query, location_id, collection):
+        records = [{"id": str(i), "name": f"{collection} {i}"} for i in range(5)]
+        return collection, HTTPStatus.OK, self._page(path, query, collection, records)
+
+    def _page(self, path: str, query: dict, key: str, records: list[dict]) -> dict:
+        """Return a HAL page of records, linking to the next page if any."""
+        limit = min(int(query.get("limit", self.max_limit)), self.max_limit)
+        start = int(query.get("start", 0))
+        links = {"self": {"href": f"{self.base_url}{path}"}}
+        if start + limit < len(records):
+            next_query = {**query, "limit": limit, "start": start + limit}
+            links["next"] = {"href": f"{self.base_url}{path}?{urlencode(next_query)}"}
+        return {
+            "count": len(records[start : start + limit]),
+            "limit": limit,
+            "_links": links,
+            "_embedded": {key: records[start : start + limit]},
+        }
+
+
+def serve(connection: Connection, **options: t.Any) -> None:
+    """Serve a mock API until told to stop, sending its base URL through `connection`.
+
+    Meant to be the target of a separate process, so that generating and encoding the
+    data does not weigh on the measurements of the tap.
+    """
+    with MockOmnivore(**options) as mock:
+        connection.send(mock.base_url)
+        connection.recv()
+
+
+def _matches(record: dict, where: str) -> bool:
+    """Return whether a record matches the `gte` and `lt` terms of a filter."""
+    for op, field, value in re.findall(r"(gte|lt)\((\w+),(-?\d+)\)", where):
+        actual = record.get(field)
+        if actual is None:
+            return False
+        if op == "gte" and actual < int(value):
+            return False
+        if op == "lt" and actual >= int(value):
+            return False
+    return True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:  # noqa: N802
+        mock: MockOmnivore = self.server.mock
+        url = urlsplit(self.path)
+        if url.path == STATS_PATH:
+            status = HTTPStatus.OK
+            body = json.dumps(mock.stats()).encode()
+        else:
+            query = dict(parse_qsl(url.query))
+            stream, status, document = mock.handle(url.path, query)
+            body = json.dumps(document, separators=(",", ":")).encode()
+            if mock.latency:
+                time.sleep(mock.latency)
+            mock.record(stream, len(body))
+        self.send_response(status)
+        self.send_header("Content-Type", "application/hal+json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: t.Any) -> None:  # noqa: A002
+        pass
@@ -0,0 +1,83 @@
+"""Benchmark decoding a multi-megabyte ticket page.
+
+Compares decoding the page once per consumer (the paginator and the stream each
+calling ``response.json()``) against the shared decoded document, then compares
+the installed JSON backends.
+
+Usage: python -m benchmarks.parse_response [--tickets N] [--repeat N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import decimal
+import importlib.util
+import time
+
+import requests
+
+from benchmarks.fixtures import encode, make_ticket_page
+from tap_olo_omnivore.decoding import JSON_DECODERS, get_decoder
+from tap_olo_omnivore.pagination import CustomHATEOASPaginator
+from tap_olo_omnivore.tap import TapOloOmnivore
+
+
+def make_response(body: bytes) -> requests.Response:
+    response = requests.Response()
+    response.status_code = 200
+    response._content = body
+    response.encoding = "utf-8"
+    return response
+
+
+def decode_twice(body: bytes) -> None:
+    response = make_response(body)
+    response.json()
+    response.json(parse_float=decimal.Decimal)["_embedded"]["tickets"]
+
+
+def decode_once(body: bytes, stream) -> None:
+    response = make_response(body)
+    CustomHATEOASPaginator().get_next_url(response)
+    for _ in stream.parse_response(response):
+        pass
+
+
+def timeit(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tickets", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    body = encode(
+        make_ticket_page(tickets=args.tickets, next_href="https://example.com/next")
+    )
+    tap = TapOloOmnivore(config={"api_key": "x"}, parse_env_config=False)
+    stream = tap.streams["tickets"]
+
+    before = timeit(lambda: decode_twice(body), args.repeat)
+    after = timeit(lambda: decode_once(body, stream), args.repeat)
+    print(f"page size:      {len(body) / 1e6:.2f} MB ({args.tickets} tickets)")
+    print(f"decode twice:   {before * 1000:.1f} ms")
+    print(f"decode once:    {after * 1000:.1f} ms")
+    print(f"saving:         {(1 - after / before) * 100:.0f}%")
+
+    for name in JSON_DECODERS[1:]:
+        if name != "stdlib" and importlib.util.find_spec(name) is None:
+            continue
+        decode = get_decoder(name)
+        elapsed = timeit(lambda: decode(body), args.repeat)  # noqa: B023
+        print(f"{name + ':':<15} {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Benchmark the startup time of the tap CLI.
+
+Runs each command in a fresh interpreter, as the orchestrator does, and reports the
+best and median wall times: importing the tap, `--about`, `--discover`, and loading
+the streams of a catalog selecting a single stream, as a small selective sync does
+before its first request.
+
+Usage: python -m benchmarks.startup [--repeat N] [--stream NAME]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+CLI = "from tap_olo_omnivore.tap import TapOloOmnivore; TapOloOmnivore.cli()"
+
+LOAD_CATALOG = """
+import json, sys
+from tap_olo_omnivore.tap import TapOloOmnivore
+tap = TapOloOmnivore(
+    config={"api_key": "x"},
+    catalog=json.load(open(sys.argv[1])),
+    parse_env_config=False,
+)
+tap.streams
+"""
+
+
+def time_command(args: list[str], repeat: int) -> list[float]:
+    """Return the wall times of running a command `repeat` times."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            args, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def single_stream_catalog(directory: Path, config: Path, stream: str) -> Path:
+    """Write a catalog selecting only `stream`, from the discovered catalog."""
+    discovered = subprocess.run(
+        [sys.executable, "-c", CLI, "--config", str(config), "--discover"],
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    ).stdout
+    catalog = json.loads(discovered)
+    for entry in catalog["streams"]:
+        for metadata in entry["metadata"]:
+            if not metadata["breadcrumb"]:
+                metadata["metadata"]["selected"] = entry["tap_stream_id"] == stream
+    path = directory / "catalog.json"
+    path.write_text(json.dumps(catalog))
+    return path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--stream", default="employees")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        config = Path(directory) / "config.json"
+        config.write_text(json.dumps({"api_key": "x"}))
+        catalog = single_stream_catalog(Path(directory), config, args.stream)
+        commands = {
+            "import": [sys.executable, "-c", "import tap_olo_omnivore.tap"],
+            "--about": [sys.executable, "-c", CLI, "--about"],
+            "--discover": [
+                sys.executable,
+                "-c",
+                CLI,
+                "--config",
+                str(config),
+                "--discover",
+            ],
+            f"load {args.stream}": [
+                sys.executable,
+                "-c",
+                LOAD_CATALOG,
+                str(catalog),
+            ],
+        }
+        for label, command in commands.items():
+            times = time_command(command, args.repeat)
+            print(
+                f"{label:<20} best {min(times) * 1000:6.0f} ms, "
+                f"median {statistics.median(times) * 1000:6.0f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Benchmark the peak memory of parsing a large ticket page.
+
+Compares decoding the whole page before yielding its records against parsing the
+records one at a time with ``streaming_parse``, while records are consumed one by
+one as the tap does. The page is served as a response body which is not read yet, as
+when requested with ``stream=True``: the peak includes the body read by each mode,
+which ``streaming_parse`` reads ahead to a spooled file.
+
+Usage: python -m benchmarks.streaming [--tickets N] [--repeat N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import time
+import tracemalloc
+
+import requests
+import urllib3
+
+from benchmarks.fixtures import encode, make_ticket_page
+from tap_olo_omnivore.streaming import read_body
+from tap_olo_omnivore.tap import TapOloOmnivore
+
+
+def make_response(body: bytes) -> requests.Response:
+    """Return a response whose body is left to be read, as with stream=True."""
+    response = requests.Response()
+    response.status_code = 200
+    response.raw = urllib3.HTTPResponse(body=io.BytesIO(body), preload_content=False)
+    response.encoding = "utf-8"
+    return response
+
+
+def consume(stream, body: bytes) -> int:
+    """Parse a page as the tap does, returning the number of records."""
+    response = make_response(body)
+    if stream.stream_bodies:
+        response._content = False
+        read_body(response)
+    records = sum(1 for _ in stream.parse_response(response))
+    stream.get_new_paginator().get_next_url(response)
+    return records
+
+
+def measure(stream, body: bytes, repeat: int) -> tuple[float, float, int]:
+    """Return the peak memory, body included, the best time and the record count."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        records = consume(stream, body)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    consume(stream, body)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, best, records
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tickets", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    body = encode(
+        make_ticket_page(tickets=args.tickets, next_href="https://example.com/next")
+    )
+    print(f"page size:      {len(body) / 1e6:.2f} MB ({args.tickets} tickets)")
+    for streaming in (False, True):
+        tap = TapOloOmnivore(
+            config={"api_key": "x", "streaming_parse": streaming},
+            parse_env_config=False,
+        )
+        peak, elapsed, records = measure(tap.streams["tickets"], body, args.repeat)
+        label = "streaming:" if streaming else "decode page:"
+        print(
+            f"{label:<15} peak {peak / 1e6:.2f} MB, {elapsed * 1000:.0f} ms, "
+            f"{records} records"
+        )
+
+
+if __name__ == "__main__":
+    main()
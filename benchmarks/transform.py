@@ -0,0 +1,65 @@
+"""Benchmark record transformation throughput.
+
+Compares the previous post-processing (link extraction through ``urlparse`` and
+``flatten_nested_objects``) with the compiled ``RecordTransformer``.
+
+Usage: python -m benchmarks.transform [--records N] [--repeat N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import time
+
+from benchmarks.fixtures import make_ticket
+from tap_olo_omnivore.tap import TapOloOmnivore
+from tap_olo_omnivore.transform import extract_id_from_href, flatten_nested_objects
+
+
+def legacy_transform(row: dict) -> dict:
+    for key, link_obj in row.get("_links", {}).items():
+        if key == "self" or key.endswith("s"):
+            continue
+        if isinstance(link_obj, dict) and "href" in link_obj:
+            row[f"{key}_id"] = extract_id_from_href(link_obj["href"])
+    return flatten_nested_objects(row)
+
+
+def throughput(func, rows: list[dict], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        batch = copy.deepcopy(rows)
+        start = time.perf_counter()
+        for row in batch:
+            func(row)
+        best = min(best, time.perf_counter() - start)
+    return len(rows) / best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    tap = TapOloOmnivore(config={"api_key": "x"}, parse_env_config=False)
+    rows = [make_ticket("L1", i) for i in range(args.records)]
+    transformer = tap.streams["tickets"].transformer
+    # The embedded payload is kept for the child streams but is not flattened.
+    item_rows = [item for row in rows for item in row["_embedded"]["items"]]
+    item_transformer = tap.streams["ticket_items"].transformer
+
+    for name, sample, compiled in (
+        ("tickets", rows, transformer),
+        ("ticket_items", item_rows, item_transformer),
+    ):
+        before = throughput(legacy_transform, sample, args.repeat)
+        after = throughput(compiled.transform, sample, args.repeat)
+        print(f"{name}:")
+        print(f"  legacy:   {before:,.0f} records/s")
+        print(f"  compiled: {after:,.0f} records/s ({after / before:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
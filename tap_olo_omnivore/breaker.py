@@ -0,0 +1,160 @@
+"""Circuit breakers skipping the endpoints which keep failing at a location."""
+
+from __future__ import annotations
+
+import collections
+import threading
+import time
+import typing as t
+
+from singer_sdk.exceptions import FatalAPIError
+
+if t.TYPE_CHECKING:
+    import logging
+
+# The key of the state partitions whose requests were skipped by an open circuit.
+SKIPPED_STATE_KEY = "circuit_open"
+
+# A circuit: the location, and the stream requesting the endpoint.
+CircuitKey = tuple[str, str]
+
+
+class CircuitOpenError(FatalAPIError):
+    """Raised instead of sending a request to an endpoint whose circuit is open."""
+
+
+class CircuitBreaker:
+    """The consecutive failures of each endpoint of each location, for all streams.
+
+    Every stream requests a single endpoint template, so circuits are keyed on the
+    location and the stream. Failed attempts, retries included, are 5xx responses,
+    timeouts and connection errors. Rate limited responses are not failures, as they
+    pause every stream anyway.
+
+    After `threshold` consecutive failed attempts, the circuit opens: requests to the
+    endpoint at that location raise `CircuitOpenError` at once, instead of each being
+    retried, for `cooldown` seconds. One request is then let through: the circuit
+    closes if it succeeds, and opens again if it fails. Thread safe.
+    """
+
+    def __init__(
+        self,
+        threshold: int = 5,
+        cooldown: float = 300,
+        *,
+        clock: t.Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures: dict[CircuitKey, int] = {}
+        self._opened_at: dict[CircuitKey, float] = {}
+        self._probing: set[CircuitKey] = set()
+        self.errors: dict[CircuitKey, str] = {}
+        self.skipped: collections.Counter = collections.Counter()
+
+    def is_open(self, key: CircuitKey) -> bool:
+        """Return whether requests to an endpoint are skipped, without counting one."""
+        with self._lock:
+            return self._is_open(key)
+
+    def _is_open(self, key: CircuitKey) -> bool:
+        opened_at = self._opened_at.get(key)
+        if opened_at is None:
+            return False
+        return key in self._probing or self._clock() - opened_at < self.cooldown
+
+    def before_request(self, key: CircuitKey) -> bool:
+        """Let a request through, or raise if the circuit of its endpoint is open.
+
+        Returns whether the request probes a half open circuit, in which case its
+        outcome must be recorded, or the probe released (see `release`).
+
+        Raises:
+            CircuitOpenError: If the circuit is open, and the request is skipped.
+        """
+        with self._lock:
+            if self._is_open(key):
+                raise self._skip(key)
+            if key in self._opened_at:
+                # Half open: this request probes the endpoint for the others.
+                self._probing.add(key)
+                return True
+            return False
+
+    def release(self, key: CircuitKey) -> None:
+        """Release the probe of a half open circuit, without recording its outcome.
+
+        For probes which ended neither answered nor failed, e.g. on a 4xx response or
+        a cassette miss: the circuit stays half open, and the next request probes it.
+        """
+        with self._lock:
+            self._probing.discard(key)
+
+    def skip_if_open(self, key: CircuitKey) -> None:
+        """Raise if the circuit of an endpoint is open, e.g. instead of a retry.
+
+        Unlike `before_request`, a half open circuit is not probed.
+
+        Raises:
+            CircuitOpenError: If the circuit is open, and the request is skipped.
+        """
+        with self._lock:
+            if self._is_open(key):
+                raise self._skip(key)
+
+    def _skip(self, key: CircuitKey) -> CircuitOpenError:
+        self.skipped[key] += 1
+        location_id, stream_name = key
+        msg = (
+            f"Circuit open for stream '{stream_name}' at location {location_id}, "
+            f"request skipped: {self.errors.get(key)}"
+        )
+        return CircuitOpenError(msg)
+
+    def record_success(self, key: CircuitKey) -> None:
+        """Close the circuit of an endpoint which answered."""
+        with self._lock:
+            self._failures.pop(key, None)
+            self._opened_at.pop(key, None)
+            self._probing.discard(key)
+
+    def record_failure(self, key: CircuitKey, error: Exception) -> bool:
+        """Count a failed attempt, and return whether it opened the circuit."""
+        with self._lock:
+            self._failures[key] = self._failures.get(key, 0) + 1
+            self.errors[key] = str(error)
+            probing = key in self._probing
+            self._probing.discard(key)
+            if probing or self._failures[key] == self.threshold:
+                self._opened_at[key] = self._clock()
+                return True
+            return False
+
+    def log_summary(self, logger: logging.Logger) -> None:
+        """Log the endpoints whose requests were skipped, if any."""
+        if not self.skipped:
+            return
+        logger.warning(
+            "Circuit breaker: skipped %d requests to %d failing endpoints: %s",
+            sum(self.skipped.values()),
+            len(self.skipped),
+            "; ".join(
+                f"{key[1]} at {key[0]} ({count} skipped, {self.errors[key]})"
+                for key, count in sorted(self.skipped.items())
+            ),
+        )
+
+
+def clear_skipped_partitions(state: dict) -> int:
+    """Remove the skipped markers of a previous run from the state partitions.
+
+    Returns the number of markers removed.
+    """
+    removed = 0
+    for bookmark in state.get("bookmarks", {}).values():
+        for partition in [bookmark, *bookmark.get("partitions", [])]:
+            if partition.pop(SKIPPED_STATE_KEY, None) is not None:
+                removed += 1
+    return removed
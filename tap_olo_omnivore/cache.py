@@ -0,0 +1,129 @@
+"""On-disk cache of the responses of slow changing streams."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import typing as t
+from pathlib import Path
+
+import requests
+
+if t.TYPE_CHECKING:
+    import logging
+
+
+def content_hash(body: bytes) -> str:
+    """Return the hash used to tell whether a response body changed."""
+    return hashlib.sha256(body).hexdigest()
+
+
+class ResponseCache:
+    """Response bodies keyed by URL and API key, with their validators.
+
+    Each entry is a body file next to a JSON metadata file holding the ETag and
+    Last-Modified headers, the time it was stored at and the hash of the body. Files
+    are replaced atomically, so entries can be read and written from several threads.
+
+    Entries are keyed by a digest of the API key along with the URL, so that taps
+    of different accounts sharing a directory never serve each other's responses.
+    """
+
+    def __init__(self, directory: str | os.PathLike, api_key: str = "") -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._account = hashlib.sha256(api_key.encode()).hexdigest()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "not_modified": 0, "unchanged": 0, "misses": 0}
+
+    def _paths(self, url: str) -> tuple[Path, Path]:
+        key = hashlib.sha256(f"{self._account} {url}".encode()).hexdigest()
+        return self.directory / f"{key}.json", self.directory / f"{key}.body"
+
+    def get(self, url: str) -> dict | None:
+        """Return the metadata of the cached response, with its `body`, if any."""
+        meta_path, body_path = self._paths(url)
+        try:
+            entry = json.loads(meta_path.read_text(encoding="utf-8"))
+            entry["body"] = body_path.read_bytes()
+        except (OSError, ValueError):
+            return None
+        if entry.get("url") != url or content_hash(entry["body"]) != entry.get("hash"):
+            return None
+        return entry
+
+    def put(self, url: str, response: requests.Response, entry: dict | None) -> None:
+        """Store a response, only refreshing the metadata if its body is unchanged."""
+        body = response.content
+        body_hash = content_hash(body)
+        meta_path, body_path = self._paths(url)
+        if entry is None or entry.get("hash") != body_hash:
+            self._write(body_path, body)
+            self.count("misses")
+        else:
+            self.count("unchanged")
+        self._write_meta(
+            meta_path,
+            {
+                "url": url,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "stored_at": time.time(),
+                "hash": body_hash,
+            },
+        )
+
+    def touch(self, url: str, entry: dict) -> None:
+        """Mark a cached response as fresh, after the API confirmed it is unchanged."""
+        meta_path, _ = self._paths(url)
+        meta = {key: value for key, value in entry.items() if key != "body"}
+        self._write_meta(meta_path, {**meta, "stored_at": time.time()})
+        self.count("not_modified")
+
+    def count(self, counter: str) -> None:
+        """Increment one of the cache counters."""
+        with self._lock:
+            self.counters[counter] += 1
+
+    def _write_meta(self, path: Path, meta: dict) -> None:
+        self._write(path, json.dumps(meta).encode())
+
+    def _write(self, path: Path, data: bytes) -> None:
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                temp_file.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            Path(temp_path).unlink(missing_ok=True)
+            raise
+
+    def log_summary(self, logger: logging.Logger) -> None:
+        """Log how many responses were served from the cache."""
+        logger.info(
+            "Response cache: %d fresh hits, %d not modified, %d unchanged, %d changed "
+            "or new",
+            self.counters["hits"],
+            self.counters["not_modified"],
+            self.counters["unchanged"],
+            self.counters["misses"],
+        )
+
+
+def cached_response(
+    entry: dict,
+    request: requests.PreparedRequest,
+) -> requests.Response:
+    """Return a response replaying a cached body for the given request."""
+    response = requests.Response()
+    response.status_code = 200
+    response._content = entry["body"]
+    response.headers["Content-Type"] = "application/hal+json"
+    response.url = request.url
+    response.request = request
+    response.encoding = "utf-8"
+    return response
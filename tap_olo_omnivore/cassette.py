@@ -0,0 +1,188 @@
+"""Recording of the API responses of a run, and their replay without network."""
+
+from __future__ import annotations
+
+import collections
+import datetime
+import json
+import os
+import threading
+import time
+import typing as t
+import zipfile
+
+import requests
+from singer_sdk.exceptions import FatalAPIError
+
+from tap_olo_omnivore.cache import content_hash
+
+if t.TYPE_CHECKING:
+    import logging
+
+CASSETTE_MODES = ("record", "replay")
+
+# The version of the archive layout, checked on replay.
+CASSETTE_VERSION = 1
+
+# The archive member holding the metadata of every response.
+INDEX_NAME = "index.json"
+
+# Response headers which describe the encoding of the body as sent, rather than the
+# decoded body which is recorded.
+ENCODING_HEADERS = frozenset(
+    {"content-encoding", "content-length", "transfer-encoding", "set-cookie"}
+)
+
+
+class CassetteMissError(FatalAPIError):
+    """Raised when replaying a request which was not recorded."""
+
+
+class Cassette:
+    """The responses of a run, recorded to a ZIP archive or replayed from one.
+
+    The archive holds one deflated member per distinct response body, named after its
+    hash, and an index of the responses in the order they were received: method, URL,
+    status, headers and latency. Request headers, and so the API key, are not recorded.
+
+    Replayed requests are matched on their method, path and query string, whatever the
+    host they are sent to. A request sent several times is served its responses in the
+    recorded order, then the last one again. Responses are served after their recorded
+    latency, multiplied by `latency_scale`.
+
+    The time the recording started is kept as the clock of the run, `started_at`, so
+    that requests built from the current time, like ticket windows and lookbacks, are
+    the same when replayed.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        mode: str = "replay",
+        *,
+        latency_scale: float = 0,
+    ) -> None:
+        if mode not in CASSETTE_MODES:
+            msg = f"Unknown cassette mode '{mode}', expected one of {CASSETTE_MODES}."
+            raise ValueError(msg)
+        self.path = os.fspath(path)
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        self._entries: list[dict] = []
+        self._bodies: set[str] = set()
+        self._replays: dict[tuple[str, str], collections.deque] = {}
+        self.served = 0
+        self.started_at = time.time()
+        if mode == "record":
+            self._archive = zipfile.ZipFile(
+                self.path, "w", compression=zipfile.ZIP_DEFLATED
+            )
+        else:
+            self._archive = zipfile.ZipFile(self.path)
+            self._load_index()
+
+    @property
+    def replaying(self) -> bool:
+        """Return whether responses are served from the archive."""
+        return self.mode == "replay"
+
+    def _load_index(self) -> None:
+        index = json.loads(self._archive.read(INDEX_NAME))
+        if index.get("version") != CASSETTE_VERSION:
+            msg = f"Unsupported cassette version {index.get('version')} in {self.path}."
+            raise ValueError(msg)
+        self._entries = index["responses"]
+        # Missing from the cassettes recorded by earlier versions.
+        self.started_at = index.get("started_at", self.started_at)
+        for entry in self._entries:
+            key = (entry["method"], entry["path"])
+            self._replays.setdefault(key, collections.deque()).append(entry)
+
+    def record(self, response: requests.Response) -> None:
+        """Add a response to the archive, storing its body once across responses."""
+        body = response.content
+        body_hash = content_hash(body)
+        request = response.request
+        entry = {
+            "method": request.method,
+            "url": request.url,
+            "path": request.path_url,
+            "status": response.status_code,
+            "headers": {
+                name: value
+                for name, value in response.headers.items()
+                if name.lower() not in ENCODING_HEADERS
+            },
+            "encoding": response.encoding,
+            "elapsed": response.elapsed.total_seconds(),
+            "body": body_hash,
+        }
+        with self._lock:
+            if body_hash not in self._bodies:
+                self._archive.writestr(f"bodies/{body_hash}", body)
+                self._bodies.add(body_hash)
+            self._entries.append(entry)
+
+    def replay(self, prepared_request: requests.PreparedRequest) -> requests.Response:
+        """Return the recorded response of a request, after its simulated latency.
+
+        Raises:
+            CassetteMissError: If the request was not recorded.
+        """
+        key = (prepared_request.method, prepared_request.path_url)
+        with self._lock:
+            entries = self._replays.get(key)
+            if not entries:
+                msg = (
+                    f"{key[0]} {key[1]} is not in the cassette {self.path}. Replay "
+                    "with the config and state it was recorded with."
+                )
+                raise CassetteMissError(msg)
+            entry = entries.popleft() if len(entries) > 1 else entries[0]
+            body = self._archive.read(f"bodies/{entry['body']}")
+            self.served += 1
+        if self.latency_scale > 0:
+            time.sleep(entry["elapsed"] * self.latency_scale)
+
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.headers.update(entry["headers"])
+        response._content = body
+        response.encoding = entry["encoding"]
+        response.url = prepared_request.url
+        response.request = prepared_request
+        response.elapsed = datetime.timedelta(seconds=entry["elapsed"])
+        return response
+
+    def close(self) -> None:
+        """Close the archive, writing the index of the responses when recording."""
+        with self._lock:
+            if self._archive.fp is None:
+                return
+            if self.mode == "record":
+                index = {
+                    "version": CASSETTE_VERSION,
+                    "started_at": self.started_at,
+                    "responses": self._entries,
+                }
+                self._archive.writestr(INDEX_NAME, json.dumps(index))
+            self._archive.close()
+
+    def log_summary(self, logger: logging.Logger) -> None:
+        """Log how many responses were recorded or replayed."""
+        if self.mode == "record":
+            logger.info(
+                "Cassette: recorded %d responses, %d distinct bodies, to %s (%d bytes)",
+                len(self._entries),
+                len(self._bodies),
+                self.path,
+                os.path.getsize(self.path),
+            )
+        else:
+            logger.info(
+                "Cassette: replayed %d responses of %d recorded, from %s",
+                self.served,
+                len(self._entries),
+                self.path,
+            )
@@ -0,0 +1,139 @@
+"""Change detection of records, from fingerprints kept next to the stream state."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import typing as t
+import uuid
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Tombstones flag deleted records with this property.
+DELETED_AT_PROPERTY = "_sdc_deleted_at"
+
+# The key of the state partitions holding the version of their fingerprints.
+FINGERPRINTS_STATE_KEY = "fingerprints_version"
+
+# The key under which earlier versions kept the fingerprints in the state partitions.
+LEGACY_STATE_KEY = "fingerprints"
+
+# The fingerprints of a stream at a location: by scope, then by record key.
+Scopes = dict[str, dict[str, str]]
+
+
+def record_fingerprint(record: dict) -> str:
+    """Return a short hash of the content of a record."""
+    content = json.dumps(record, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(content.encode(), digest_size=8).hexdigest()
+
+
+class FingerprintIndex:
+    """The fingerprints of the records of a context, by primary key.
+
+    The fingerprints of a scope, e.g. a menu item for its price levels, are kept with
+    the other scopes of the location, in the given `scopes`.
+    """
+
+    def __init__(
+        self,
+        scopes: Scopes,
+        scope: str,
+        key_properties: t.Sequence[str],
+    ) -> None:
+        self.fingerprints: dict[str, str] = scopes.setdefault(scope, {})
+        self.key_properties = tuple(key_properties)
+        self.seen: set[str] = set()
+
+    def record_key(self, record: dict) -> str:
+        """Return the key of a record in the index."""
+        return json.dumps([record.get(key) for key in self.key_properties], default=str)
+
+    def see(self, record: dict) -> None:
+        """Mark a record as still existing."""
+        self.seen.add(self.record_key(record))
+
+    def has_changed(self, record: dict) -> bool:
+        """Return whether a record is new or changed, updating its fingerprint."""
+        key = self.record_key(record)
+        fingerprint = record_fingerprint(record)
+        if self.fingerprints.get(key) == fingerprint:
+            return False
+        self.fingerprints[key] = fingerprint
+        return True
+
+    def pop_deleted(self) -> list[dict]:
+        """Forget the records which were not seen, and return their primary keys."""
+        deleted = [key for key in self.fingerprints if key not in self.seen]
+        for key in deleted:
+            del self.fingerprints[key]
+        return [dict(zip(self.key_properties, json.loads(key))) for key in deleted]
+
+
+class FingerprintStore:
+    """The fingerprints of each stream and location, in files next to the state.
+
+    The SDK writes the whole state after every context, so the fingerprints are kept
+    out of it: the state partition of a location only holds the version of its file.
+    Each run writes a new version, once the location is synced, and keeps the version
+    it read. If the target does not commit the state of a run, the next run reads the
+    version before it, and the records of the failed run are written again. Files are
+    replaced atomically, so locations can be saved from several threads.
+    """
+
+    def __init__(self, directory: str | os.PathLike) -> None:
+        self.directory = Path(directory)
+        # The version written by this run.
+        self.version = uuid.uuid4().hex
+
+    def _location_directory(self, stream: str, location_id: str | None) -> Path:
+        key = hashlib.blake2b(str(location_id).encode(), digest_size=8).hexdigest()
+        return self.directory / stream / key
+
+    def load(self, stream: str, location_id: str | None, version: str | None) -> Scopes:
+        """Return the fingerprints of a stream at a location, as of a version."""
+        if version is None:
+            return {}
+        path = self._location_directory(stream, location_id) / f"{version}.json"
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            logger.warning(
+                "Stream '%s' location %s: fingerprints %s not found, every record "
+                "is written: %s",
+                stream,
+                location_id,
+                version,
+                e,
+            )
+            return {}
+
+    def save(
+        self,
+        stream: str,
+        location_id: str | None,
+        scopes: Scopes,
+        previous: str | None,
+    ) -> str:
+        """Write the fingerprints of a stream at a location, and return their version.
+
+        Versions other than this one and the `previous` one are removed.
+        """
+        directory = self._location_directory(stream, location_id)
+        directory.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as temp_file:
+                json.dump(scopes, temp_file, separators=(",", ":"))
+            os.replace(temp_path, directory / f"{self.version}.json")
+        except BaseException:
+            Path(temp_path).unlink(missing_ok=True)
+            raise
+        for path in directory.glob("*.json"):
+            if path.stem not in {self.version, previous}:
+                path.unlink(missing_ok=True)
+        return self.version
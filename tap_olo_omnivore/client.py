@@ -3,58 +3,131 @@
 from __future__ import annotations
 from datetime import datetime
 
+import copy
 import decimal
+import functools
 import json
+import time
 import typing as t
+from http import HTTPStatus
 from importlib import resources
-from urllib.parse import parse_qsl, urlparse
+from types import MappingProxyType
+from urllib.parse import parse_qsl, urlsplit
 
 import backoff
 import requests
+from singer_sdk import _singerlib as singer
 from singer_sdk.authenticators import APIKeyAuthenticator
-from singer_sdk.exceptions import RetriableAPIError
+from singer_sdk.exceptions import FatalAPIError, RetriableAPIError
+from singer_sdk.helpers._util import utc_now
 from singer_sdk.helpers.jsonpath import extract_jsonpath
 from singer_sdk.helpers.types import Context
-from singer_sdk.streams import RESTStream
+from singer_sdk.streams import RESTStream, Stream
 
-from tap_olo_omnivore.pagination import CustomHATEOASPaginator
+from tap_olo_omnivore.breaker import (
+    SKIPPED_STATE_KEY,
+    CircuitBreaker,
+    CircuitKey,
+    CircuitOpenError,
+)
+from tap_olo_omnivore.decoding import decode_response, response_size
+from tap_olo_omnivore.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MIN_PAGE_SIZE,
+    CustomHATEOASPaginator,
+    PageSizeRejectedError,
+    is_page_size_error,
+    set_page_size,
+    smaller_page_size,
+)
+from tap_olo_omnivore.telemetry import Telemetry
+from tap_olo_omnivore.throttle import RequestScheduler, rate_limit_delay
+from tap_olo_omnivore.transform import UNFLATTENED_KEYS, RecordTransformer
+
+if t.TYPE_CHECKING:
+    from tap_olo_omnivore.cache import ResponseCache
+    from tap_olo_omnivore.cassette import Cassette
+    from tap_olo_omnivore.changes import FingerprintIndex, Scopes
 
 # Reference local JSON schema files.
 SCHEMAS_DIR = resources.files(__package__) / "schemas"
 
-def extract_id_from_href(href: str) -> str:
+# The exceptions of a request which are retried, and count as endpoint failures.
+RETRIABLE_EXCEPTIONS = (
+    RetriableAPIError,
+    requests.exceptions.Timeout,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.ChunkedEncodingError,
+    ConnectionRefusedError,
+)
+
+@functools.lru_cache(maxsize=None)
+def load_schema(name: str) -> MappingProxyType:
     """
-    Extracts the last non-empty segment from the given URL's path.
-    For example, if href is 'https://api.omnivore.io/1.0/locations/T6EaXqEc/employees/200/',
-    this function returns '200'.
+    Loads the JSON schema of the named stream from disk once and returns a read-only view.
+    Streams keep a private deep copy, so the cached schema is never altered.
     """
-    parsed = urlparse(href)
-    segments = [seg for seg in parsed.path.split('/') if seg]
-    return segments[-1] if segments else ""
+    schema_path = SCHEMAS_DIR / f"{name}.json"
+    with schema_path.open("r", encoding="utf-8") as schema_file:
+        return MappingProxyType(json.load(schema_file))
 
-def flatten_nested_objects(data, parent_key='', sep='_'):
+@functools.lru_cache(maxsize=None)
+def compile_property_types(name: str) -> MappingProxyType:
     """
-        Recursively flattens a nested dictionary or list of dictionaries.
-        This function traverses the input data, flattening nested dictionaries and lists
-        into a single-level dictionary. Keys of nested dictionaries are combined with
-        their parent keys using the specified separator (default '_'). Lists of dictionaries
-        are flattened by appending the index of each item to the parent key.
-        Excludes '_links', '_embedded', and 'self' keys from flattening.
-        """
-    items = []
-    for k, v in data.items():
-        new_key = f"{parent_key}{sep}{k}" if parent_key else k
-        if isinstance(v, dict) and k not in ("_links", "_embedded", "self"):
-            items.extend(flatten_nested_objects(v, new_key, sep=sep).items())
-        elif isinstance(v, list) and k not in ("_links", "_embedded", "self"):
-            for i, item in enumerate(v):
-                if isinstance(item, dict):
-                    items.extend(flatten_nested_objects(item, f"{new_key}{sep}{i}", sep=sep).items())
-                else:
-                    items.append((f"{new_key}{sep}{i}", item))
-        else:
-            items.append((new_key, v))
-    return dict(items)
+    Compiles the schema of the named stream into a read-only map of each property name to
+    the frozenset of its JSON types, e.g. {'id': frozenset({'string', 'null'})}.
+    """
+    property_types = {}
+    for property_name, property_schema in load_schema(name)["properties"].items():
+        types = property_schema.get("type", [])
+        property_types[property_name] = frozenset([types] if isinstance(types, str) else types)
+    return MappingProxyType(property_types)
+
+def extract_embedded_collection(record: dict, key: str) -> list | None:
+    """
+    Returns the collection embedded under the record's '_embedded' payload for the given key.
+    The collection may be embedded either as a plain list or as a HAL resource wrapping the
+    list in its own '_embedded' property. Returns None when the collection is missing or
+    truncated (the wrapping resource carries a 'next' link), in which case it has to be
+    requested from its own endpoint.
+    """
+    embedded = record.get("_embedded")
+    if not isinstance(embedded, dict):
+        return None
+    collection = embedded.get(key)
+    if isinstance(collection, list):
+        return collection
+    if isinstance(collection, dict):
+        if collection.get("_links", {}).get("next"):
+            return None
+        records = collection.get("_embedded", {}).get(key)
+        if isinstance(records, list):
+            return records
+    return None
+
+def request_page_size(request: requests.PreparedRequest | None) -> int:
+    """
+    Returns the page size ('limit' parameter) of a request, or 0 if it has none.
+    """
+    if request is None or not request.url:
+        return 0
+    limit = dict(parse_qsl(urlsplit(request.url).query)).get("limit", "")
+    return int(limit) if limit.isdigit() else 0
+
+def context_key(context: Context | None) -> tuple:
+    """Returns a hashable key identifying the given stream context."""
+    return tuple(sorted((context or {}).items()))
+
+def location_of(context: Context | None) -> str | None:
+    """Returns the location of the given stream context, if any."""
+    return context.get("location_id") if context else None
+
+def is_rate_limited(exception: BaseException | None) -> bool:
+    """Returns whether a request failed on a rate limited (429) response."""
+    response = getattr(exception, "response", None)
+    return (
+        response is not None and response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+    )
 
 def convert_to_timestamp(value):
     # If the value is already an integer (Unix timestamp)
@@ -93,6 +166,94 @@ class OloOmnivoreStream(RESTStream):
     # Fallback JSONPath for records if _embedded is not used.
     records_jsonpath = "$[*]"
 
+    # Key of this stream's collection inside the parent record's _embedded payload.
+    # When set, records are harvested from the parent response instead of being
+    # requested once per parent record (see `embedded_harvest`).
+    embedded_key: str | None = None
+
+    # Seconds for which responses are served from the response cache, if enabled,
+    # before being revalidated with the API. None for streams which are not cached.
+    cache_ttl: int | None = None
+
+    # Whether only new or changed records may be emitted (see `emit_changes_only`).
+    # Fingerprints are then kept in the fingerprint store.
+    track_changes: bool = False
+
+    def __init__(self, *args, **kwargs):
+        if "schema" not in kwargs:
+            kwargs["schema"] = copy.deepcopy(dict(load_schema(kwargs.get("name") or self.name)))
+            tap = kwargs.get("tap", args[0] if args else None)
+            if self.track_changes and tap.config.get("emit_tombstones", False):
+                from tap_olo_omnivore.changes import DELETED_AT_PROPERTY
+
+                kwargs["schema"]["properties"][DELETED_AT_PROPERTY] = {
+                    "type": ["string", "null"],
+                    "format": "date-time",
+                }
+        super().__init__(*args, **kwargs)
+        if self.track_changes or (
+            self.parent_stream_type is not None and self.replication_key is None
+        ):
+            # Full table child streams keep nothing per ticket or menu item, so one
+            # partition per location keeps the state from growing with every record.
+            self.state_partitioning_keys = ["location_id"]
+        # Resolved from the schema and the catalog on first use.
+        self._property_types: MappingProxyType | None = None
+        self._selected_properties: frozenset[str] | None = None
+        self._boolean_properties: frozenset[str] | None = None
+        self._number_properties: frozenset[str] | None = None
+        self._transformer: RecordTransformer | None = None
+        self._unmapped_properties: set[str] = set()
+        # Records staged by the parent stream for the next context to be synced.
+        self._harvested: tuple[tuple, list[dict]] | None = None
+        # Pagination of the partition being requested, summarized once it is done.
+        self._paginator: CustomHATEOASPaginator | None = None
+        self._page_stats = {"pages": 0, "bytes": 0}
+        # When the request being validated was sent, for the telemetry.
+        self._sent_at: float | None = None
+        # First pages prefetched by the parent stream, by URL.
+        self._prefetched: dict[str, requests.Response] = {}
+        # Fingerprints of the context being synced, when emitting changes only.
+        self._fingerprints: FingerprintIndex | None = None
+        # Whether the requests of the context being synced were cut short by an open
+        # circuit, in which case the records not seen are not deleted.
+        self._cut_short = False
+        # The locations where the requests of a context were cut short, whose child
+        # fingerprints are then not pruned.
+        self._cut_short_locations: set[str] = set()
+        # The fingerprint scopes synced this run, by location, to prune the others.
+        self._visited_scopes: dict[str | None, set[str]] = {}
+        # The fingerprints of the locations being synced, saved once each is done.
+        self._location_fingerprints: dict[str | None, Scopes] = {}
+        # Whether the SCHEMA message was written, by the first context synced.
+        self._schema_written = False
+
+    def drop_record_partitions(self) -> None:
+        """Drop the state partitions kept per parent record by earlier versions.
+
+        Full table child streams used to keep one partition per ticket, ticket item or
+        menu item. They hold no bookmark, and are replaced by the partition of their
+        location, so they are dropped when the state is loaded.
+        """
+        bookmark = self.tap_state.get("bookmarks", {}).get(self.name)
+        partitions = bookmark.get("partitions") if bookmark else None
+        if not partitions or not self.state_partitioning_keys:
+            return
+        keys = set(self.state_partitioning_keys)
+        kept = [
+            partition
+            for partition in partitions
+            if set(partition.get("context", {})) <= keys
+        ]
+        if len(kept) < len(partitions):
+            self.logger.info(
+                "Stream '%s': dropped %d state partitions kept per parent record, "
+                "now kept per location.",
+                self.name,
+                len(partitions) - len(kept),
+            )
+            bookmark["partitions"] = kept
+
     @property
     def url_base(self) -> str:
         """Return the API URL root from the configuration."""
@@ -112,10 +273,101 @@ class OloOmnivoreStream(RESTStream):
         )
 
     @property
-    def schema(self) -> dict:
-        schema_path = SCHEMAS_DIR / f"{self.name}.json"
-        with schema_path.open("r", encoding="utf-8") as schema_file:
-            return json.load(schema_file)
+    def property_types(self) -> MappingProxyType:
+        """Return the map of each schema property to its set of JSON types.
+
+        Properties added to the stream's own schema, like `_sdc_deleted_at`, are
+        included too.
+        """
+        if self._property_types is None:
+            property_types = compile_property_types(self.name)
+            added = self.schema["properties"].keys() - property_types.keys()
+            if added:
+                property_types = MappingProxyType(
+                    {
+                        **property_types,
+                        **{
+                            name: frozenset(self.schema["properties"][name]["type"])
+                            for name in added
+                        },
+                    }
+                )
+            self._property_types = property_types
+        return self._property_types
+
+    @property
+    def selected_properties(self) -> frozenset[str]:
+        """Return the schema properties selected in the catalog."""
+        if self._selected_properties is None:
+            self._selected_properties = frozenset(
+                property_name
+                for property_name in self.property_types
+                if self.mask[("properties", property_name)]
+            )
+        return self._selected_properties
+
+    @property
+    def transformer(self) -> RecordTransformer:
+        """Return the record transformer compiled for this stream.
+
+        Besides the selected properties, it keeps the keys needed to sync the stream and
+        its children: the primary and replication keys, the record ID and, when child
+        records are harvested from them, the embedded collections.
+        """
+        if self._transformer is None:
+            properties = set(self.selected_properties)
+            properties.update(self.primary_keys or ())
+            if self.replication_key:
+                properties.add(self.replication_key)
+            properties.add("id")
+            if self.embedded_harvest and any(
+                getattr(child_stream, "embedded_key", None)
+                for child_stream in self.synced_child_streams
+            ):
+                properties.add("_embedded")
+            self._transformer = RecordTransformer(properties)
+        return self._transformer
+
+    @property
+    def synced_child_streams(self) -> list[Stream]:
+        """Return the child streams which are synced, selected or with selected children."""
+        return [
+            child_stream
+            for child_stream in self.child_streams
+            if child_stream.selected or child_stream.has_selected_descendents
+        ]
+
+    @property
+    def embedded_harvest(self) -> bool:
+        """Return whether child records are harvested from embedded parent collections."""
+        return self.config.get("embedded_harvest", True)
+
+    @property
+    def emit_changes_only(self) -> bool:
+        """Return whether unchanged records are left out, for streams tracking changes."""
+        return self.track_changes and self.config.get("emit_changes_only", False)
+
+    @property
+    def streaming_parse(self) -> bool:
+        """Return whether records are parsed incrementally from the responses."""
+        if not self.config.get("streaming_parse", False):
+            return False
+        from tap_olo_omnivore.streaming import streaming_available
+
+        return streaming_available()
+
+    @property
+    def stream_bodies(self) -> bool:
+        """Return whether response bodies are read to a spooled file rather than loaded.
+
+        Only for streams whose responses are parsed with `streaming_parse`.
+        """
+        return self.streaming_parse
+
+    @property
+    def json_decoder(self) -> str:
+        """Return the name of the JSON backend used to decode responses."""
+        return self.config.get("json_decoder", "stdlib")
 
     @property
     def http_headers(self) -> dict:
@@ -125,10 +377,27 @@ class OloOmnivoreStream(RESTStream):
             headers["User-Agent"] = self.config["user_agent"]
         return headers
 
+    @property
+    def page_size(self) -> int:
+        """Return the page size requested from this stream's endpoint.
+
+        Starts at `max_page_size` if larger than the configured `page_size`, or else at
+        `page_size`, then sticks to the size the endpoint accepted if it rejected a
+        larger one. An endpoint is thus probed for its largest page size once per run.
+        """
+        page_size = self.config.get("page_size", DEFAULT_PAGE_SIZE)
+        return self._tap.page_sizes.get(
+            self.name, max(page_size, self.config.get("max_page_size") or 0)
+        )
+
     def get_new_paginator(self) -> CustomHATEOASPaginator:
         """Return a new paginator instance using the custom pagination behavior."""
-        max_pagination = self.config.get("max_pagination", 10)
-        return CustomHATEOASPaginator(max_pagination=max_pagination)
+        self._paginator = CustomHATEOASPaginator(
+            max_pagination=self.config.get("max_pagination"),
+            json_decoder=self.json_decoder,
+            streaming=self.streaming_parse,
+        )
+        return self._paginator
 
     def get_url_params(
         self,
@@ -139,43 +408,400 @@ class OloOmnivoreStream(RESTStream):
 
         For Omnivore, if a next page token (which is the full URL) is provided, it will
         override URL parameterization. Otherwise, if a replication key is set, parameters for
-        sorting may be added.
+        sorting may be added. Pages of `page_size` records are requested.
         """
         params: dict[str, t.Any] = {}
         if next_page_token:
             params.update(dict(parse_qsl(next_page_token.query)))
-        starting_timestamp = self.get_starting_replication_key_value(context)
-        if self.replication_key and starting_timestamp:
-            starting_timestamp = convert_to_timestamp(starting_timestamp)
+        params.setdefault("limit", self.page_size)
+        starting_timestamp = self.get_starting_timestamp_value(context)
+        if starting_timestamp is not None:
             params["where"] = f"gte({self.replication_key},{starting_timestamp})"
         return params
 
+    def get_starting_timestamp_value(self, context: Context | None) -> int | None:
+        """Return the Unix timestamp to resume the replication key from, if any.
+
+        That is the bookmark of the partition, or the configured `start_date` if it has
+        none.
+        """
+        if not self.replication_key:
+            return None
+        starting_value = self.get_starting_replication_key_value(context)
+        if not starting_value:
+            starting_value = self.config.get("start_date")
+        return convert_to_timestamp(starting_value) if starting_value else None
+
+    @property
+    def request_scheduler(self) -> RequestScheduler:
+        """Return the request scheduler shared by all streams of the tap."""
+        return self._tap.request_scheduler
+
+    @property
+    def telemetry(self) -> Telemetry:
+        """Return the performance metrics shared by all streams of the tap."""
+        return self._tap.telemetry
+
+    @property
+    def response_cache(self) -> ResponseCache | None:
+        """Return the response cache shared by all streams, if enabled."""
+        return self._tap.response_cache
+
+    @property
+    def cassette(self) -> Cassette | None:
+        """Return the cassette recording or replaying the responses, if enabled."""
+        return self._tap.cassette
+
+    @property
+    def circuit_breaker(self) -> CircuitBreaker | None:
+        """Return the circuit breaker shared by all streams, if enabled."""
+        return self._tap.circuit_breaker
+
+    def circuit_key(self, context: Context | None) -> CircuitKey | None:
+        """Return the circuit of the endpoint requested for a context, if any.
+
+        Requests which are not made for a location, like the `/locations` list, have
+        no circuit: their failures fail the sync.
+        """
+        location_id = location_of(context)
+        if self.circuit_breaker is None or location_id is None:
+            return None
+        return (location_id, self.name)
+
+    def circuit_open(self, context: Context | None) -> bool:
+        """Return whether the requests of a context are skipped by an open circuit."""
+        key = self.circuit_key(context)
+        return key is not None and self.circuit_breaker.is_open(key)
+
+    def get_cache_ttl(self) -> int | None:
+        """Return the response cache TTL of the stream, overridden by `cache_ttls`."""
+        return self.config.get("cache_ttls", {}).get(self.name, self.cache_ttl)
+
+    @property
+    def requests_session(self) -> requests.Session:
+        """Return the HTTP session shared by all streams of the tap."""
+        return self._tap.requests_session
+
+    def build_prepared_request(
+        self,
+        *args: t.Any,
+        **kwargs: t.Any,
+    ) -> requests.PreparedRequest:
+        """Build an authenticated request.
+
+        The authenticator is attached to the request rather than to the shared
+        session, which streams use from several threads.
+        """
+        request = requests.Request(*args, auth=self.authenticator, **kwargs)
+        return self.requests_session.prepare_request(request)
+
     def request_decorator(self, func: t.Callable) -> t.Callable:
         """Return a decorator that retries the function call on certain exceptions.
 
         The decorator retries on specific exceptions like:
-        - RetriableAPIError
-        - ReadTimeout
+        - RetriableAPIError (429 and 5xx responses)
+        - Timeout
         - ConnectionError
-        - RequestException
         - ConnectionRefusedError
 
-        It uses exponential backoff with a maximum of 7 attempts and a factor of 2.
+        Rate limited responses are retried after the delay requested by the API. Other
+        failures use exponential backoff with a factor of 2. At most 7 attempts are made,
+        fewer once the circuit breaker of the endpoint opens.
         """
         decorator: t.Callable = backoff.on_exception(
-            backoff.expo,
-            (
-                RetriableAPIError,
-                requests.exceptions.ReadTimeout,
-                requests.exceptions.ConnectionError,
-                requests.exceptions.RequestException,
-                ConnectionRefusedError,
-            ),
+            self.backoff_wait_generator,
+            RETRIABLE_EXCEPTIONS,
             max_tries=7,
-            factor=2,
+            on_backoff=self.backoff_handler,
+            jitter=self.backoff_jitter,
         )(func)
         return decorator
 
+    def backoff_wait_generator(self) -> t.Generator[float, t.Any, None]:
+        """Wait as long as a rate limited response asked, otherwise back off exponentially."""
+        expo = backoff.expo(factor=2)
+        next(expo)
+        exception = yield  # type: ignore[misc]
+        while True:
+            delay = None
+            response = getattr(exception, "response", None)
+            if response is not None and response.status_code == HTTPStatus.TOO_MANY_REQUESTS:
+                delay = rate_limit_delay(response)
+            exception = yield delay if delay is not None else next(expo)
+
+    def backoff_handler(self, details: dict) -> None:
+        """Log and count each retry with the shared request scheduler."""
+        exception = details.get("exception")
+        self.request_scheduler.record_retry(
+            details.get("wait", 0), throttled=is_rate_limited(exception)
+        )
+        self.telemetry.count(self.name, location_of(self.context), "retries")
+        self.logger.warning(
+            "Backing off %0.2f seconds after %d tries: %s",
+            details.get("wait", 0),
+            details.get("tries", 0),
+            exception,
+        )
+
+    def _request(
+        self,
+        prepared_request: requests.PreparedRequest,
+        context: Context | None,
+    ) -> requests.Response:
+        """Send the request, or serve it from the response cache.
+
+        Cached responses younger than the stream's TTL are served without a request.
+        Older ones are revalidated with their ETag or Last-Modified validators, and
+        served again if the API answers 304 Not Modified. The cache is not used with a
+        cassette, which records or replays every response.
+
+        With `streaming_parse`, the bodies of responses which are neither cached nor
+        recorded are read to a spooled file rather than loaded.
+        """
+        cache = self.response_cache
+        ttl = self.get_cache_ttl()
+        if cache is None or ttl is None or self.cassette is not None:
+            return self._send(
+                prepared_request,
+                context,
+                stream=self.stream_bodies and self.cassette is None,
+            )
+
+        url = prepared_request.url
+        entry = cache.get(url)
+        if entry is not None:
+            if time.time() - entry["stored_at"] < ttl:
+                cache.count("hits")
+                return self._cached_response(entry, prepared_request)
+            if entry.get("etag"):
+                prepared_request.headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                prepared_request.headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = self._send(prepared_request, context)
+        if response.status_code == HTTPStatus.NOT_MODIFIED and entry is not None:
+            cache.touch(url, entry)
+            return self._cached_response(entry, prepared_request)
+        cache.put(url, response, entry)
+        return response
+
+    def _cached_response(
+        self,
+        entry: dict,
+        prepared_request: requests.PreparedRequest,
+    ) -> requests.Response:
+        """Return the cached response of a request."""
+        from tap_olo_omnivore.cache import cached_response
+
+        response = cached_response(entry, prepared_request)
+        self._page_stats["pages"] += 1
+        return response
+
+    def _send(
+        self,
+        prepared_request: requests.PreparedRequest,
+        context: Context | None,
+        *,
+        stream: bool = False,
+    ) -> requests.Response:
+        """Send the request once the shared request scheduler allows it.
+
+        If the endpoint rejects the requested page size, the request is sent again with
+        half the page size, which is then used for the rest of the run. Responses
+        prefetched by the parent stream are used instead of sending the request.
+
+        With a cassette, responses are replayed from it instead, or recorded to it once
+        validated. Rejections of the page size are recorded too.
+
+        Failed attempts are counted by the circuit breaker of the endpoint, if enabled,
+        which skips the request once open (see `CircuitBreaker`). A request probing a
+        half open circuit which ends with an error that is not counted, e.g. a 4xx
+        response, releases the probe.
+        """
+        cassette = self.cassette
+        breaker = self.circuit_breaker
+        key = self.circuit_key(context)
+        while True:
+            probing = False
+            try:
+                response = self._prefetched.pop(prepared_request.url, None)
+                if response is not None:
+                    self._sent_at = None
+                    self.validate_response(response)
+                else:
+                    if key is not None:
+                        probing = breaker.before_request(key)
+                    if cassette is not None and cassette.replaying:
+                        self._sent_at = None
+                        response = cassette.replay(prepared_request)
+                        self.validate_response(response)
+                    else:
+                        self.request_scheduler.acquire()
+                        self._sent_at = time.perf_counter()
+                        if stream:
+                            response = self._send_streamed(prepared_request, context)
+                        else:
+                            response = super()._request(prepared_request, context)
+            except PageSizeRejectedError as e:
+                if cassette is not None and not cassette.replaying:
+                    # Replayed to negotiate the same page size again.
+                    cassette.record(e.response)
+                page_size = smaller_page_size(
+                    request_page_size(prepared_request),
+                    self.config.get("page_size", DEFAULT_PAGE_SIZE),
+                )
+                self.logger.warning(
+                    "Stream '%s': page size rejected (%s), retrying with %d.",
+                    self.name,
+                    e,
+                    page_size,
+                )
+                self._tap.page_sizes[self.name] = page_size
+                prepared_request.url = set_page_size(prepared_request.url, page_size)
+                continue
+            except RETRIABLE_EXCEPTIONS as e:
+                if key is not None and not is_rate_limited(e):
+                    self._record_circuit_failure(key, e)
+                raise
+            finally:
+                if probing:
+                    # No-op once the outcome of the probe was recorded.
+                    breaker.release(key)
+            if key is not None:
+                breaker.record_success(key)
+            if cassette is not None and not cassette.replaying:
+                cassette.record(response)
+            self._page_stats["pages"] += 1
+            self._page_stats["bytes"] += response_size(response)
+            return response
+
+    def _send_streamed(
+        self,
+        prepared_request: requests.PreparedRequest,
+        context: Context | None,
+    ) -> requests.Response:
+        """Send a request like `RESTStream._request`, without loading the body.
+
+        The body is read ahead of its parse to a spooled file (see `read_body`), within
+        the retries of the request: the connection is released before the child streams
+        of the records are synced, and a connection broken while the body is read is
+        retried like a failed request, before any record of the page is written. Error
+        responses, whose bodies are small, are loaded at once.
+        """
+        response = self.requests_session.send(
+            prepared_request,
+            timeout=self.timeout,
+            allow_redirects=self.allow_redirects,
+            stream=True,
+        )
+        self._write_request_duration_log(
+            endpoint=self.path,
+            response=response,
+            context=context,
+            extra_tags={"url": prepared_request.path_url}
+            if self._LOG_REQUEST_METRIC_URLS
+            else None,
+        )
+        if not response.ok:
+            response.content  # noqa: B018
+        self.validate_response(response)
+        from tap_olo_omnivore.streaming import read_body
+
+        read_body(response)
+        # Counted once read, as the size of a streamed body is unknown until then.
+        self.telemetry.count(
+            self.name, location_of(context), "bytes", response_size(response)
+        )
+        return response
+
+    def _record_circuit_failure(self, key: CircuitKey, error: Exception) -> None:
+        """Count a failed attempt with the circuit breaker, logging if it opened.
+
+        Raises:
+            CircuitOpenError: If the circuit is open, so that the request is not
+                retried after backing off.
+        """
+        if self.circuit_breaker.record_failure(key, error):
+            self.logger.warning(
+                "Stream '%s' location %s: circuit opened after %d consecutive failures, "
+                "skipping its requests for %.0f seconds: %s",
+                self.name,
+                key[0],
+                self.circuit_breaker.threshold,
+                self.circuit_breaker.cooldown,
+                error,
+            )
+        self.circuit_breaker.skip_if_open(key)
+
+    def now(self) -> float:
+        """Return the current time, or the clock of the cassette if enabled.
+
+        Requests built from the current time then match the recorded ones on replay.
+        """
+        if self.cassette is not None:
+            return self.cassette.started_at
+        return time.time()
+
+    def cut_short(self, context: Context | None) -> None:
+        """Mark the requests of a context as cut short by an open circuit.
+
+        The bookmark of the partition is left as it was, so that the records skipped
+        are requested again by the next run: the progress of the records requested
+        before the circuit opened is dropped, and later records are not tracked.
+        """
+        self._cut_short = True
+        self._cut_short_locations.add(location_of(context))
+        self.get_context_state(context).pop("progress_markers", None)
+
+    def _increment_stream_state(
+        self,
+        latest_record: dict,
+        *,
+        context: Context | None = None,
+    ) -> None:
+        """Track the bookmark of a record, unless its context was cut short."""
+        if self._cut_short:
+            return
+        super()._increment_stream_state(latest_record, context=context)
+
+    def request_records(self, context: Context | None) -> t.Iterable[dict]:
+        """Request records, following every page, then log a summary of the partition.
+
+        If the circuit of the endpoint is open, the rest of the partition is skipped,
+        and the skipped requests are counted in its state under `circuit_open` (see
+        `cut_short`).
+        """
+        self._page_stats = {"pages": 0, "bytes": 0}
+        records = 0
+        try:
+            for record in super().request_records(context):
+                records += 1
+                yield record
+        except CircuitOpenError as e:
+            self.cut_short(context)
+            self.telemetry.count(self.name, location_of(context), "circuit_skipped")
+            state = self.get_context_state(context)
+            skipped = state.setdefault(SKIPPED_STATE_KEY, {"skipped_requests": 0})
+            skipped["skipped_requests"] += 1
+            skipped["error"] = self.circuit_breaker.errors.get(self.circuit_key(context))
+            self.logger.debug("Stream '%s' partition %s: %s", self.name, context, e)
+        self.logger.info(
+            "Stream '%s' partition %s: %d records in %d pages (%d bytes).",
+            self.name,
+            context,
+            records,
+            self._page_stats["pages"],
+            self._page_stats["bytes"],
+        )
+        if self._paginator is not None and self._paginator.truncated:
+            self.logger.warning(
+                "Stream '%s' partition %s: stopped after %d pages (max_pagination), "
+                "records are missing.",
+                self.name,
+                context,
+                self._paginator.page_count,
+            )
+
     def prepare_request_payload(
         self,
         context: Context | None,
@@ -194,9 +820,28 @@ class OloOmnivoreStream(RESTStream):
         property. If a key matching the stream's name exists within _embedded, that will be used;
         otherwise, the first key found will be used. If _embedded is missing, a fallback JSONPath
         is used.
+
+        With `streaming_parse`, the records of the same collection are yielded as they are
+        parsed, in a single pass over the body, without decoding the whole document.
         """
+        if self.streaming_parse:
+            from tap_olo_omnivore.streaming import iter_embedded_records
+
+            location_id = location_of(self.context)
+            timer = self.telemetry.timer(self.name, location_id, "decode_seconds")
+            try:
+                yield from timer.iterate(iter_embedded_records(response, self.name))
+                return
+            except LookupError:
+                # No _embedded collection: nothing was yielded, and the document
+                # built by the pass is used as if decoded.
+                pass
+            except requests.exceptions.JSONDecodeError as e:
+                self.logger.error("Failed to decode JSON response: %s", e)
+                return
+
         try:
-            json_response = response.json(parse_float=decimal.Decimal)
+            json_response = self.decode_json(response)
         except requests.exceptions.JSONDecodeError as e:
             self.logger.error("Failed to decode JSON response: %s", e)
             return iter([])
@@ -211,6 +856,295 @@ class OloOmnivoreStream(RESTStream):
             records = extract_jsonpath(self.records_jsonpath, input=json_response)
         yield from records
 
+    def decode_json(self, response: requests.Response) -> t.Any:
+        """Return the decoded JSON document of a response, timing the decode."""
+        with self.telemetry.timer(self.name, location_of(self.context), "decode_seconds"):
+            return decode_response(response, self.json_decoder)
+
+    def get_records(self, context: Context | None) -> t.Iterable[dict]:
+        """Return a generator of record-type dictionary objects.
+
+        With `emit_changes_only`, every record is still returned, so that child streams
+        are synced, but only new or changed ones are written (see
+        `_generate_record_messages`). Once all records of the context are written,
+        the ones which disappeared are forgotten, and a tombstone is written for each of
+        them with `emit_tombstones`. Streams synced only for their children write
+        nothing, so their records are not fingerprinted. Nothing is forgotten when the
+        requests of the context were cut short by an open circuit.
+        """
+        self._cut_short = False
+        if not self.emit_changes_only or not self.selected:
+            yield from self._get_context_records(context)
+        else:
+            yield from self._get_changed_records(context)
+        if set(context or {}) == {"location_id"}:
+            # Every parent record of the location was synced: forget the children of
+            # those which disappeared, then save the fingerprints of the location.
+            self._prune_child_fingerprints(context)
+            self.save_fingerprints(context)
+        # The records of the context are written: merge their counters once.
+        self.telemetry.flush()
+
+    def _get_changed_records(self, context: Context | None) -> t.Iterable[dict]:
+        """Return the records of a context, fingerprinting them to emit changes only."""
+        from tap_olo_omnivore.changes import FingerprintIndex
+
+        scope = json.dumps(
+            {
+                key: value
+                for key, value in sorted((context or {}).items())
+                if key not in self.state_partitioning_keys
+            },
+            default=str,
+        )
+        fingerprints = FingerprintIndex(
+            self.location_fingerprints(context), scope, self.primary_keys
+        )
+        self._fingerprints = fingerprints
+        self._visited_scopes.setdefault(location_of(context), set()).add(scope)
+        try:
+            for record in self._get_context_records(context):
+                fingerprints.see(record)
+                yield record
+        finally:
+            self._fingerprints = None
+        if self._cut_short:
+            return
+
+        self._write_tombstones(context, fingerprints.pop_deleted())
+
+    def _write_tombstones(self, context: Context | None, deleted: list[dict]) -> None:
+        """Write a tombstone for each deleted record, with `emit_tombstones`."""
+        if deleted and self.config.get("emit_tombstones", False):
+            from tap_olo_omnivore.changes import DELETED_AT_PROPERTY
+
+            deleted_at = utc_now().isoformat()
+            for key_values in deleted:
+                self._write_record_message(
+                    {**(context or {}), **key_values, DELETED_AT_PROPERTY: deleted_at}
+                )
+
+    def _prune_child_fingerprints(
+        self,
+        context: Context,
+        *,
+        cut_short: bool = False,
+    ) -> None:
+        """Forget the fingerprints of the descendants of a location not synced this run.
+
+        Fingerprints are kept per parent record, e.g. per menu item. Those of parent
+        records which disappeared are dropped, with a tombstone for each of their
+        records. The descendants of a stream cut short by an open circuit at the
+        location are left as they are, as their parents were not all seen. The
+        fingerprints of each descendant are then saved.
+        """
+        location_id = location_of(context)
+        if location_id in self._cut_short_locations:
+            self._cut_short_locations.discard(location_id)
+            cut_short = True
+        for child_stream in self.child_streams:
+            if not isinstance(child_stream, OloOmnivoreStream):
+                continue
+            child_stream.prune_fingerprints(context, skip=cut_short)
+            child_stream._prune_child_fingerprints(context, cut_short=cut_short)
+            child_stream.save_fingerprints(context)
+
+    def prune_fingerprints(self, context: Context, *, skip: bool = False) -> None:
+        """Forget the fingerprints of the parent records of a location not synced.
+
+        With `skip`, the scopes synced this run are only reset.
+        """
+        visited = self._visited_scopes.pop(location_of(context), set())
+        if skip or not self.emit_changes_only or not self.selected:
+            return
+        scopes = self.location_fingerprints(context)
+        stale = [scope for scope in scopes if scope not in visited]
+        if not stale:
+            return
+        from tap_olo_omnivore.changes import FingerprintIndex
+
+        for scope in stale:
+            deleted = FingerprintIndex(scopes, scope, self.primary_keys).pop_deleted()
+            del scopes[scope]
+            self._write_tombstones({**context, **json.loads(scope)}, deleted)
+        self.logger.info(
+            "Stream '%s' location %s: forgot the records of %d parent records which "
+            "disappeared.",
+            self.name,
+            location_of(context),
+            len(stale),
+        )
+
+    def location_fingerprints(self, context: Context) -> Scopes:
+        """Return the fingerprints of the location of a context, loaded once.
+
+        They are read from the fingerprint store, at the version recorded in the state
+        partition of the location, or from the partition itself for states written by
+        earlier versions.
+        """
+        from tap_olo_omnivore.changes import FINGERPRINTS_STATE_KEY, LEGACY_STATE_KEY
+
+        location_id = location_of(context)
+        scopes = self._location_fingerprints.get(location_id)
+        if scopes is None:
+            partition = self.get_context_state(context)
+            scopes = partition.get(LEGACY_STATE_KEY)
+            if not isinstance(scopes, dict):
+                scopes = self._tap.fingerprint_store.load(
+                    self.name, location_id, partition.get(FINGERPRINTS_STATE_KEY)
+                )
+            self._location_fingerprints[location_id] = scopes
+        return scopes
+
+    def save_fingerprints(self, context: Context) -> None:
+        """Save the fingerprints of a location, once synced, recording their version.
+
+        The state partition of the location then only holds the version.
+        """
+        location_id = location_of(context)
+        scopes = self._location_fingerprints.pop(location_id, None)
+        if scopes is None:
+            return
+        from tap_olo_omnivore.changes import FINGERPRINTS_STATE_KEY, LEGACY_STATE_KEY
+
+        partition = self.get_context_state(context)
+        partition.pop(LEGACY_STATE_KEY, None)
+        partition[FINGERPRINTS_STATE_KEY] = self._tap.fingerprint_store.save(
+            self.name, location_id, scopes, partition.get(FINGERPRINTS_STATE_KEY)
+        )
+
+    def _get_context_records(self, context: Context | None) -> t.Iterable[dict]:
+        """Return the records of a context.
+
+        With `max_concurrent_child_requests` above one, the records are returned in
+        batches, once the first page of their child streams is prefetched concurrently.
+        """
+        records = self._get_own_records(context)
+        if self.config.get("max_concurrent_child_requests", 1) <= 1:
+            yield from records
+            return
+
+        from tap_olo_omnivore.prefetch import PREFETCH_BATCH_SIZE
+
+        batch: list[dict] = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= PREFETCH_BATCH_SIZE:
+                self._prefetch_children(batch, context)
+                yield from batch
+                batch = []
+        if batch:
+            self._prefetch_children(batch, context)
+            yield from batch
+
+    def _prefetch_children(self, records: list[dict], context: Context | None) -> None:
+        """Prefetch the first page of the child streams of the given records.
+
+        Only the children which will request their endpoint are prefetched, which
+        leaves out unselected, incremental and cached streams, the streams whose circuit
+        is open, and the collections embedded in the records. Nothing is prefetched when replaying a cassette.
+        The responses are picked up in order by the children as they are synced.
+        """
+        if self.cassette is not None and self.cassette.replaying:
+            return
+        children = [
+            child_stream
+            for child_stream in self.synced_child_streams
+            if isinstance(child_stream, OloOmnivoreStream)
+            and child_stream.replication_key is None
+            and child_stream.get_cache_ttl() is None
+            and not child_stream.circuit_open(context)
+        ]
+        prepared_requests = []
+        for child_stream in children:
+            child_stream._prefetched.clear()
+            embedded_key = child_stream.embedded_key if self.embedded_harvest else None
+            previous_context = child_stream.context
+            try:
+                for record in records:
+                    if (
+                        embedded_key is not None
+                        and extract_embedded_collection(record, embedded_key) is not None
+                    ):
+                        continue
+                    child_context = self.get_child_context(record, context)
+                    child_stream.context = MappingProxyType(child_context)
+                    prepared_request = child_stream.prepare_request(child_context, None)
+                    prepared_requests.append((child_stream, prepared_request))
+            finally:
+                child_stream.context = previous_context
+
+        responses = self._tap.prefetcher.fetch_all(
+            [prepared_request for _, prepared_request in prepared_requests],
+            timeout=self.timeout,
+        )
+        for (child_stream, prepared_request), response in zip(
+            prepared_requests, responses
+        ):
+            if response is not None:
+                child_stream._prefetched[prepared_request.url] = response
+
+    def _get_own_records(self, context: Context | None) -> t.Iterable[dict]:
+        """Return the records of a context, harvested or requested.
+
+        If the parent stream staged this stream's collection from its embedded payload,
+        those records are processed directly. Otherwise, records are requested from the
+        stream's own endpoint.
+        """
+        harvested = self._pop_harvested(context)
+        if harvested is None:
+            yield from super().get_records(context)
+            return
+
+        for record in harvested:
+            # Copy to avoid mutating the parent record's embedded payload.
+            transformed_record = self.post_process(dict(record), context)
+            if transformed_record is None:
+                continue
+            yield transformed_record
+
+    def generate_child_contexts(
+        self,
+        record: dict,
+        context: Context | None,
+    ) -> t.Iterable[Context | None]:
+        """Generate child contexts, staging embedded child collections if enabled."""
+        for child_context in super().generate_child_contexts(record, context):
+            if child_context is not None and self.embedded_harvest:
+                self._stage_embedded_children(record, child_context)
+            yield child_context
+
+    def _stage_embedded_children(self, record: dict, child_context: Context) -> None:
+        """Stage the embedded collections of a record for the child streams.
+
+        Child streams whose collection is missing or truncated get nothing staged and
+        fall back to requesting their own endpoint. Child streams which are not synced
+        are left out.
+        """
+        key = context_key(child_context)
+        for child_stream in self.synced_child_streams:
+            if not isinstance(child_stream, OloOmnivoreStream):
+                continue
+            if child_stream.embedded_key is None:
+                continue
+            records = extract_embedded_collection(record, child_stream.embedded_key)
+            if records is None:
+                self.logger.debug(
+                    "Stream '%s': embedded '%s' missing or truncated, falling back to requests.",
+                    child_stream.name,
+                    child_stream.embedded_key,
+                )
+                child_stream._harvested = None
+            else:
+                child_stream._harvested = (key, records)
+
+    def _pop_harvested(self, context: Context | None) -> list[dict] | None:
+        """Return and clear the records staged for the given context, if any."""
+        harvested, self._harvested = self._harvested, None
+        if harvested is None or harvested[0] != context_key(context):
+            return None
+        return harvested[1]
+
     def post_process(
         self, row: dict, context: Context | None = None
     ) -> dict | None:
@@ -220,8 +1154,28 @@ class OloOmnivoreStream(RESTStream):
         Then, it extracts reference IDs from singular _links. Using a generic rule,
         it skips any link key that ends with "s" or is "self" and for the
         remaining keys, it appends '_id' to the key and assigns the last segment of the URL.
-        Finally, it flattens nested objects.
+        Finally, it flattens nested objects. Links and flattening are handled in a single
+        pass by the stream's compiled `transformer`.
+
+        Records of streams which are not selected, synced only for their children, are
+        never written: only the keys and embedded collections kept by the transformer
+        are copied, without transforming the record.
         """
+        started_at = time.perf_counter()
+        record = self._post_process(row, context)
+        location_id = location_of(context)
+        self.telemetry.count(
+            self.name,
+            location_id,
+            "post_process_seconds",
+            time.perf_counter() - started_at,
+        )
+        if record is None:
+            self.telemetry.count(self.name, location_id, "skipped")
+        return record
+
+    def _post_process(self, row: dict, context: Context | None) -> dict | None:
+        """Validate the keys of a record, then transform it (see `post_process`)."""
         # Validate primary keys
         if self.primary_keys:
             for pk in self.primary_keys:
@@ -253,28 +1207,135 @@ class OloOmnivoreStream(RESTStream):
                     )
                     return None
 
-        links = row.get("_links", {})
-        for key, link_obj in links.items():
-            # Skip keys that are plural or are exactly "self".
-            if key == "self" or key.endswith("s"):
-                continue
-            if isinstance(link_obj, dict) and "href" in link_obj:
-                ref_id = extract_id_from_href(link_obj["href"])
-                new_key = f"{key}_id"
-                row[new_key] = ref_id
-        row = flatten_nested_objects(row)
-        return row
+        if not self.selected:
+            return {
+                key: row[key] for key in self.transformer.properties if key in row
+            }
+        return self.transformer.transform(row)
+
+    def conform_record(self, record: dict) -> dict:
+        """Conform a record to the stream schema before it is written.
+
+        Equivalent to the SDK conformance for the flat records of this tap, but driven by
+        the compiled property map: properties which are not in the schema or not selected
+        in the catalog are dropped, and values of boolean properties are made booleans.
+
+        Floats of number properties, which JSON backends without a Decimal hook like
+        orjson decode natively, are made Decimals from their shortest repr: the literal
+        sent by the API, for any value of up to 15 significant digits.
+        """
+        property_types = self.property_types
+        selected_properties = self.selected_properties
+        if self._boolean_properties is None:
+            self._boolean_properties = frozenset(
+                property_name
+                for property_name in selected_properties
+                if property_types[property_name] <= {"boolean", "null"}
+            )
+            self._number_properties = frozenset(
+                property_name
+                for property_name in selected_properties
+                if "number" in property_types[property_name]
+            )
+        boolean_properties = self._boolean_properties
+        number_properties = self._number_properties
+
+        conformed = {}
+        for key, value in record.items():
+            if key in selected_properties:
+                if (
+                    key in boolean_properties
+                    and value is not None
+                    and not isinstance(value, bool)
+                ):
+                    value = value != 0
+                elif key in number_properties and type(value) is float:
+                    value = decimal.Decimal(repr(value))
+                conformed[key] = value
+            elif (
+                key not in property_types
+                and key not in UNFLATTENED_KEYS
+                and key not in self._unmapped_properties
+            ):
+                self._unmapped_properties.add(key)
+                self.logger.warning(
+                    "Properties ('%s',) were present in the '%s' stream but not found "
+                    "in catalog schema. Ignoring.",
+                    key,
+                    self.name,
+                )
+        return conformed
+
+    def _write_schema_message(self) -> None:
+        """Write the SCHEMA message once, rather than once per child context synced."""
+        if not self._schema_written:
+            super()._write_schema_message()
+            self._schema_written = True
+
+    def _generate_record_messages(
+        self, record: dict
+    ) -> t.Generator[singer.RecordMessage, None, None]:
+        """Generate the RECORD messages of a record, conformed with `conform_record`.
+
+        Nothing is generated for unchanged records, when emitting changes only.
+        """
+        record = self.conform_record(record)
+        location_id = location_of(self.context)
+        if self._fingerprints is not None and not self._fingerprints.has_changed(record):
+            self.telemetry.count(self.name, location_id, "skipped")
+            return
+        self.telemetry.count(self.name, location_id, "records")
+        for stream_map in self.stream_maps:
+            mapped_record = stream_map.transform(record)
+            # Emit record if not filtered
+            if mapped_record is not None:
+                yield singer.RecordMessage(
+                    stream=stream_map.stream_alias,
+                    record=mapped_record,
+                    version=None,
+                    time_extracted=utc_now(),
+                )
 
     def validate_response(self, response: requests.Response) -> None:
         """Validate the response from the API.
 
-        If the status code indicates success (200-299), the response is validated by
-        the parent class. Otherwise, a warning is logged for unexpected status codes.
+        Rate limited (429) and server error (5xx) responses are retriable, and the delay
+        requested by a rate limited response pauses every stream. A 400 response whose
+        error blames the page size is retried with a smaller one. Any other non-2xx
+        response is fatal, rather than being parsed as an empty page.
         """
-        status_code = response.status_code
-        if 200 <= status_code < 300:
-            super().validate_response(response)
+        # Sent by `_send`, or else prefetched, which timed the response itself.
+        if self._sent_at is None:
+            latency = response.elapsed.total_seconds()
         else:
-            self.logger.warning(
-                "Received unexpected response status code: %s", status_code
+            latency = time.perf_counter() - self._sent_at
+        self.telemetry.record_request(
+            self.name, location_of(self.context), latency, response_size(response)
+        )
+
+        status_code = response.status_code
+        if status_code == HTTPStatus.NOT_MODIFIED and (
+            "If-None-Match" in response.request.headers
+            or "If-Modified-Since" in response.request.headers
+        ):
+            # Served from the response cache.
+            return
+        if (
+            status_code == HTTPStatus.BAD_REQUEST
+            and request_page_size(response.request) > MIN_PAGE_SIZE
+            and is_page_size_error(response.text)
+        ):
+            raise PageSizeRejectedError(
+                self.response_error_message(response), response
             )
+        delay = rate_limit_delay(response)
+        if status_code == HTTPStatus.TOO_MANY_REQUESTS:
+            self.request_scheduler.record_rate_limited(delay)
+            raise RetriableAPIError(self.response_error_message(response), response)
+        if delay:
+            # Quota spent: hold back the next requests until it resets.
+            self.request_scheduler.pause(delay)
+        if status_code >= HTTPStatus.INTERNAL_SERVER_ERROR:
+            raise RetriableAPIError(self.response_error_message(response), response)
+        if not HTTPStatus.OK <= status_code < HTTPStatus.MULTIPLE_CHOICES:
+            raise FatalAPIError(self.response_error_message(response))
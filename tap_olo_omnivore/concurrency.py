@@ -0,0 +1,260 @@
+"""Concurrent per-location syncing of child streams."""
+
+from __future__ import annotations
+
+import copy
+import threading
+import typing as t
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+from singer_sdk import _singerlib as singer
+from singer_sdk.helpers._state import get_writeable_state_dict
+
+if t.TYPE_CHECKING:
+    from singer_sdk import Stream, Tap
+    from singer_sdk.helpers.types import Context
+
+
+class PartitionTap:
+    """Stand-in for the tap used by the child streams of a single location.
+
+    Messages written by the streams are buffered instead of being written to
+    stdout, and the streams read and write a private state dictionary. Everything
+    else is delegated to the real tap.
+
+    Each STATE message is a checkpoint: the messages buffered so far and a copy of
+    the private state are handed to `on_checkpoint`, if set, to be written.
+    """
+
+    def __init__(self, tap: Tap) -> None:
+        self._tap = tap
+        self.state: dict = {}
+        self.messages: list = []
+        self.on_checkpoint: t.Callable[[list, dict], None] | None = None
+
+    def write_message(self, message: t.Any) -> None:
+        """Buffer a Singer message until the next checkpoint."""
+        self.messages.append(message)
+        if self.on_checkpoint is not None and isinstance(
+            message, singer.StateMessage
+        ):
+            messages, self.messages = self.messages, []
+            self.on_checkpoint(messages, copy.deepcopy(self.state))
+
+    def __getattr__(self, name: str) -> t.Any:
+        return getattr(self._tap, name)
+
+
+def clone_stream(
+    stream: Stream, tap: PartitionTap | Tap, *, children: bool = True
+) -> Stream:
+    """Return a copy of the stream bound to the given tap.
+
+    Its descendents are copied too, unless `children` is false, e.g. for a copy
+    which only requests records.
+    """
+    clone = type(stream)(tap=tap)
+    if stream._tap_input_catalog is not None:
+        clone.apply_catalog(stream._tap_input_catalog)
+    # Carry over settings adjusted after the catalog was applied.
+    clone.replication_key = stream.replication_key
+    clone.forced_replication_method = stream.forced_replication_method
+    clone._metadata = stream.metadata
+    clone._stream_maps = stream.stream_maps
+    if children:
+        clone.child_streams = [
+            clone_stream(child_stream, tap) for child_stream in stream.child_streams
+        ]
+    return clone
+
+
+def iter_descendents(streams: t.Iterable[Stream]) -> t.Iterator[Stream]:
+    """Yield the given streams and all of their descendents."""
+    for stream in streams:
+        yield stream
+        yield from iter_descendents(stream.child_streams)
+
+
+def is_location_partition(partition: dict, location_id: str) -> bool:
+    """Return whether a state partition belongs to the given location."""
+    return partition.get("context", {}).get("location_id") == location_id
+
+
+class LocationExecutor:
+    """Sync the child streams of each location on a bounded thread pool.
+
+    Each worker thread owns a private copy of the child stream tree. The messages
+    of a location are buffered, and written by the calling thread at each of its
+    checkpoints (e.g. a ticket window) and once the whole location has been synced,
+    so the output of different locations is only interleaved between checkpoints.
+    The state partitions of a location are seeded from the tap state, and merged
+    back into it along with the messages.
+    """
+
+    def __init__(self, stream: Stream, max_workers: int) -> None:
+        self.stream = stream
+        self.max_workers = max_workers
+        self._local = threading.local()
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="location",
+        )
+        self._pending: set[Future] = set()
+        # The checkpoints of the workers not written yet, and a future set when
+        # there are any, for the calling thread to wait on along with the locations.
+        self._lock = threading.Lock()
+        self._checkpoints: list[tuple[Context, list, dict]] = []
+        self._checkpointed: Future = Future()
+        # The state partitions of each location, indexed on first use.
+        self._location_states: dict[str, dict] | None = None
+
+    def __enter__(self) -> LocationExecutor:
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.wait()
+        else:
+            for future in self._pending:
+                future.cancel()
+        self._pool.shutdown(wait=True)
+
+    def submit(self, context: Context) -> None:
+        """Schedule the child streams of a location, waiting for a free worker."""
+        while len(self._pending) >= self.max_workers:
+            self._flush(return_when=FIRST_COMPLETED)
+        state = self._partition_state(context["location_id"])
+        self._pending.add(self._pool.submit(self._sync_location, dict(context), state))
+
+    def flush_completed(self) -> None:
+        """Write the checkpoints so far and the output of the locations done syncing."""
+        self._flush(timeout=0)
+
+    def wait(self) -> None:
+        """Wait for all locations and write their output."""
+        while self._pending:
+            self._flush(return_when=FIRST_COMPLETED)
+
+    def _flush(self, **kwargs: t.Any) -> None:
+        done, _ = wait(self._pending | {self._checkpointed}, **kwargs)
+        with self._lock:
+            checkpoints, self._checkpoints = self._checkpoints, []
+            if self._checkpointed.done():
+                self._checkpointed = Future()
+        # The checkpoints of a location are written before its final output.
+        for context, messages, state in checkpoints:
+            self._merge(context, messages, state, {})
+        for future in done & self._pending:
+            self._pending.discard(future)
+            self._merge(*future.result())
+
+    def _checkpoint(self, context: Context, messages: list, state: dict) -> None:
+        """Queue the output of a location so far, from its worker thread."""
+        with self._lock:
+            self._checkpoints.append((context, messages, state))
+            if not self._checkpointed.done():
+                self._checkpointed.set_result(None)
+
+    def _workspace(self) -> tuple[PartitionTap, list[Stream]]:
+        """Return the child stream tree owned by the current worker thread."""
+        if not hasattr(self._local, "child_streams"):
+            partition_tap = PartitionTap(self.stream._tap)
+            self._local.partition_tap = partition_tap
+            self._local.child_streams = [
+                clone_stream(child_stream, partition_tap)
+                for child_stream in self.stream.child_streams
+            ]
+        return self._local.partition_tap, self._local.child_streams
+
+    def _partition_state(self, location_id: str) -> dict:
+        """Return a private state holding the partitions of a location only.
+
+        The partitions of every location are indexed in a single pass over the tap
+        state, rather than scanned again for each location.
+        """
+        if self._location_states is None:
+            self._location_states = self._index_location_states()
+        return self._location_states.pop(location_id, {})
+
+    def _index_location_states(self) -> dict[str, dict]:
+        """Return the private state of each location found in the tap state."""
+        states: dict[str, dict] = {}
+        bookmarks = self.stream.tap_state.get("bookmarks", {})
+        for stream in iter_descendents(self.stream.child_streams):
+            for partition in bookmarks.get(stream.name, {}).get("partitions", []):
+                location_id = partition.get("context", {}).get("location_id")
+                if location_id is None:
+                    continue
+                stream_state = get_writeable_state_dict(
+                    states.setdefault(location_id, {}), stream.name
+                )
+                stream_state.setdefault("partitions", []).append(
+                    copy.deepcopy(partition)
+                )
+        return states
+
+    def _sync_location(self, context: Context, state: dict) -> tuple:
+        """Sync the child streams of a location on the current worker thread.
+
+        Returns the context, the messages buffered since the last checkpoint, the
+        resulting private state and the sync costs of each stream, for the calling
+        thread to merge.
+        """
+        partition_tap, child_streams = self._workspace()
+        partition_tap.state = state
+        partition_tap.messages = []
+        partition_tap.on_checkpoint = lambda messages, snapshot: self._checkpoint(
+            context, messages, snapshot
+        )
+        descendents = list(iter_descendents(child_streams))
+        for stream in descendents:
+            stream._tap_state = state
+            stream._sync_costs = {}
+
+        for child_stream in child_streams:
+            if child_stream.selected or child_stream.has_selected_descendents:
+                child_stream.sync(context=context)
+
+        sync_costs = {stream.name: stream._sync_costs for stream in descendents}
+        return context, partition_tap.messages, state, sync_costs
+
+    def _merge(
+        self,
+        context: Context,
+        messages: list,
+        state: dict,
+        sync_costs: dict[str, dict[str, int]],
+    ) -> None:
+        """Write the buffered output and state of a location from the main thread.
+
+        Called at each checkpoint of the location, with a copy of its state so far,
+        and once it is fully synced.
+        """
+        location_id = context["location_id"]
+        for message in messages:
+            # State is emitted below, once merged with the tap state.
+            if isinstance(message, singer.StateMessage):
+                continue
+            self.stream._tap.write_message(message)
+
+        for stream in iter_descendents(self.stream.child_streams):
+            costs = sync_costs.get(stream.name, {})
+            stream._sync_costs = {
+                key: stream._sync_costs.get(key, 0) + costs.get(key, 0)
+                for key in set(stream._sync_costs) | set(costs)
+            }
+
+            partitions = (
+                state.get("bookmarks", {}).get(stream.name, {}).get("partitions", [])
+            )
+            if not partitions:
+                continue
+            stream_state = get_writeable_state_dict(self.stream.tap_state, stream.name)
+            stream_state["partitions"] = [
+                partition
+                for partition in stream_state.get("partitions", [])
+                if not is_location_partition(partition, location_id)
+            ] + partitions
+
+        self.stream._is_state_flushed = False
+        self.stream._write_state_message()
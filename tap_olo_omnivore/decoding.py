@@ -0,0 +1,110 @@
+"""JSON decoding of API responses."""
+
+from __future__ import annotations
+
+import decimal
+import functools
+import json
+import logging
+import typing as t
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+JSON_DECODERS = ("auto", "stdlib", "msgspec", "orjson")
+
+
+def _stdlib_decoder() -> t.Callable[[bytes], t.Any]:
+    return functools.partial(json.loads, parse_float=decimal.Decimal)
+
+
+def _msgspec_decoder() -> t.Callable[[bytes], t.Any]:
+    import msgspec
+
+    # Floats are handed to Decimal as the literal string, so no precision is lost.
+    return msgspec.json.Decoder(float_hook=decimal.Decimal).decode
+
+
+def _orjson_decoder() -> t.Callable[[bytes], t.Any]:
+    import orjson
+
+    # orjson has no float hook: floats stay native, and those of number properties
+    # are made Decimals when records are conformed to the schema.
+    return orjson.loads
+
+
+_DECODER_FACTORIES: dict[str, t.Callable[[], t.Callable[[bytes], t.Any]]] = {
+    "stdlib": _stdlib_decoder,
+    "msgspec": _msgspec_decoder,
+    "orjson": _orjson_decoder,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def get_decoder(name: str = "stdlib") -> t.Callable[[bytes], t.Any]:
+    """Return the decoding function of the named JSON backend.
+
+    "auto" picks the fastest installed backend. If the requested backend is not
+    installed, the standard library decoder is used instead.
+    """
+    candidates = ("msgspec", "orjson", "stdlib") if name == "auto" else (name, "stdlib")
+    for candidate in candidates:
+        try:
+            decoder = _DECODER_FACTORIES[candidate]()
+        except ImportError:
+            if name != "auto":
+                logger.warning(
+                    "JSON decoder '%s' is not installed, falling back to 'stdlib'.",
+                    candidate,
+                )
+            continue
+        except KeyError:
+            msg = f"Unknown JSON decoder '{candidate}', expected one of {JSON_DECODERS}."
+            raise ValueError(msg) from None
+        return decoder
+    return _stdlib_decoder()
+
+
+def is_streamed(response: requests.Response) -> bool:
+    """Return whether the body of a response is read from the connection as parsed.
+
+    That is a response sent with `stream=True` whose content was not loaded (see
+    `streaming.read_body`).
+    """
+    return response._content is False
+
+
+def response_size(response: requests.Response) -> int:
+    """Return the size of the body of a response, without loading a streamed one.
+
+    The size of a streamed body is only known once it is read: 0 until then.
+    """
+    if is_streamed(response):
+        return getattr(response, "_streamed_size", 0)
+    return len(response.content or b"")
+
+
+def decode_response(response: requests.Response, decoder: str = "stdlib") -> t.Any:
+    """Return the decoded JSON document of a response.
+
+    The document is cached on the response, so the paginator and the stream parsing
+    the same page share a single decode of the body. Floats are decoded as Decimal to
+    preserve monetary precision, except with the orjson backend, whose floats are
+    converted for the number properties of the schema by `conform_record`.
+
+    Raises:
+        requests.exceptions.JSONDecodeError: If the body is not valid JSON.
+    """
+    try:
+        return response._decoded_document
+    except AttributeError:
+        pass
+    decode = get_decoder(decoder)
+    try:
+        document = decode(response.content)
+    except ValueError as e:
+        # Backends raise their own ValueError subclasses.
+        raise requests.exceptions.JSONDecodeError(str(e), "", 0) from e
+    response._decoded_document = document
+    return document
@@ -0,0 +1,115 @@
+"""The locations synced by a run, fetched once and shared by every stream."""
+
+from __future__ import annotations
+
+import logging
+import threading
+import typing as t
+
+logger = logging.getLogger(__name__)
+
+
+def unavailable_reason(record: dict) -> str | None:
+    """Return why the POS of a location cannot be synced, if its record tells.
+
+    That is only an explicit "offline" status. Locations reported unhealthy, or with
+    any other status, are available: the API may still answer for them, e.g. when the
+    health of the agent is degraded.
+    """
+    if record.get("status") == "offline":
+        return "status offline"
+    return None
+
+
+class LocationRegistry:
+    """The locations of the run, requested once from the paged `/locations` list.
+
+    The list is fetched the first time it is needed, by any thread, then filtered
+    locally: to the configured location IDs, in their configured order, and to the
+    locations owned by this process's shard. Configured locations missing from the
+    list are logged and skipped.
+
+    With `skip_unavailable`, locations whose POS is offline (see
+    `unavailable_reason`) are still synced themselves, but their child streams are
+    skipped, and their bookmarks left as they are for the next run.
+    """
+
+    def __init__(
+        self,
+        fetch: t.Callable[[], t.Iterable[dict]],
+        *,
+        location_ids: t.Iterable[str] | None = None,
+        owns_location: t.Callable[[str], bool] | None = None,
+        skip_unavailable: bool = False,
+    ) -> None:
+        self._fetch = fetch
+        self._location_ids = list(dict.fromkeys(location_ids)) if location_ids else None
+        self._owns_location = owns_location
+        self._skip_unavailable = skip_unavailable
+        self._lock = threading.Lock()
+        self._locations: list[dict] | None = None
+        self._unavailable: dict[str, str] = {}
+
+    @property
+    def locations(self) -> list[dict]:
+        """Return the location records to sync, fetching them on first use."""
+        self._load()
+        return self._locations
+
+    @property
+    def unavailable(self) -> dict[str, str]:
+        """Return the reason each skipped location is unavailable, by location ID."""
+        self._load()
+        return self._unavailable
+
+    def is_available(self, location_id: str) -> bool:
+        """Return whether the child streams of a location are synced."""
+        return location_id not in self.unavailable
+
+    def _load(self) -> None:
+        with self._lock:
+            if self._locations is None:
+                self._locations = self._select(list(self._fetch()))
+                if self._skip_unavailable:
+                    self._unavailable = {
+                        location["id"]: reason
+                        for location in self._locations
+                        if (reason := unavailable_reason(location)) is not None
+                    }
+                if self._unavailable:
+                    logger.warning(
+                        "Skipping the child streams of %d of %d locations, which are "
+                        "unavailable: %s",
+                        len(self._unavailable),
+                        len(self._locations),
+                        ", ".join(
+                            f"{location_id} ({reason})"
+                            for location_id, reason in self._unavailable.items()
+                        ),
+                    )
+
+    def _select(self, records: list[dict]) -> list[dict]:
+        if self._location_ids is None:
+            selected = records
+        else:
+            by_id = {record.get("id"): record for record in records}
+            missing = [
+                location_id
+                for location_id in self._location_ids
+                if location_id not in by_id
+            ]
+            if missing:
+                logger.warning(
+                    "Configured locations not found in /locations, skipped: %s",
+                    ", ".join(missing),
+                )
+            selected = [
+                by_id[location_id]
+                for location_id in self._location_ids
+                if location_id in by_id
+            ]
+        if self._owns_location is not None:
+            selected = [
+                record for record in selected if self._owns_location(record.get("id"))
+            ]
+        return selected
@@ -1,7 +1,68 @@
 """REST API pagination handling."""
 
+from __future__ import annotations
+
+import re
+import typing as t
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from singer_sdk.exceptions import FatalAPIError
 from singer_sdk.pagination import BaseHATEOASPaginator
 
+from tap_olo_omnivore.decoding import decode_response
+
+if t.TYPE_CHECKING:
+    import requests
+
+# The page size requested unless configured otherwise.
+DEFAULT_PAGE_SIZE = 100
+
+# Rejected page sizes are halved down to this size.
+MIN_PAGE_SIZE = 10
+
+# Phrases of an error body which blame the page size of a request, rather than e.g. a
+# filter, an ID or a rate limit ("rate limit exceeded", "limit reached for account").
+PAGE_SIZE_ERROR = re.compile(
+    r"(?<!rate )\blimit(?: parameter)?(?: is| was)?"
+    r" (?:too|must|should|cannot|can't|may not|exceeds|out of range)"
+    r"|\b(?:max(?:imum)?|invalid) limit\b"
+    r"|page[ _-]?size|per[ _-]?page",
+    re.IGNORECASE,
+)
+
+
+class PageSizeRejectedError(FatalAPIError):
+    """The endpoint rejected the requested page size."""
+
+    def __init__(self, message: str, response: requests.Response) -> None:
+        super().__init__(message)
+        self.response = response
+
+
+def is_page_size_error(message: str) -> bool:
+    """Return whether the error body of a 400 response blames the page size."""
+    return PAGE_SIZE_ERROR.search(message) is not None
+
+
+def smaller_page_size(rejected: int, page_size: int) -> int:
+    """Return the page size to request after `rejected`, about half of it.
+
+    Sizes probed above the configured `page_size` fall back to it rather than below,
+    and no size is halved below `MIN_PAGE_SIZE`.
+    """
+    smaller = max(MIN_PAGE_SIZE, rejected // 2)
+    if rejected > page_size > smaller:
+        return page_size
+    return smaller
+
+
+def set_page_size(url: str, page_size: int) -> str:
+    """Return the URL with its `limit` parameter replaced by the given page size."""
+    parts = urlsplit(url)
+    params = [(key, value) for key, value in parse_qsl(parts.query) if key != "limit"]
+    params.append(("limit", str(page_size)))
+    return urlunsplit(parts._replace(query=urlencode(params)))
+
 
 class CustomHATEOASPaginator(BaseHATEOASPaginator):
     """Custom paginator for handling pagination in APIs that use HAL+JSON format.
@@ -12,8 +73,11 @@ class CustomHATEOASPaginator(BaseHATEOASPaginator):
     """
 
     def __init__(self, *args, **kwargs):
-        self.max_pagination = kwargs.pop("max_pagination", 10)
+        self.max_pagination = kwargs.pop("max_pagination", None)
+        self.json_decoder = kwargs.pop("json_decoder", "stdlib")
+        self.streaming = kwargs.pop("streaming", False)
         self.page_count = 0
+        self.truncated = False
         super().__init__(*args, **kwargs)
 
     def get_next_url(self, response):
@@ -22,15 +86,25 @@ class CustomHATEOASPaginator(BaseHATEOASPaginator):
         This method looks for the "next" link in the "_links" property of the response.
         If the next link is found, it returns the URL. Otherwise, it returns None.
 
+        Pages are followed to completion, unless `max_pagination` is set, in which case
+        the paginator is flagged as `truncated` when it stops with pages left.
+
         It handles exceptions that may occur while trying to parse the response as JSON.
+        The decoded document is shared with the stream parsing the same response. When
+        the stream parses responses incrementally, the link is kept from that pass.
         """
-        if self.page_count >= self.max_pagination:
-            return None
         self.page_count += 1
-        try:
-            json_response = response.json()
-        except Exception:
-            return None
+        if self.streaming:
+            from tap_olo_omnivore.streaming import find_next_href
 
-        next_url = json_response.get("_links", {}).get("next", {}).get("href")
+            next_url = find_next_href(response)
+        else:
+            try:
+                json_response = decode_response(response, self.json_decoder)
+            except Exception:
+                return None
+            next_url = json_response.get("_links", {}).get("next", {}).get("href")
+        if next_url and self.max_pagination and self.page_count >= self.max_pagination:
+            self.truncated = True
+            return None
         return next_url if next_url else None
@@ -0,0 +1,178 @@
+"""Concurrent prefetching of the first page of child stream requests."""
+
+from __future__ import annotations
+
+import asyncio
+import datetime
+import logging
+import threading
+import time
+import typing as t
+
+import requests
+
+if t.TYPE_CHECKING:
+    from tap_olo_omnivore.throttle import RequestScheduler
+
+logger = logging.getLogger(__name__)
+
+# The number of parent records whose child requests are prefetched together.
+PREFETCH_BATCH_SIZE = 50
+
+
+class Prefetcher:
+    """Sends batches of requests concurrently, on an event loop kept for the run.
+
+    Requests run at most `concurrency` at once, through httpx if it is installed and
+    `use_httpx` is not false, or else through the shared session on worker threads.
+    Each thread syncing locations keeps its event loop, and its httpx client, until
+    `close`: the client's connections are kept alive across batches rather than opened
+    again for each. The httpx clients are built from the session's headers, cookies,
+    auth and TLS settings, and send through `transport` if given, e.g. an
+    `httpx.MockTransport`. Thread safe.
+    """
+
+    def __init__(
+        self,
+        session: requests.Session,
+        scheduler: RequestScheduler,
+        *,
+        concurrency: int,
+        use_httpx: bool | None = None,
+        transport: t.Any | None = None,
+    ) -> None:
+        self.session = session
+        self.scheduler = scheduler
+        self.concurrency = max(1, concurrency)
+        self.use_httpx = use_httpx
+        self.transport = transport
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._loops: list[tuple[asyncio.AbstractEventLoop, t.Any]] = []
+
+    def fetch_all(
+        self,
+        prepared_requests: list[requests.PreparedRequest],
+        *,
+        timeout: float,
+    ) -> list[requests.Response | None]:
+        """Send the requests concurrently and return their responses, in order.
+
+        Each request waits for the shared request scheduler. Requests which fail to be
+        sent return None, to be sent again by the caller.
+        """
+        if not prepared_requests:
+            return []
+        loop, client = self._event_loop()
+        return loop.run_until_complete(
+            self._fetch_all(prepared_requests, client, timeout)
+        )
+
+    def close(self) -> None:
+        """Close the clients and event loops of every thread."""
+        with self._lock:
+            loops, self._loops = self._loops, []
+        for loop, client in loops:
+            if client is not None:
+                loop.run_until_complete(client.aclose())
+            loop.run_until_complete(loop.shutdown_default_executor())
+            loop.close()
+        self._local = threading.local()
+
+    def _event_loop(self) -> tuple[asyncio.AbstractEventLoop, t.Any]:
+        """Return the event loop and the httpx client, if any, of the current thread."""
+        if getattr(self._local, "loop", None) is None:
+            loop = asyncio.new_event_loop()
+            client = self._new_client() if self.use_httpx is not False else None
+            self._local.loop, self._local.client = loop, client
+            with self._lock:
+                self._loops.append((loop, client))
+        return self._local.loop, self._local.client
+
+    def _new_client(self) -> t.Any:
+        """Return an httpx client configured like the session, or None without httpx.
+
+        Authenticators of the streams are applied to the prepared requests, whose
+        headers are sent as they are. Only basic auth credentials of the session itself
+        carry over.
+        """
+        try:
+            import httpx
+        except ImportError:
+            if self.use_httpx:
+                logger.warning("httpx is not installed, prefetching on threads.")
+            return None
+        session = self.session
+        options: dict[str, t.Any] = {}
+        if isinstance(session.auth, tuple):
+            options["auth"] = session.auth
+        if session.cert:
+            options["cert"] = session.cert
+        return httpx.AsyncClient(
+            headers=dict(session.headers),
+            cookies=dict(session.cookies),
+            verify=session.verify,
+            trust_env=session.trust_env,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=self.concurrency),
+            transport=self.transport,
+            **options,
+        )
+
+    async def _fetch_all(
+        self,
+        prepared_requests: list[requests.PreparedRequest],
+        client: t.Any,
+        timeout: float,
+    ) -> list[requests.Response | None]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch(
+            prepared_request: requests.PreparedRequest,
+        ) -> requests.Response | None:
+            async with semaphore:
+                await asyncio.to_thread(self.scheduler.acquire)
+                try:
+                    if client is None:
+                        return await asyncio.to_thread(
+                            self.session.send, prepared_request, timeout=timeout
+                        )
+                    started_at = time.perf_counter()
+                    response = await client.request(
+                        prepared_request.method,
+                        prepared_request.url,
+                        headers=dict(prepared_request.headers),
+                        timeout=timeout,
+                    )
+                    return to_requests_response(
+                        response,
+                        prepared_request,
+                        datetime.timedelta(seconds=time.perf_counter() - started_at),
+                    )
+                except Exception as e:  # noqa: BLE001
+                    logger.debug("Prefetch of %s failed: %s", prepared_request.url, e)
+                    return None
+
+        return await asyncio.gather(*(fetch(r) for r in prepared_requests))
+
+
+def to_requests_response(
+    response: t.Any,
+    prepared_request: requests.PreparedRequest,
+    elapsed: datetime.timedelta,
+) -> requests.Response:
+    """Return a requests response holding an httpx response, which took `elapsed`.
+
+    The elapsed time is measured by the caller, as httpx only sets its own once the
+    response is closed, which some transports leave to the client.
+    """
+    converted = requests.Response()
+    converted.status_code = response.status_code
+    converted.headers.update(response.headers)
+    converted._content = response.content
+    converted.url = str(response.url)
+    converted.reason = response.reason_phrase
+    converted.request = prepared_request
+    converted.encoding = response.encoding
+    converted.elapsed = elapsed
+    return converted
@@ -0,0 +1,118 @@
+"""Registry of the streams of the tap, imported only when they are used."""
+
+from __future__ import annotations
+
+import importlib
+import typing as t
+
+if t.TYPE_CHECKING:
+    from singer_sdk import Stream
+    from singer_sdk._singerlib import Catalog
+
+# The streams of the tap by name: the module under `tap_olo_omnivore.streams` and the
+# class defining each one, and the name of its parent stream.
+STREAMS: dict[str, tuple[str, str, str | None]] = {
+    "locations": ("locations", "LocationsStream", None),
+    "discounts": ("discounts", "DiscountsStream", "locations"),
+    "employees": ("employees", "EmployeesStream", "locations"),
+    "menu_categories": ("menu_categories", "MenuCategoriesStream", "locations"),
+    "menu_items": ("menu_items", "MenuItemsStream", "locations"),
+    "menu_item_categories": (
+        "menu_item_categories",
+        "MenuItemCategoriesStream",
+        "menu_items",
+    ),
+    "menu_item_option_sets": (
+        "menu_item_option_sets",
+        "MenuItemOptionSetsStream",
+        "menu_items",
+    ),
+    "menu_item_price_levels": (
+        "menu_item_price_levels",
+        "MenuItemPriceLevelsStream",
+        "menu_items",
+    ),
+    "menu_modifier_groups": (
+        "menu_modifier_groups",
+        "MenuModifierGroupsStream",
+        "locations",
+    ),
+    "menu_modifier_group_modifiers": (
+        "menu_modifier_group_modifiers",
+        "MenuModifierGroupModifiersStream",
+        "menu_modifier_groups",
+    ),
+    "menu_modifiers": ("menu_modifiers", "MenuModifiersStream", "locations"),
+    "menu_modifier_categories": (
+        "menu_modifier_categories",
+        "MenuModifierCategoriesStream",
+        "menu_modifiers",
+    ),
+    "menu_modifier_option_sets": (
+        "menu_modifier_option_sets",
+        "MenuModifierOptionSetsStream",
+        "menu_modifiers",
+    ),
+    "menu_modifier_price_levels": (
+        "menu_modifier_price_levels",
+        "MenuModifierPriceLevelsStream",
+        "menu_modifiers",
+    ),
+    "order_types": ("order_types", "OrderTypesStream", "locations"),
+    "revenue_centers": ("revenue_centers", "RevenueCentersStream", "locations"),
+    "tables": ("tables", "TablesStream", "locations"),
+    "tender_types": ("tender_types", "TenderTypesStream", "locations"),
+    "tickets": ("tickets", "TicketsStream", "locations"),
+    "ticket_discounts": ("ticket_discounts", "TicketDiscountsStream", "tickets"),
+    "ticket_items": ("ticket_items", "TicketItemsStream", "tickets"),
+    "ticket_item_discounts": (
+        "ticket_item_discounts",
+        "TicketItemDiscountsStream",
+        "ticket_items",
+    ),
+    "ticket_item_modifiers": (
+        "ticket_item_modifiers",
+        "TicketItemModifiersStream",
+        "ticket_items",
+    ),
+    "ticket_payments": ("ticket_payments", "TicketPaymentsStream", "tickets"),
+    "ticket_service_charges": (
+        "ticket_service_charges",
+        "TicketServiceChargesStream",
+        "tickets",
+    ),
+    "voided_ticket_items": ("voided_ticket_items", "VoidedTicketItemsStream", "tickets"),
+    "voided_ticket_item_modifiers": (
+        "voided_ticket_item_modifiers",
+        "VoidedTicketItemModifiersStream",
+        "voided_ticket_items",
+    ),
+    "void_types": ("void_types", "VoidTypesStream", "locations"),
+}
+
+
+def load_stream_class(name: str) -> type[Stream]:
+    """Import and return the class of the named stream."""
+    module_name, class_name, _ = STREAMS[name]
+    module = importlib.import_module(f"tap_olo_omnivore.streams.{module_name}")
+    return getattr(module, class_name)
+
+
+def required_streams(catalog: Catalog | None) -> list[str]:
+    """Return the names of the streams needed to sync a catalog, in registry order.
+
+    Those are the streams selected in the catalog or missing from it, which the SDK
+    selects by default, and their ancestors, which provide their contexts. Every
+    stream is needed without a catalog, e.g. for discovery.
+    """
+    if catalog is None:
+        return list(STREAMS)
+    needed: set[str] = set()
+    for name in STREAMS:
+        entry = catalog.get_stream(name)
+        if entry is not None and not entry.metadata.resolve_selection()[()]:
+            continue
+        while name is not None and name not in needed:
+            needed.add(name)
+            name = STREAMS[name][2]
+    return [name for name in STREAMS if name in needed]
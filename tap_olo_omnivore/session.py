@@ -0,0 +1,62 @@
+"""The HTTP session shared by all streams of a tap run."""
+
+from __future__ import annotations
+
+import typing as t
+
+import requests
+from requests.adapters import HTTPAdapter
+
+if t.TYPE_CHECKING:
+    import logging
+
+# The minimum number of pooled connections, matching the requests default.
+DEFAULT_POOL_SIZE = 10
+
+
+def build_session(
+    pool_size: int = DEFAULT_POOL_SIZE,
+    *,
+    compression: bool = True,
+) -> requests.Session:
+    """Return a session whose connections are kept alive and reused by every stream.
+
+    The pool holds up to `pool_size` connections per host, so that concurrent
+    streams do not open (and then discard) connections beyond it.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Connection"] = "keep-alive"
+    session.headers["Accept-Encoding"] = "gzip, deflate" if compression else "identity"
+    return session
+
+
+def connection_stats(session: requests.Session) -> dict[str, int]:
+    """Return the number of requests sent and connections opened by a session."""
+    stats = {"requests": 0, "connections": 0}
+    adapters = {id(adapter): adapter for adapter in session.adapters.values()}
+    for adapter in adapters.values():
+        manager = getattr(adapter, "poolmanager", None)
+        if manager is None:
+            continue
+        for key in manager.pools.keys():
+            pool = manager.pools.get(key)
+            if pool is None:
+                continue
+            stats["requests"] += pool.num_requests
+            stats["connections"] += pool.num_connections
+    stats["reused"] = max(0, stats["requests"] - stats["connections"])
+    return stats
+
+
+def log_connection_stats(session: requests.Session, logger: logging.Logger) -> None:
+    """Log how many requests were sent over an already open connection."""
+    stats = connection_stats(session)
+    logger.info(
+        "HTTP requests: %d, connections opened: %d, reused: %d",
+        stats["requests"],
+        stats["connections"],
+        stats["reused"],
+    )
@@ -0,0 +1,136 @@
+"""Sharding of the locations across tap processes, and merging of their states."""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import sys
+import typing as t
+from pathlib import Path
+
+
+def shard_of(location_id: str, shard_count: int) -> int:
+    """Return the shard of a location, by rendezvous hashing of its ID.
+
+    Each location goes to the shard with the highest hash of the pair, so a location
+    only moves when its shard is added or removed, e.g. a quarter of the locations
+    when going from three to four shards.
+    """
+    return max(
+        range(shard_count),
+        key=lambda shard: hashlib.blake2b(
+            f"{shard}:{location_id}".encode(), digest_size=8
+        ).digest(),
+    )
+
+
+def drop_foreign_partitions(
+    state: dict,
+    owns_location: t.Callable[[str], bool],
+) -> int:
+    """Remove the state partitions of the locations owned by other shards.
+
+    Each shard then writes the bookmarks of its own locations only, which
+    `merge_states` combines. Returns the number of partitions removed.
+    """
+    removed = 0
+    for bookmark in state.get("bookmarks", {}).values():
+        partitions = bookmark.get("partitions")
+        if not partitions:
+            continue
+        kept = [
+            partition
+            for partition in partitions
+            if "location_id" not in partition.get("context", {})
+            or owns_location(partition["context"]["location_id"])
+        ]
+        removed += len(partitions) - len(kept)
+        bookmark["partitions"] = kept
+    return removed
+
+
+def _newer(current: dict, candidate: dict) -> bool:
+    """Return whether a bookmark replaces the one merged so far.
+
+    The bookmark with the later replication key value wins, and otherwise the one of
+    the later state.
+    """
+    current_value = current.get("replication_key_value")
+    candidate_value = candidate.get("replication_key_value")
+    if current_value is None or candidate_value is None:
+        return True
+    try:
+        return candidate_value >= current_value
+    except TypeError:
+        return True
+
+
+def merge_states(states: t.Iterable[dict]) -> dict:
+    """Merge the states written by the shards of a sync into one state.
+
+    Partitions are merged by context. A partition found in several states, like the
+    bookmark of a stream without partitions, keeps the later replication key value,
+    or else the value of the later state.
+    """
+    merged: dict = {"bookmarks": {}}
+    partitions: dict[str, dict[str, dict]] = {}
+    for state in states:
+        for stream_name, bookmark in state.get("bookmarks", {}).items():
+            merged_bookmark = merged["bookmarks"].setdefault(stream_name, {})
+            own = {key: value for key, value in bookmark.items() if key != "partitions"}
+            if own and _newer(merged_bookmark, own):
+                merged_bookmark.update(own)
+            stream_partitions = partitions.setdefault(stream_name, {})
+            for partition in bookmark.get("partitions", []):
+                key = json.dumps(partition.get("context", {}), sort_keys=True)
+                current = stream_partitions.get(key)
+                if current is None or _newer(current, partition):
+                    stream_partitions[key] = partition
+    for stream_name, stream_partitions in partitions.items():
+        if stream_partitions:
+            merged["bookmarks"][stream_name]["partitions"] = list(
+                stream_partitions.values()
+            )
+    return merged
+
+
+def read_state(path: str | Path) -> dict:
+    """Read a state file, or the last STATE message of a file of Singer messages."""
+    text = Path(path).read_text(encoding="utf-8")
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    state: dict = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        message = json.loads(line)
+        if message.get("type") == "STATE":
+            state = message["value"]
+    return state
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Merge the state files of the shards of a sync, for the next run."""
+    parser = argparse.ArgumentParser(
+        prog="tap-olo-omnivore-merge-state",
+        description=(
+            "Merge the states written by sharded tap-olo-omnivore processes into one "
+            "state file."
+        ),
+    )
+    parser.add_argument("states", nargs="+", help="state files, one per shard")
+    parser.add_argument("-o", "--output", help="write to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    merged = json.dumps(merge_states(read_state(path) for path in args.states))
+    if args.output:
+        Path(args.output).write_text(merged + "\n", encoding="utf-8")
+    else:
+        sys.stdout.write(merged + "\n")
+
+
+if __name__ == "__main__":
+    main()
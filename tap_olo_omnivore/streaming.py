@@ -0,0 +1,210 @@
+"""Incremental parsing of API responses, for pages too large to decode at once."""
+
+from __future__ import annotations
+
+import functools
+import io
+import logging
+import tempfile
+import typing as t
+
+import requests
+import urllib3
+
+from tap_olo_omnivore.decoding import is_streamed
+
+logger = logging.getLogger(__name__)
+
+# The number of bytes read from the body of a response at a time.
+CHUNK_SIZE = 64 * 1024
+
+# Bodies read ahead of their parse are kept in memory up to this size, then on disk.
+SPOOL_SIZE = 8 * 1024 * 1024
+
+
+@functools.lru_cache(maxsize=None)
+def streaming_available() -> bool:
+    """Return whether ijson is installed, warning once if it is not."""
+    try:
+        import ijson  # noqa: F401
+    except ImportError:
+        logger.warning("ijson is not installed, responses are decoded at once.")
+        return False
+    return True
+
+
+def read_body(response: requests.Response) -> None:
+    """Read the body of a streamed response ahead of its parse, releasing the connection.
+
+    The body is kept in a spooled temporary file, in memory up to `SPOOL_SIZE` and on
+    disk past that, from which `iter_embedded_records` parses it. The connection is
+    thus not left idle in the middle of the body while the records are synced.
+
+    Raises:
+        requests.exceptions.ChunkedEncodingError: If the connection broke while the
+            body was read, as raised by `Response.iter_content`.
+        requests.exceptions.ConnectionError: If reading the body timed out.
+    """
+    raw = response.raw
+    raw.decode_content = True
+    body = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    try:
+        while True:
+            chunk = raw.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            body.write(chunk)
+    except urllib3.exceptions.ProtocolError as e:
+        body.close()
+        raise requests.exceptions.ChunkedEncodingError(e) from e
+    except urllib3.exceptions.ReadTimeoutError as e:
+        body.close()
+        raise requests.exceptions.ConnectionError(e) from e
+    except BaseException:
+        body.close()
+        raise
+    finally:
+        # Released to the pool if read to the end, or else closed.
+        response.close()
+    response._streamed_size = body.tell()
+    response._content_consumed = True
+    body.seek(0)
+    response._spooled_body = body
+
+
+def iter_embedded_records(
+    response: requests.Response,
+    preferred_key: str | None = None,
+) -> t.Iterator[dict]:
+    """Yield the records of a collection under `_embedded`, as they are parsed.
+
+    The collection is `preferred_key` if the document has it, or else the first one,
+    as when the document is decoded at once. The body is parsed in a single pass, read
+    from the connection if the response is streamed, or from the file it was read to
+    by `read_body`: only one record is built at a time, along with the rest of the document, e.g. `_links`. The records of a first
+    collection which is not the preferred one are held until the end of `_embedded`,
+    in case the preferred one follows. Floats are parsed as Decimal, like the standard
+    library decoder does.
+
+    Once parsed, `_links.next.href` is kept for `find_next_href`, and a streamed
+    response is closed, releasing its connection, or its file.
+
+    Raises:
+        LookupError: If the document has no `_embedded` collection, without yielding.
+            The document is then kept for `decode_response`.
+        requests.exceptions.JSONDecodeError: If the body is not valid JSON.
+    """
+    import ijson
+
+    spooled = getattr(response, "_spooled_body", None)
+    streamed = is_streamed(response) and spooled is None
+    if spooled is not None:
+        body = spooled
+    elif streamed:
+        body = response.raw
+        body.decode_content = True
+    else:
+        body = io.BytesIO(response.content)
+
+    # Builds everything but the items of the collections, which are left empty.
+    document = ijson.ObjectBuilder()
+    # The collection being parsed, how its records are handled, and the record built.
+    collection = None
+    action = None
+    record = None
+    depth = 0
+    # The collection whose records are yielded, and the records held back.
+    chosen = None
+    held: list | None = None
+    held_key = None
+    try:
+        for prefix, event, value in ijson.parse(body, buf_size=CHUNK_SIZE):
+            if collection is None:
+                if (
+                    event == "start_array"
+                    and prefix.startswith("_embedded.")
+                    and prefix.count(".") == 1
+                ):
+                    collection = prefix
+                    key = prefix[len("_embedded.") :]
+                    if chosen is not None:
+                        action = "skip"
+                    elif preferred_key is None or key == preferred_key:
+                        chosen, action, held = key, "yield", None
+                    elif held is None:
+                        held, action = [], "hold"
+                        held_key = key
+                    else:
+                        action = "skip"
+                document.event(event, value)
+                continue
+            if prefix == collection and event == "end_array":
+                collection = None
+                document.event(event, value)
+                continue
+            if action == "skip":
+                continue
+            if record is None:
+                record = ijson.ObjectBuilder()
+            record.event(event, value)
+            if event in {"start_map", "start_array"}:
+                depth += 1
+            elif event in {"end_map", "end_array"}:
+                depth -= 1
+            if depth == 0:
+                if action == "yield":
+                    yield record.value
+                else:
+                    held.append(record.value)
+                record = None
+        if streamed:
+            # Read what may follow the document, so that the connection is reused.
+            while body.read(CHUNK_SIZE):
+                pass
+            response._streamed_size = body.tell()
+            response._content_consumed = True
+    except ijson.JSONError as e:
+        raise requests.exceptions.JSONDecodeError(str(e), "", 0) from e
+    finally:
+        if spooled is not None:
+            spooled.close()
+        elif streamed:
+            # Released to the pool if read to the end, or else closed.
+            response.close()
+
+    links = document.value.get("_links") if isinstance(document.value, dict) else None
+    next_link = links.get("next") if isinstance(links, dict) else None
+    response._next_href = (
+        next_link.get("href") if isinstance(next_link, dict) else None
+    )
+
+    if chosen is None and held is not None:
+        chosen = held_key
+        yield from held
+    if chosen is None:
+        response._decoded_document = document.value
+        msg = "The document has no _embedded collection."
+        raise LookupError(msg)
+
+
+def find_next_href(response: requests.Response) -> str | None:
+    """Return the `_links.next.href` of a response without building the document.
+
+    The link of a response parsed by `iter_embedded_records` is kept from that pass.
+    """
+    try:
+        return response._next_href
+    except AttributeError:
+        pass
+    if is_streamed(response) and response._content_consumed:
+        # Read by a parse which did not complete.
+        return None
+    import ijson
+
+    try:
+        hrefs = ijson.items(io.BytesIO(response.content), "_links.next.href")
+        next_href = next(hrefs, None)
+    except ijson.JSONError:
+        next_href = None
+    response._next_href = next_href
+    return next_href
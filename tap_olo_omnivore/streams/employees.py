@@ -10,6 +10,7 @@ class EmployeesStream(OloOmnivoreStream):
     name = "employees"
     primary_keys = ["id", "location_id"]
     replication_key = None
+    cache_ttl = 3600
     parent_stream_type = LocationsStream
 
     @property
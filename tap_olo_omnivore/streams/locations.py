@@ -3,6 +3,7 @@ from __future__ import annotations
 import typing as t
 
 from tap_olo_omnivore.client import OloOmnivoreStream
+from tap_olo_omnivore.concurrency import LocationExecutor
 
 
 class LocationsStream(OloOmnivoreStream):
@@ -12,30 +13,72 @@ class LocationsStream(OloOmnivoreStream):
     path = "/locations"
     primary_keys = ["id"]
     replication_key = None
+    # Short lived, so that location status changes are seen soon.
+    cache_ttl = 15 * 60
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._executor: LocationExecutor | None = None
 
     def get_records(self, context: dict | None) -> t.Iterable[dict]:
         """Return a generator of record-type dictionary objects.
 
-        The optional `context` argument is used to identify a specific slice of the
-        stream if partitioning is required for the stream. Most implementations do not
-        require partitioning and should ignore the `context` argument.
+        If `max_concurrent_locations` is greater than one, the child streams of each
+        location are synced on a pool of worker threads while locations are read.
         """
-        if self.config.get("locations"):
-            for location in self.config["locations"]:
-                self.path = f"/locations/{location['id']}"
-                yield from self.request_records(context)
-        else:
-            self.path = "/locations"
-            yield from self.request_records(context)
+        max_workers = self.config.get("max_concurrent_locations", 1)
+        if max_workers <= 1:
+            yield from self._get_location_records(context)
+            return
+
+        with LocationExecutor(self, max_workers) as executor:
+            self._executor = executor
+            try:
+                for record in self._get_location_records(context):
+                    yield record
+                    executor.flush_completed()
+            finally:
+                self._executor = None
+
+    def _get_location_records(self, context: dict | None) -> t.Iterable[dict]:
+        """Return a generator of location records.
+
+        The locations come from the tap's location registry, which requests the
+        `/locations` list once, then keeps the configured locations of this process's
+        shard.
+        """
+        for record in self._tap.location_registry.locations:
+            # Copied, as the records are shared with the registry.
+            yield dict(record)
+
+    @property
+    def stream_bodies(self) -> bool:
+        """Return False: location responses are decoded at once."""
+        return False
 
     def parse_response(self, response) -> t.Iterable[dict]:
         """Parse the response and return an iterator of result records."""
-        data = response.json()
+        data = self.decode_json(response)
         if "_embedded" in data:
             yield from data["_embedded"]["locations"]
         else:
             yield data
 
+    def _sync_children(self, child_context: dict | None) -> None:
+        """Sync the child streams of a location, on the worker pool if enabled.
+
+        The child streams of a location reported offline are skipped,
+        with their bookmarks, when `skip_unavailable_locations` is enabled.
+        """
+        if child_context is not None and not self._tap.location_registry.is_available(
+            child_context["location_id"]
+        ):
+            return
+        if self._executor is None or child_context is None:
+            super()._sync_children(child_context)
+        else:
+            self._executor.submit(child_context)
+
     def get_child_context(self, record: dict, context: [dict]) -> dict:
         """Return a context dictionary for child streams."""
         return {
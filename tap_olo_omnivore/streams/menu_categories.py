@@ -10,6 +10,8 @@ class MenuCategoriesStream(OloOmnivoreStream):
     name = "menu_categories"
     primary_keys = ["id", "location_id"]
     replication_key = None
+    track_changes = True
+    cache_ttl = 3600
     parent_stream_type = LocationsStream
 
     @property
@@ -10,6 +10,8 @@ class MenuItemPriceLevelsStream(OloOmnivoreStream):
     name = "menu_item_price_levels"
     primary_keys = ["id", "location_id"]
     replication_key = None
+    embedded_key = "price_levels"
+    track_changes = True
     parent_stream_type = MenuItemsStream
 
     @property
@@ -10,6 +10,8 @@ class MenuModifierCategoriesStream(OloOmnivoreStream):
     name = "menu_modifier_categories"
     primary_keys = ["id", "location_id"]
     replication_key = None
+    embedded_key = "menu_categories"
+    track_changes = True
     parent_stream_type = MenuModifiersStream
 
     @property
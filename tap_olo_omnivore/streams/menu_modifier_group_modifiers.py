@@ -10,6 +10,8 @@ class MenuModifierGroupModifiersStream(OloOmnivoreStream):
     name = "menu_modifier_group_modifiers"
     primary_keys = ["id", "location_id"]
     replication_key = None
+    embedded_key = "modifiers"
+    track_changes = True
     parent_stream_type = MenuModifierGroupsStream
 
     @property
@@ -10,6 +10,8 @@ class MenuModifierOptionSetsStream(OloOmnivoreStream):
     name = "menu_modifier_option_sets"
     primary_keys = ["id", "location_id"]
     replication_key = None
+    embedded_key = "option_sets"
+    track_changes = True
     parent_stream_type = MenuModifiersStream
 
     @property
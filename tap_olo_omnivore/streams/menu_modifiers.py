@@ -10,6 +10,8 @@ class MenuModifiersStream(OloOmnivoreStream):
     name = "menu_modifiers"
     primary_keys = ["id", "location_id"]
     replication_key = None
+    track_changes = True
+    cache_ttl = 3600
     parent_stream_type = LocationsStream
 
     def get_child_context(self, record: dict, context: [dict]) -> dict:
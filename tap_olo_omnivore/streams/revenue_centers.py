@@ -10,6 +10,7 @@ class RevenueCentersStream(OloOmnivoreStream):
     name = "revenue_centers"
     primary_keys = ["id", "location_id"]
     replication_key = None
+    cache_ttl = 6 * 3600
     parent_stream_type = LocationsStream
 
     @property
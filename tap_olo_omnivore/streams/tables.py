@@ -10,6 +10,7 @@ class TablesStream(OloOmnivoreStream):
     name = "tables"
     primary_keys = ["id", "location_id"]
     replication_key = None
+    cache_ttl = 6 * 3600
     parent_stream_type = LocationsStream
 
     @property
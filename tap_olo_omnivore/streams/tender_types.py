@@ -11,6 +11,7 @@ class TenderTypesStream(OloOmnivoreStream):
     name = "tender_types"
     primary_keys = ["id", "location_id"]
     replication_key = None
+    cache_ttl = 6 * 3600
     parent_stream_type = LocationsStream
 
     @property
@@ -11,6 +11,7 @@ class TicketDiscountsStream(OloOmnivoreStream):
     name = "ticket_discounts"
     primary_keys = ["id", "location_id"]
     replication_key = None
+    embedded_key = "discounts"
     parent_stream_type = TicketsStream
 
     @property
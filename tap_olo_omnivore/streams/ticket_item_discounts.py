@@ -10,6 +10,7 @@ class TicketItemDiscountsStream(OloOmnivoreStream):
     name = "ticket_item_discounts"
     primary_keys = ["id", "location_id"]
     replication_key = None
+    embedded_key = "discounts"
     parent_stream_type = TicketItemsStream
 
     @property
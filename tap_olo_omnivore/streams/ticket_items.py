@@ -11,6 +11,7 @@ class TicketItemsStream(OloOmnivoreStream):
     name = "ticket_items"
     primary_keys = ["id", "location_id"]
     replication_key = None
+    embedded_key = "items"
     parent_stream_type = TicketsStream
 
     def get_child_context(self, record: dict, context: [dict]) -> dict:
@@ -11,6 +11,7 @@ class TicketPaymentsStream(OloOmnivoreStream):
     name = "ticket_payments"
     primary_keys = ["id", "location_id"]
     replication_key = None
+    embedded_key = "payments"
     parent_stream_type = TicketsStream
 
     @property
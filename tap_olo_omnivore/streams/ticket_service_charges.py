@@ -10,6 +10,7 @@ class TicketServiceChargesStream(OloOmnivoreStream):
     name = "ticket_service_charges"
     primary_keys = ["id", "location_id"]
     replication_key = None
+    embedded_key = "service_charges"
     parent_stream_type = TicketsStream
 
     @property
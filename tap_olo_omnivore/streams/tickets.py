@@ -1,8 +1,37 @@
 from __future__ import annotations
 
+import collections
+import queue
+import threading
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+
+from singer_sdk.exceptions import FatalAPIError
+
 from tap_olo_omnivore.client import OloOmnivoreStream
+from tap_olo_omnivore.concurrency import clone_stream
 from tap_olo_omnivore.streams.locations import LocationsStream
 
+# A range of opened_at timestamps, the last one being open ended.
+Window = tuple[int, t.Optional[int]]
+
+# The number of tickets requested ahead of the window being written, across windows.
+MAX_BUFFERED_RECORDS = 5000
+
+
+def split_windows(start: int, end: int, size: int) -> list[Window]:
+    """Split the range from `start` onwards into windows of `size` seconds.
+
+    Windows end at `end`, except the last one which is open ended so that tickets
+    opened while syncing are not missed.
+    """
+    windows: list[Window] = []
+    while start + size < end:
+        windows.append((start, start + size))
+        start += size
+    windows.append((start, None))
+    return windows
+
 
 class TicketsStream(OloOmnivoreStream):
     """Stream for retrieving ticket records from the Omnivore API."""
@@ -12,6 +41,16 @@ class TicketsStream(OloOmnivoreStream):
     replication_key = "opened_at"
     parent_stream_type = LocationsStream
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Overrides the opened_at filter, e.g. with the window being requested.
+        self._where: str | None = None
+        # The single ticket being requested, when refreshing a ticket left open.
+        self._ticket_id: str | None = None
+        # The tickets to refresh if the run stops after the last window checkpoint:
+        # those left open by the previous run, and those found open since.
+        self._checkpoint_open_ticket_ids: set[str] | None = None
+
     def get_child_context(self, record: dict, context: [dict]) -> dict:
         """Return a context dictionary for child streams."""
         return {
@@ -22,4 +61,251 @@ class TicketsStream(OloOmnivoreStream):
     @property
     def path(self) -> str:
         location_id = self.context.get("location_id")
+        if self._ticket_id is not None:
+            return f"/locations/{location_id}/tickets/{self._ticket_id}"
         return f"/locations/{location_id}/tickets"
+
+    def get_url_params(self, context: dict | None, next_page_token) -> dict:
+        """Return URL parameters, filtering on the window being requested if any."""
+        if self._ticket_id is not None:
+            return {}
+        params = super().get_url_params(context, next_page_token)
+        if self._where is not None:
+            params["where"] = self._where
+        return params
+
+    @property
+    def stream_bodies(self) -> bool:
+        """Return whether response bodies are read as parsed, except for one ticket."""
+        return self._ticket_id is None and super().stream_bodies
+
+    def parse_response(self, response) -> t.Iterable[dict]:
+        """Parse the response, which is the ticket itself when requesting one ticket."""
+        if self._ticket_id is None:
+            yield from super().parse_response(response)
+        else:
+            yield self.decode_json(response)
+
+    def window_filter(self, window: Window) -> str:
+        """Return the `where` filter of the tickets opened in a window."""
+        start, end = window
+        where = f"gte({self.replication_key},{start})"
+        if end is not None:
+            where = f"and({where},lt({self.replication_key},{end}))"
+        return where
+
+    def get_windows(self, context: dict | None) -> list[Window] | None:
+        """Return the windows to request, or None if windowed mode is disabled.
+
+        Windowed mode needs `ticket_window_days` and a starting point, either the
+        partition bookmark or `start_date`.
+        """
+        window_days = self.config.get("ticket_window_days")
+        start = self.get_starting_timestamp_value(context)
+        if not window_days or start is None:
+            return None
+        return split_windows(start, int(self.now()), max(1, int(window_days * 86400)))
+
+    def request_records(self, context: dict | None) -> t.Iterable[dict]:
+        """Request the tickets opened since the bookmark, then refresh older tickets.
+
+        With `track_open_tickets`, the IDs of the tickets still open at the end of the
+        run are kept in the partition state, and those tickets are requested again on
+        the next run so that their closing is not missed. With `closed_at_lookback_hours`,
+        the tickets closed within that many hours are requested again too. The tickets
+        left open which could not be requested, as an open circuit cut the partition
+        short, are kept for the next run.
+        """
+        if self._where is not None or self._ticket_id is not None:
+            yield from super().request_records(context)
+            return
+
+        track_open_tickets = self.config.get("track_open_tickets", False)
+        lookback_hours = self.config.get("closed_at_lookback_hours")
+        if not track_open_tickets and not lookback_hours:
+            yield from self._request_opened_records(context)
+            return
+
+        state = self.get_context_state(context)
+        previously_open = state.get("open_ticket_ids", [])
+        seen: set[str] = set()
+        still_open: set[str] = set()
+
+        checkpoint_open = set(previously_open) if track_open_tickets else None
+
+        def track(record: dict) -> bool:
+            ticket_id = record.get("id")
+            if ticket_id in seen:
+                return False
+            seen.add(ticket_id)
+            if record.get("open"):
+                still_open.add(ticket_id)
+                if checkpoint_open is not None:
+                    checkpoint_open.add(ticket_id)
+            return True
+
+        self._checkpoint_open_ticket_ids = checkpoint_open
+        try:
+            for record in self._request_opened_records(context):
+                track(record)
+                yield record
+        finally:
+            self._checkpoint_open_ticket_ids = None
+
+        if lookback_hours:
+            closed_since = int(self.now() - lookback_hours * 3600)
+            self._where = f"gte(closed_at,{closed_since})"
+            try:
+                for record in super().request_records(context):
+                    if track(record):
+                        yield record
+            finally:
+                self._where = None
+
+        if track_open_tickets:
+            refreshed = [
+                ticket_id for ticket_id in previously_open if ticket_id not in seen
+            ]
+            if refreshed:
+                self.logger.info(
+                    "Stream '%s' partition %s: refreshing %d tickets left open.",
+                    self.name,
+                    context,
+                    len(refreshed),
+                )
+            for ticket_id in refreshed:
+                for record in self._request_ticket(context, ticket_id):
+                    if track(record):
+                        yield record
+            if self._cut_short:
+                # Tickets which could not be requested are refreshed by the next run.
+                still_open |= set(previously_open) - seen
+            state["open_ticket_ids"] = sorted(still_open)
+        else:
+            state.pop("open_ticket_ids", None)
+
+    def _request_ticket(self, context: dict | None, ticket_id: str) -> list[dict]:
+        """Request a single ticket, or nothing if it can no longer be requested."""
+        self._ticket_id = ticket_id
+        try:
+            return list(super().request_records(context))
+        except FatalAPIError as e:
+            self.logger.warning("Ticket '%s' could not be refreshed: %s", ticket_id, e)
+            return []
+        finally:
+            self._ticket_id = None
+
+    def _request_opened_records(self, context: dict | None) -> t.Iterable[dict]:
+        """Request the tickets opened since the bookmark, by window in windowed mode.
+
+        Up to `max_concurrent_windows` windows are requested at once. Records are
+        written window by window, in order, and the bookmark is checkpointed at the end
+        of each window, so that an interrupted backfill resumes from there.
+
+        Windows requested ahead of the one being written hold at most
+        `MAX_BUFFERED_RECORDS` records between them, then wait for it to be written.
+
+        Once a window is cut short by an open circuit, no window is checkpointed, and
+        the bookmark is left as it was at the last checkpoint.
+        """
+        windows = self.get_windows(context)
+        if not windows:
+            yield from super().request_records(context)
+            return
+
+        max_workers = max(1, self.config.get("max_concurrent_windows", 4))
+        self.logger.info(
+            "Stream '%s' partition %s: requesting %d windows.",
+            self.name,
+            context,
+            len(windows),
+        )
+        streams: queue.SimpleQueue = queue.SimpleQueue()
+        for _ in range(min(max_workers, len(windows))):
+            # The copies only request records, their children are never synced.
+            streams.put(clone_stream(self, self._tap, children=False))
+
+        condition = threading.Condition()
+        buffers = [collections.deque() for _ in windows]
+        done = [False] * len(windows)
+        # The window being written, the records buffered, and whether to stop.
+        progress = {"written": 0, "buffered": 0, "stopped": False}
+
+        def has_room(index: int) -> bool:
+            return (
+                progress["stopped"]
+                or index == progress["written"]
+                or progress["buffered"] < MAX_BUFFERED_RECORDS
+            )
+
+        def request_window(index: int, window: Window) -> bool:
+            """Request the records of a window, returning whether it was cut short."""
+            stream = streams.get()
+            try:
+                stream.context = context
+                stream._where = self.window_filter(window)
+                stream._cut_short = False
+                for record in stream.request_records(context):
+                    with condition:
+                        condition.wait_for(lambda: has_room(index))
+                        if progress["stopped"]:
+                            return False
+                        buffers[index].append(record)
+                        progress["buffered"] += 1
+                        condition.notify_all()
+                return stream._cut_short
+            finally:
+                stream._where = None
+                streams.put(stream)
+                # The worker threads end with the pool, after this location.
+                self.telemetry.release()
+                with condition:
+                    done[index] = True
+                    condition.notify_all()
+
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            # Windows start in order, so the one being written is always requested.
+            futures = [
+                pool.submit(request_window, index, window)
+                for index, window in enumerate(windows)
+            ]
+            for index, (_, end) in enumerate(windows):
+                while True:
+                    with condition:
+                        condition.wait_for(lambda: buffers[index] or done[index])
+                        records = list(buffers[index])
+                        buffers[index].clear()
+                        progress["buffered"] -= len(records)
+                        condition.notify_all()
+                    if not records:
+                        break
+                    yield from records
+                if futures[index].result():
+                    # Skipped by an open circuit: this window and the later ones are
+                    # requested again by the next run.
+                    self.cut_short(context)
+                if end is not None and not self._cut_short:
+                    self._checkpoint_window(context, end)
+                with condition:
+                    progress["written"] = index + 1
+                    condition.notify_all()
+        finally:
+            with condition:
+                progress["stopped"] = True
+                condition.notify_all()
+            pool.shutdown(cancel_futures=True)
+
+    def _checkpoint_window(self, context: dict | None, end: int) -> None:
+        """Bookmark the end of a window once all its records are written.
+
+        The tickets found open so far are checkpointed along with the bookmark, so
+        that they are refreshed by the next run even if this one is interrupted.
+        """
+        state = self.get_context_state(context)
+        state["replication_key"] = self.replication_key
+        state["replication_key_value"] = end
+        if self._checkpoint_open_ticket_ids is not None:
+            state["open_ticket_ids"] = sorted(self._checkpoint_open_ticket_ids)
+        self._is_state_flushed = False
+        self._write_state_message()
@@ -11,6 +11,7 @@ class VoidedTicketItemModifiersStream(OloOmnivoreStream):
     name = "voided_ticket_item_modifiers"
     primary_keys = ["id", "location_id"]
     replication_key = None
+    embedded_key = "modifiers"
     parent_stream_type = VoidedTicketItemsStream
 
     @property
@@ -2,48 +2,28 @@
 
 from __future__ import annotations
 
+import typing as t
+from functools import cached_property, lru_cache
+
 from singer_sdk import Tap
+from singer_sdk import metrics
 from singer_sdk import typing as th  # JSON schema typing helpers
+from singer_sdk.exceptions import ConfigValidationError
+
+from tap_olo_omnivore.decoding import JSON_DECODERS
+from tap_olo_omnivore.registry import load_stream_class, required_streams
+
+if t.TYPE_CHECKING:
+    import requests
 
-# Import the custom stream types from our streams folder.
-from tap_olo_omnivore.streams.discounts import DiscountsStream
-from tap_olo_omnivore.streams.employees import EmployeesStream
-from tap_olo_omnivore.streams.locations import LocationsStream
-from tap_olo_omnivore.streams.menu_categories import MenuCategoriesStream
-from tap_olo_omnivore.streams.menu_item_categories import MenuItemCategoriesStream
-from tap_olo_omnivore.streams.menu_item_option_sets import MenuItemOptionSetsStream
-from tap_olo_omnivore.streams.menu_item_price_levels import MenuItemPriceLevelsStream
-from tap_olo_omnivore.streams.menu_items import MenuItemsStream
-from tap_olo_omnivore.streams.menu_modifier_categories import (
-    MenuModifierCategoriesStream,
-)
-from tap_olo_omnivore.streams.menu_modifier_group_modifiers import (
-    MenuModifierGroupModifiersStream,
-)
-from tap_olo_omnivore.streams.menu_modifier_groups import MenuModifierGroupsStream
-from tap_olo_omnivore.streams.menu_modifier_option_sets import (
-    MenuModifierOptionSetsStream,
-)
-from tap_olo_omnivore.streams.menu_modifier_price_levels import (
-    MenuModifierPriceLevelsStream,
-)
-from tap_olo_omnivore.streams.menu_modifiers import MenuModifiersStream
-from tap_olo_omnivore.streams.order_types import OrderTypesStream
-from tap_olo_omnivore.streams.revenue_centers import RevenueCentersStream
-from tap_olo_omnivore.streams.tables import TablesStream
-from tap_olo_omnivore.streams.tender_types import TenderTypesStream
-from tap_olo_omnivore.streams.ticket_discounts import TicketDiscountsStream
-from tap_olo_omnivore.streams.ticket_item_discounts import TicketItemDiscountsStream
-from tap_olo_omnivore.streams.ticket_item_modifiers import TicketItemModifiersStream
-from tap_olo_omnivore.streams.ticket_items import TicketItemsStream
-from tap_olo_omnivore.streams.ticket_payments import TicketPaymentsStream
-from tap_olo_omnivore.streams.ticket_service_charges import TicketServiceChargesStream
-from tap_olo_omnivore.streams.tickets import TicketsStream
-from tap_olo_omnivore.streams.void_types import VoidTypesStream
-from tap_olo_omnivore.streams.voided_ticket_item_modifiers import (
-    VoidedTicketItemModifiersStream,
-)
-from tap_olo_omnivore.streams.voided_ticket_items import VoidedTicketItemsStream
+    from tap_olo_omnivore.breaker import CircuitBreaker
+    from tap_olo_omnivore.cache import ResponseCache
+    from tap_olo_omnivore.cassette import Cassette
+    from tap_olo_omnivore.changes import FingerprintStore
+    from tap_olo_omnivore.locations import LocationRegistry
+    from tap_olo_omnivore.prefetch import Prefetcher
+    from tap_olo_omnivore.telemetry import Telemetry
+    from tap_olo_omnivore.throttle import RequestScheduler
 
 
 class TapOloOmnivore(Tap):
@@ -81,53 +61,541 @@ class TapOloOmnivore(Tap):
                 )
             ),
             title="Locations",
-            description="A list of location IDs to sync.",
+            description=(
+                "A list of location IDs to sync, picked from the `/locations` list. "
+                "The list is requested once per run, and cached for 15 minutes "
+                "between runs only if `response_cache_dir` is set."
+            ),
+        ),
+        th.Property(
+            "skip_unavailable_locations",
+            th.BooleanType,
+            default=False,
+            title="Skip Unavailable Locations",
+            description=(
+                "Skip the child streams of locations whose status is offline, keeping "
+                "their bookmarks for the next run. Locations reported unhealthy are "
+                "synced. The location records are synced either way."
+            ),
+        ),
+        th.Property(
+            "shard_count",
+            th.IntegerType,
+            default=1,
+            title="Shard Count",
+            description=(
+                "The number of tap processes the locations are split across, by a "
+                "consistent hash of their IDs. Their states are combined with "
+                "`tap-olo-omnivore-merge-state` for the next run."
+            ),
+        ),
+        th.Property(
+            "shard_index",
+            th.IntegerType,
+            default=0,
+            title="Shard Index",
+            description=(
+                "The shard synced by this process, from 0 to `shard_count` minus one. "
+                "Only its locations are synced, and only their bookmarks are kept in "
+                "the state."
+            ),
+        ),
+        th.Property(
+            "start_date",
+            th.DateTimeType,
+            title="Start Date",
+            description="The earliest ticket opening date to sync when there is no state.",
+        ),
+        th.Property(
+            "ticket_window_days",
+            th.NumberType,
+            title="Ticket Window Days",
+            description=(
+                "Request tickets in windows of this many days of `opened_at`, "
+                "checkpointing the state after each window. Disabled if unset, or "
+                "without state nor `start_date`."
+            ),
+        ),
+        th.Property(
+            "max_concurrent_windows",
+            th.IntegerType,
+            default=4,
+            title="Max Concurrent Windows",
+            description="The number of ticket windows requested at once per location.",
+        ),
+        th.Property(
+            "track_open_tickets",
+            th.BooleanType,
+            default=False,
+            title="Track Open Tickets",
+            description=(
+                "Keep the IDs of the tickets left open in the state, and request them "
+                "again on the next run to pick up their closing."
+            ),
+        ),
+        th.Property(
+            "closed_at_lookback_hours",
+            th.NumberType,
+            title="Closed At Lookback Hours",
+            description=(
+                "Also request the tickets closed within this many hours, whenever they "
+                "were opened. Disabled if unset."
+            ),
+        ),
+        th.Property(
+            "page_size",
+            th.IntegerType,
+            default=100,
+            title="Page Size",
+            description=(
+                "The number of records requested per page. Halved for endpoints which "
+                "reject it."
+            ),
+        ),
+        th.Property(
+            "max_page_size",
+            th.IntegerType,
+            title="Max Page Size",
+            description=(
+                "The largest number of records per page to try. The first request of "
+                "each endpoint asks for this many, halving it down to `page_size` "
+                "while the endpoint rejects it, and the size accepted is used for the "
+                "rest of the run. Disabled if unset."
+            ),
         ),
         th.Property(
             "max_pagination",
             th.IntegerType,
-            default=5,
             title="Max Pagination",
-            description="The maximum number of pages to paginate through.",
+            description=(
+                "The maximum number of pages to paginate through per partition. "
+                "Unlimited if unset."
+            ),
+        ),
+        th.Property(
+            "requests_per_second",
+            th.NumberType,
+            title="Requests Per Second",
+            description=(
+                "The maximum request rate shared by all streams. Unlimited if unset. "
+                "Rate limits signalled by the API are honored either way."
+            ),
+        ),
+        th.Property(
+            "rate_limit_burst",
+            th.IntegerType,
+            default=1,
+            title="Rate Limit Burst",
+            description=(
+                "The number of requests which may be sent at once before "
+                "`requests_per_second` applies."
+            ),
+        ),
+        th.Property(
+            "circuit_breaker_threshold",
+            th.IntegerType,
+            default=5,
+            title="Circuit Breaker Threshold",
+            description=(
+                "The number of consecutive failed attempts (5xx responses, timeouts "
+                "and connection errors, retries included) after which the requests of "
+                "an endpoint at a location are skipped, instead of each being retried "
+                "up to 7 times. Skipped partitions are logged and marked "
+                "`circuit_open` in the state. 0 disables the circuit breaker."
+            ),
+        ),
+        th.Property(
+            "circuit_breaker_cooldown",
+            th.NumberType,
+            default=300,
+            title="Circuit Breaker Cooldown",
+            description=(
+                "The number of seconds an open circuit skips requests for, before one "
+                "request is let through to check whether the endpoint recovered."
+            ),
+        ),
+        th.Property(
+            "max_concurrent_locations",
+            th.IntegerType,
+            default=1,
+            title="Max Concurrent Locations",
+            description=(
+                "The number of locations whose child streams are synced concurrently. "
+                "The output of each location is written at each of its state "
+                "checkpoints, e.g. each ticket window, and once it is fully synced."
+            ),
+        ),
+        th.Property(
+            "http_pool_size",
+            th.IntegerType,
+            title="HTTP Pool Size",
+            description=(
+                "The number of HTTP connections kept alive and shared by all streams. "
+                "Defaults to 10, or if larger to `max_concurrent_locations` times the "
+                "larger of `max_concurrent_windows` (with `ticket_window_days`) and "
+                "`max_concurrent_child_requests`, plus one."
+            ),
+        ),
+        th.Property(
+            "http_compression",
+            th.BooleanType,
+            default=True,
+            title="HTTP Compression",
+            description="Ask for gzip or deflate compressed responses.",
+        ),
+        th.Property(
+            "response_cache_dir",
+            th.StringType,
+            title="Response Cache Directory",
+            description=(
+                "A directory where the responses of slow changing streams (menus, "
+                "employees, tables, ...) are cached between runs. Disabled if unset."
+            ),
+        ),
+        th.Property(
+            "cache_ttls",
+            th.ObjectType(),
+            title="Cache TTLs",
+            description=(
+                "Seconds for which cached responses are used without asking the API, "
+                "by stream name, overriding the defaults. Past that, responses are "
+                "revalidated with the API. Only used if `response_cache_dir` is set."
+            ),
+        ),
+        th.Property(
+            "emit_changes_only",
+            th.BooleanType,
+            default=False,
+            title="Emit Changes Only",
+            description=(
+                "Only write the menu records which are new or changed since the last "
+                "run, from fingerprints of the records kept in `fingerprints_dir`."
+            ),
+        ),
+        th.Property(
+            "fingerprints_dir",
+            th.StringType,
+            title="Fingerprints Directory",
+            description=(
+                "A directory where the fingerprints of the menu records are kept "
+                "between runs, one file per stream and location. Required with "
+                "`emit_changes_only`. The state only records the version of each file."
+            ),
+        ),
+        th.Property(
+            "emit_tombstones",
+            th.BooleanType,
+            default=False,
+            title="Emit Tombstones",
+            description=(
+                "With `emit_changes_only`, write a record holding the primary key and "
+                "`_sdc_deleted_at` for each menu record which disappeared."
+            ),
+        ),
+        th.Property(
+            "max_concurrent_child_requests",
+            th.IntegerType,
+            default=1,
+            title="Max Concurrent Child Requests",
+            description=(
+                "The number of child stream requests prefetched at once, for batches "
+                "of parent records, on an asyncio event loop kept for the run. Uses "
+                "httpx if installed, with one client per location worker. Records are "
+                "still written in order."
+            ),
+        ),
+        th.Property(
+            "json_decoder",
+            th.StringType,
+            default="stdlib",
+            allowed_values=list(JSON_DECODERS),
+            title="JSON Decoder",
+            description=(
+                "The JSON backend used to decode responses: 'stdlib', 'msgspec', "
+                "'orjson', or 'auto' for the fastest one installed. Falls back to "
+                "'stdlib' when the requested backend is not installed."
+            ),
+        ),
+        th.Property(
+            "streaming_parse",
+            th.BooleanType,
+            default=False,
+            title="Streaming Parse",
+            description=(
+                "Parse the records of each response one at a time, with ijson, "
+                "instead of decoding whole pages. Keeps memory bounded for large "
+                "pages. Ignored if ijson is not installed."
+            ),
+        ),
+        th.Property(
+            "embedded_harvest",
+            th.BooleanType,
+            default=True,
+            title="Embedded Harvest",
+            description=(
+                "Populate ticket and menu child streams from the collections embedded "
+                "in the parent records instead of requesting them once per parent "
+                "record. Missing or truncated collections are still requested."
+            ),
+        ),
+        th.Property(
+            "metrics_file",
+            th.StringType,
+            title="Metrics File",
+            description=(
+                "Write the performance metrics of each stream and location to this "
+                "file at the end of the run: in the Prometheus text format if it ends "
+                "with `.prom`, for a node exporter textfile collector, otherwise as "
+                "JSON. The metrics are logged as METRIC lines either way."
+            ),
+        ),
+        th.Property(
+            "cassette_path",
+            th.StringType,
+            title="Cassette Path",
+            description=(
+                "A ZIP archive where every API response is recorded, or replayed from "
+                "without network, depending on `cassette_mode`. Disabled if unset."
+            ),
+        ),
+        th.Property(
+            "cassette_mode",
+            th.StringType,
+            default="replay",
+            allowed_values=["record", "replay"],
+            title="Cassette Mode",
+            description=(
+                "'record' to record the responses of the run to `cassette_path`, "
+                "replacing it, or 'replay' to serve them from it. Replay with the "
+                "config and state the cassette was recorded with."
+            ),
+        ),
+        th.Property(
+            "cassette_latency_scale",
+            th.NumberType,
+            default=0,
+            title="Cassette Latency Scale",
+            description=(
+                "When replaying, wait for the recorded latency of each response "
+                "multiplied by this factor before serving it: 1 to simulate the "
+                "recorded latencies, 0 to serve responses immediately."
+            ),
         ),
     ).to_dict()
 
+    @classmethod
+    @lru_cache(maxsize=None)
+    def get_plugin_version(cls) -> str:
+        """Return the package version, looked up once rather than once per stream."""
+        return super().get_plugin_version()
+
+    @cached_property
+    def shard(self) -> tuple[int, int] | None:
+        """Return the index of the shard synced and the number of shards, if sharded."""
+        shard_count = self.config.get("shard_count", 1)
+        shard_index = self.config.get("shard_index", 0)
+        if not 0 <= shard_index < max(shard_count, 1):
+            msg = f"shard_index must be between 0 and {shard_count - 1}."
+            raise ConfigValidationError(msg, errors=[msg])
+        return (shard_index, shard_count) if shard_count > 1 else None
+
+    def owns_location(self, location_id: str) -> bool:
+        """Return whether a location is synced by this shard."""
+        if self.shard is None:
+            return True
+        from tap_olo_omnivore.sharding import shard_of
+
+        shard_index, shard_count = self.shard
+        return shard_of(location_id, shard_count) == shard_index
+
+    @cached_property
+    def location_registry(self) -> LocationRegistry:
+        """Return the locations synced by this run, requested once by every stream."""
+        from tap_olo_omnivore.locations import LocationRegistry
+
+        return LocationRegistry(
+            lambda: self.streams["locations"].request_records(None),
+            location_ids=[
+                location["id"] for location in self.config.get("locations") or []
+            ],
+            owns_location=self.owns_location if self.shard is not None else None,
+            skip_unavailable=self.config.get("skip_unavailable_locations", False),
+        )
+
+    def load_state(self, state: dict) -> None:
+        """Load the state, without the bookmarks of the locations of other shards.
+
+        The partitions skipped by an open circuit in the previous run are retried, so
+        their `circuit_open` markers are cleared. The partitions kept per parent record
+        by earlier versions are dropped (see `drop_record_partitions`).
+        """
+        from tap_olo_omnivore.breaker import clear_skipped_partitions
+        from tap_olo_omnivore.sharding import drop_foreign_partitions
+
+        super().load_state(state)
+        clear_skipped_partitions(self.state)
+        for stream in self.streams.values():
+            stream.drop_record_partitions()
+        if self.shard is not None:
+            removed = drop_foreign_partitions(self.state, self.owns_location)
+            self.logger.info(
+                "Shard %d of %d: dropped %d state partitions of other shards.",
+                *self.shard,
+                removed,
+            )
+
+    @cached_property
+    def request_scheduler(self) -> RequestScheduler:
+        """Return the request scheduler shared by all streams."""
+        from tap_olo_omnivore.throttle import RequestScheduler
+
+        return RequestScheduler(
+            requests_per_second=self.config.get("requests_per_second"),
+            burst=self.config.get("rate_limit_burst", 1),
+        )
+
+    @cached_property
+    def circuit_breaker(self) -> CircuitBreaker | None:
+        """Return the circuit breaker shared by all streams, if enabled."""
+        threshold = self.config.get("circuit_breaker_threshold", 5)
+        if threshold <= 0:
+            return None
+        from tap_olo_omnivore.breaker import CircuitBreaker
+
+        return CircuitBreaker(
+            threshold, self.config.get("circuit_breaker_cooldown", 300)
+        )
+
+    @cached_property
+    def telemetry(self) -> Telemetry:
+        """Return the performance metrics shared by all streams."""
+        from tap_olo_omnivore.telemetry import Telemetry
+
+        return Telemetry()
+
+    @cached_property
+    def page_sizes(self) -> dict[str, int]:
+        """Return the page sizes accepted by endpoints which rejected `page_size`."""
+        return {}
+
+    @cached_property
+    def response_cache(self) -> ResponseCache | None:
+        """Return the response cache shared by all streams, if enabled."""
+        directory = self.config.get("response_cache_dir")
+        if not directory:
+            return None
+        from tap_olo_omnivore.cache import ResponseCache
+
+        return ResponseCache(directory, self.config.get("api_key", ""))
+
+    @cached_property
+    def fingerprint_store(self) -> FingerprintStore:
+        """Return the store of the fingerprints of the records, for changes only."""
+        directory = self.config.get("fingerprints_dir")
+        if not directory:
+            msg = "fingerprints_dir is required with emit_changes_only."
+            raise ConfigValidationError(msg, errors=[msg])
+        from tap_olo_omnivore.changes import FingerprintStore
+
+        return FingerprintStore(directory)
+
+    @cached_property
+    def cassette(self) -> Cassette | None:
+        """Return the cassette recording or replaying the responses, if enabled."""
+        path = self.config.get("cassette_path")
+        if not path:
+            return None
+        from tap_olo_omnivore.cassette import Cassette
+
+        return Cassette(
+            path,
+            self.config.get("cassette_mode", "replay"),
+            latency_scale=self.config.get("cassette_latency_scale", 0),
+        )
+
+    @cached_property
+    def requests_session(self) -> requests.Session:
+        """Return the HTTP session shared by all streams."""
+        from tap_olo_omnivore.session import DEFAULT_POOL_SIZE, build_session
+
+        # The requests sent at once by a location worker: its ticket windows, or the
+        # prefetched requests of its child streams.
+        per_location = max(
+            self.config.get("max_concurrent_windows", 4)
+            if self.config.get("ticket_window_days")
+            else 1,
+            self.config.get("max_concurrent_child_requests", 1),
+        )
+        pool_size = self.config.get("http_pool_size") or max(
+            DEFAULT_POOL_SIZE,
+            # Every location worker, plus the main thread.
+            self.config.get("max_concurrent_locations", 1) * per_location + 1,
+        )
+        return build_session(
+            pool_size,
+            compression=self.config.get("http_compression", True),
+        )
+
+    @cached_property
+    def prefetcher(self) -> Prefetcher:
+        """Return the prefetcher of child stream requests shared by all streams."""
+        from tap_olo_omnivore.prefetch import Prefetcher
+
+        return Prefetcher(
+            self.requests_session,
+            self.request_scheduler,
+            concurrency=self.config.get("max_concurrent_child_requests", 1),
+        )
+
+    def sync_all(self) -> None:  # type: ignore[misc]
+        """Sync all streams, then log the request, connection and stream metrics."""
+        from tap_olo_omnivore.session import log_connection_stats
+
+        if self.config.get("emit_changes_only", False):
+            # Fails before syncing without a fingerprints directory.
+            _ = self.fingerprint_store
+        passthrough = [
+            stream.name
+            for stream in self.streams.values()
+            if not stream.selected and stream.has_selected_descendents
+        ]
+        if passthrough:
+            self.logger.info(
+                "Streams synced only for their selected children, without writing "
+                "records: %s.",
+                ", ".join(passthrough),
+            )
+        try:
+            super().sync_all()
+        finally:
+            # Keep what was recorded readable, even if the sync failed.
+            if self.cassette is not None:
+                self.cassette.close()
+            if "prefetcher" in self.__dict__:
+                self.prefetcher.close()
+        self.request_scheduler.log_summary(self.logger)
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.log_summary(self.logger)
+        log_connection_stats(self.requests_session, self.logger)
+        if self.response_cache is not None:
+            self.response_cache.log_summary(self.logger)
+        if self.cassette is not None:
+            self.cassette.log_summary(self.logger)
+        self.telemetry.log_metrics(metrics.get_metrics_logger())
+        if self.config.get("metrics_file"):
+            self.telemetry.write(self.config["metrics_file"])
+
     def discover_streams(self) -> list:
         """Return a list of discovered streams.
 
         This enables discovery mode (--discover) to output a catalog of streams,
         their schemas, replication keys, and other metadata.
+
+        When syncing with a catalog, only the streams it needs are imported and
+        created: the selected ones and their parents.
         """
-        return [
-            LocationsStream(tap=self),
-            DiscountsStream(tap=self),
-            EmployeesStream(tap=self),
-            MenuCategoriesStream(tap=self),
-            MenuItemsStream(tap=self),
-            MenuItemCategoriesStream(tap=self),
-            MenuItemOptionSetsStream(tap=self),
-            MenuItemPriceLevelsStream(tap=self),
-            MenuModifierGroupsStream(tap=self),
-            MenuModifierGroupModifiersStream(tap=self),
-            MenuModifiersStream(tap=self),
-            MenuModifierCategoriesStream(tap=self),
-            MenuModifierOptionSetsStream(tap=self),
-            MenuModifierPriceLevelsStream(tap=self),
-            OrderTypesStream(tap=self),
-            RevenueCentersStream(tap=self),
-            TablesStream(tap=self),
-            TenderTypesStream(tap=self),
-            TicketsStream(tap=self),
-            TicketDiscountsStream(tap=self),
-            TicketItemsStream(tap=self),
-            TicketItemDiscountsStream(tap=self),
-            TicketItemModifiersStream(tap=self),
-            TicketPaymentsStream(tap=self),
-            TicketServiceChargesStream(tap=self),
-            VoidedTicketItemsStream(tap=self),
-            VoidedTicketItemModifiersStream(tap=self),
-            VoidTypesStream(tap=self),
-        ]
+        names = required_streams(self.input_catalog)
+        return [load_stream_class(name)(tap=self) for name in names]
 
 
 if __name__ == "__main__":
@@ -0,0 +1,308 @@
+"""Performance metrics of the requests and records of each stream and location."""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+import typing as t
+from pathlib import Path
+
+if t.TYPE_CHECKING:
+    import logging
+
+# The percentiles of request latencies reported.
+PERCENTILES = (50, 95, 99)
+
+# The most request latencies kept for each stream and location, to estimate their
+# percentiles.
+RESERVOIR_SIZE = 1024
+
+# The prefix of the metric names in the Prometheus text format.
+PROMETHEUS_PREFIX = "tap_olo_omnivore"
+
+# The counters kept for each stream and location, with their Prometheus name and
+# help text.
+COUNTERS = {
+    "requests": ("http_requests_total", "Requests sent, retries included."),
+    "retries": ("http_retries_total", "Requests retried."),
+    "circuit_skipped": (
+        "partitions_skipped_total",
+        "Partitions cut short by an open circuit breaker.",
+    ),
+    "bytes": ("http_response_bytes_total", "Response bytes received."),
+    "request_seconds": ("http_request_seconds_total", "Time spent waiting for responses."),
+    "decode_seconds": ("decode_seconds_total", "Time spent decoding JSON."),
+    "post_process_seconds": (
+        "post_process_seconds_total",
+        "Time spent post-processing records.",
+    ),
+    "records": ("records_emitted_total", "Records written."),
+    "skipped": ("records_skipped_total", "Records dropped, or unchanged."),
+}
+
+
+def percentile(samples: list[float], percent: float) -> float:
+    """Return the nearest-rank percentile of sorted samples, or 0 if there are none."""
+    if not samples:
+        return 0.0
+    rank = math.ceil(len(samples) * percent / 100)
+    return samples[min(max(rank, 1), len(samples)) - 1]
+
+
+class Reservoir:
+    """A uniform random sample of at most `RESERVOIR_SIZE` values (algorithm R).
+
+    Every value is kept until there are more, so the percentiles of short runs are
+    exact.
+    """
+
+    def __init__(self) -> None:
+        self.samples: list[float] = []
+        self.count = 0
+
+    def add(self, value: float) -> None:
+        """Add a value to the sample, replacing a random one once full."""
+        self.count += 1
+        if len(self.samples) < RESERVOIR_SIZE:
+            self.samples.append(value)
+            return
+        index = random.randrange(self.count)
+        if index < RESERVOIR_SIZE:
+            self.samples[index] = value
+
+
+class Timer:
+    """Measures the time spent in a block, or in producing the items of an iterable."""
+
+    def __init__(self, add: t.Callable[[float], None]) -> None:
+        self._add = add
+
+    def __enter__(self) -> Timer:
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self._add(time.perf_counter() - self._start)
+
+    def iterate(self, iterable: t.Iterable) -> t.Iterator:
+        """Yield the items of an iterable, timing each step but not their consumers."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self._add(time.perf_counter() - start)
+                return
+            self._add(time.perf_counter() - start)
+            yield item
+
+
+class Telemetry:
+    """Counters and request latencies of every stream, by location.
+
+    Thread safe, for streams synced concurrently. Counters are added to a buffer of
+    the calling thread, without locking, and merged into the shared counters with each
+    response and with `flush`, e.g. once per partition. Threads which are done, e.g.
+    the workers of a pool shut down afterwards, drop their buffer with `release`.
+    Latency percentiles are estimated from a bounded sample of each partition (see
+    `Reservoir`). Reported at the end of the run as Singer METRIC lines, and
+    optionally written to a JSON or Prometheus text file.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters: dict[tuple[str, str | None], dict[str, float]] = {}
+        self._latencies: dict[tuple[str, str | None], Reservoir] = {}
+        self._local = threading.local()
+        # The buffers of the threads not released, by identity, merged by `summary`.
+        self._buffers: dict[int, dict[tuple[str, str | None], dict[str, float]]] = {}
+
+    def _partition(self, key: tuple[str, str | None]) -> dict[str, float]:
+        counters = self._counters.get(key)
+        if counters is None:
+            counters = self._counters[key] = dict.fromkeys(COUNTERS, 0)
+            self._latencies[key] = Reservoir()
+        return counters
+
+    def _buffer(self) -> dict[tuple[str, str | None], dict[str, float]]:
+        """Return the counters of the calling thread not merged yet."""
+        try:
+            return self._local.buffer
+        except AttributeError:
+            buffer = self._local.buffer = {}
+            with self._lock:
+                self._buffers[id(buffer)] = buffer
+            return buffer
+
+    def _merge(self, buffer: dict[tuple[str, str | None], dict[str, float]]) -> None:
+        """Merge the counters of a thread into the shared ones, with the lock held."""
+        for key in list(buffer):
+            partition = self._partition(key)
+            for counter, value in buffer.pop(key).items():
+                partition[counter] += value
+
+    def count(
+        self,
+        stream: str,
+        location_id: str | None,
+        counter: str,
+        value: float = 1,
+    ) -> None:
+        """Add to one of the counters of a stream and location."""
+        buffer = self._buffer()
+        key = (stream, location_id)
+        counters = buffer.get(key)
+        if counters is None:
+            counters = buffer[key] = dict.fromkeys(COUNTERS, 0)
+        counters[counter] += value
+
+    def flush(self) -> None:
+        """Merge the counters of the calling thread into the shared ones."""
+        buffer = self._buffer()
+        if buffer:
+            with self._lock:
+                self._merge(buffer)
+
+    def release(self) -> None:
+        """Merge the counters of the calling thread, and drop its buffer.
+
+        Called by threads which are done counting. A buffer is created again if the
+        thread counts anything later.
+        """
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            return
+        del self._local.buffer
+        with self._lock:
+            self._merge(buffer)
+            del self._buffers[id(buffer)]
+
+    def record_request(
+        self,
+        stream: str,
+        location_id: str | None,
+        seconds: float,
+        size: int,
+    ) -> None:
+        """Count a response, its latency and its size."""
+        key = (stream, location_id)
+        buffer = self._buffer()
+        with self._lock:
+            self._merge(buffer)
+            counters = self._partition(key)
+            counters["requests"] += 1
+            counters["bytes"] += size
+            counters["request_seconds"] += seconds
+            self._latencies[key].add(seconds)
+
+    def timer(self, stream: str, location_id: str | None, counter: str) -> Timer:
+        """Return a timer adding the time measured to a counter."""
+        return Timer(lambda seconds: self.count(stream, location_id, counter, seconds))
+
+    def summary(self) -> list[dict]:
+        """Return the counters and latency percentiles of each stream and location.
+
+        Partitions are sorted by the time spent waiting for their responses, longest
+        first. The counters of every thread are merged, so the streams are expected to
+        be done.
+        """
+        with self._lock:
+            for buffer in self._buffers.values():
+                self._merge(buffer)
+            partitions = [
+                (key, dict(counters), sorted(self._latencies[key].samples))
+                for key, counters in self._counters.items()
+            ]
+        summary = []
+        for (stream, location_id), counters, latencies in partitions:
+            summary.append(
+                {
+                    "stream": stream,
+                    "location_id": location_id,
+                    **counters,
+                    **{
+                        f"latency_p{percent}": percentile(latencies, percent)
+                        for percent in PERCENTILES
+                    },
+                }
+            )
+        summary.sort(key=lambda partition: -partition["request_seconds"])
+        return summary
+
+    def log_metrics(self, logger: logging.Logger) -> None:
+        """Log the metrics of each stream and location as Singer METRIC lines."""
+        for partition in self.summary():
+            tags = {"stream": partition["stream"]}
+            if partition["location_id"] is not None:
+                tags["location_id"] = partition["location_id"]
+            for name, value in partition.items():
+                if name in {"stream", "location_id"}:
+                    continue
+                metric_type = "timer" if name.startswith("latency") else "counter"
+                point = {"type": metric_type, "metric": name, "value": value, "tags": tags}
+                logger.info("METRIC: %s", json.dumps(point))
+
+    def write(self, path: str | os.PathLike) -> None:
+        """Write the metrics to a file, in the Prometheus text format for `.prom` files.
+
+        Other files are written as a JSON array of the partitions of `summary`. The file
+        is replaced atomically, so that it can be scraped while it is written.
+        """
+        path = Path(path)
+        summary = self.summary()
+        if path.suffix == ".prom":
+            data = to_prometheus(summary)
+        else:
+            data = json.dumps(summary, indent=2) + "\n"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as temp_file:
+                temp_file.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            Path(temp_path).unlink(missing_ok=True)
+            raise
+
+
+def to_prometheus(summary: list[dict]) -> str:
+    """Return the partitions of a summary in the Prometheus text exposition format."""
+
+    def labels(partition: dict, **extra: str) -> str:
+        pairs = {"stream": partition["stream"]}
+        if partition["location_id"] is not None:
+            pairs["location_id"] = partition["location_id"]
+        pairs.update(extra)
+        return "{" + ",".join(
+            f'{key}="{_escape_label(value)}"' for key, value in pairs.items()
+        ) + "}"
+
+    lines = []
+    for counter, (name, help_text) in COUNTERS.items():
+        lines.append(f"# HELP {PROMETHEUS_PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{name} counter")
+        lines.extend(
+            f"{PROMETHEUS_PREFIX}_{name}{labels(partition)} {partition[counter]}"
+            for partition in summary
+        )
+    name = f"{PROMETHEUS_PREFIX}_http_request_duration_seconds"
+    lines.append(f"# HELP {name} Request latencies.")
+    lines.append(f"# TYPE {name} summary")
+    for partition in summary:
+        for percent in PERCENTILES:
+            quantile = labels(partition, quantile=str(percent / 100))
+            lines.append(f"{name}{quantile} {partition[f'latency_p{percent}']}")
+        lines.append(f"{name}_sum{labels(partition)} {partition['request_seconds']}")
+        lines.append(f"{name}_count{labels(partition)} {partition['requests']}")
+    return "\n".join(lines) + "\n"
+
+
+def _escape_label(value: object) -> str:
+    """Escape a Prometheus label value."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
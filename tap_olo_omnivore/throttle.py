@@ -0,0 +1,132 @@
+"""Rate limiting of the requests made by all streams of a tap run."""
+
+from __future__ import annotations
+
+import email.utils
+import threading
+import time
+import typing as t
+
+if t.TYPE_CHECKING:
+    import logging
+
+    import requests
+
+
+def rate_limit_delay(response: requests.Response) -> float | None:
+    """Return how long the API asked us to wait before the next request, if at all.
+
+    Honors the Retry-After header (in seconds or as an HTTP date), then the
+    RateLimit-Reset / X-RateLimit-Reset headers once the remaining quota is spent.
+    A malformed Retry-After header is ignored, leaving the delay to the backoff.
+    """
+    headers = response.headers
+    retry_after = headers.get("Retry-After")
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+        try:
+            retry_at = email.utils.parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, retry_at.timestamp() - time.time())
+
+    for prefix in ("RateLimit", "X-RateLimit"):
+        remaining = headers.get(f"{prefix}-Remaining")
+        reset = headers.get(f"{prefix}-Reset")
+        if remaining is None or reset is None:
+            continue
+        try:
+            if float(remaining) > 0:
+                return None
+            reset_value = float(reset)
+        except ValueError:
+            return None
+        # Reset is either a delay in seconds or an epoch timestamp.
+        if reset_value > 1e9:
+            reset_value -= time.time()
+        return max(0.0, reset_value)
+    return None
+
+
+class RequestScheduler:
+    """Token bucket shared by every stream of a tap run.
+
+    Each request takes a token, refilled at `requests_per_second` up to `burst`
+    tokens. When the API signals a rate limit, the whole bucket is paused so that no
+    stream keeps hitting it. Thread safe, for streams synced concurrently.
+    """
+
+    def __init__(self, requests_per_second: float | None = None, burst: int = 1) -> None:
+        self.requests_per_second = requests_per_second
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.counters = {
+            "requests": 0,
+            "rate_limited": 0,
+            "retries": 0,
+            "throttled_seconds": 0.0,
+        }
+
+    def acquire(self) -> float:
+        """Wait for a token and return the time spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                delay = self._paused_until - now
+                if delay <= 0:
+                    delay = self._take_token(now)
+                if delay <= 0:
+                    self.counters["requests"] += 1
+                    self.counters["throttled_seconds"] += waited
+                    return waited
+            time.sleep(delay)
+            waited += delay
+
+    def _take_token(self, now: float) -> float:
+        """Take a token if available, otherwise return the delay until one is."""
+        if not self.requests_per_second:
+            return 0.0
+        elapsed = now - self._updated_at
+        self._tokens = min(self.burst, self._tokens + elapsed * self.requests_per_second)
+        self._updated_at = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.requests_per_second
+
+    def pause(self, seconds: float) -> None:
+        """Hold every request back for the given number of seconds."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def record_rate_limited(self, seconds: float | None) -> None:
+        """Count a rate limited response, pausing requests for the delay it asked."""
+        with self._lock:
+            self.counters["rate_limited"] += 1
+        if seconds:
+            self.pause(seconds)
+
+    def record_retry(self, wait: float, *, throttled: bool) -> None:
+        """Count a retry, and its wait as throttled time if it was rate limited."""
+        with self._lock:
+            self.counters["retries"] += 1
+            if throttled:
+                self.counters["throttled_seconds"] += wait
+
+    def log_summary(self, logger: logging.Logger) -> None:
+        """Log the request and throttling counters of the run."""
+        logger.info(
+            "Requests: %d, rate limited responses: %d, retries: %d, "
+            "time throttled: %.1fs",
+            self.counters["requests"],
+            self.counters["rate_limited"],
+            self.counters["retries"],
+            self.counters["throttled_seconds"],
+        )
@@ -0,0 +1,132 @@
+"""Configuration and fake API shared by the tests."""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import importlib.util
+import io
+import json
+import threading
+import typing as t
+
+import pytest
+import requests
+import urllib3
+
+from tap_olo_omnivore import prefetch
+
+SAMPLE_CONFIG = {
+    "api_key": "xxxxxxxxxxxxxxxxxxxxxxxx",
+    "base_url": "https://api.omnivore.io/1.0",
+}
+
+
+def make_response(
+    status_code: int,
+    document: t.Any,
+    request: requests.PreparedRequest | None = None,
+    *,
+    headers: dict | None = None,
+) -> requests.Response:
+    """Return a response holding a JSON document, or the given bytes."""
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    response._content = (
+        document if isinstance(document, bytes) else json.dumps(document).encode()
+    )
+    if request is not None:
+        response.request = request
+        response.url = request.url
+    return response
+
+
+def stream_response(response: requests.Response) -> requests.Response:
+    """Leave the body of a response to be read from `raw`, as sent with stream=True."""
+    response.raw = urllib3.HTTPResponse(
+        body=io.BytesIO(response.content), preload_content=False
+    )
+    response._content = False
+    return response
+
+
+class FakeAPI:
+    """The Omnivore API, faked for every request sent through a requests session.
+
+    `handler` is called with each request, and returns the JSON document of a 200
+    response, a (status code, document) pair, or a response. It may also raise, e.g.
+    a connection error. The body of a response requested with stream=True is read
+    from `raw`. The requests sent are kept in order. Thread safe.
+    """
+
+    def __init__(self) -> None:
+        self.handler: t.Callable[[requests.PreparedRequest], t.Any] = (
+            lambda request: {"_embedded": {}}
+        )
+        self.requests: list[requests.PreparedRequest] = []
+        self._lock = threading.Lock()
+
+    @property
+    def paths(self) -> list[str]:
+        """Return the path of each request sent, without the query string."""
+        return [request.path_url.split("?", 1)[0] for request in self.requests]
+
+    def send(
+        self, request: requests.PreparedRequest, **kwargs: t.Any
+    ) -> requests.Response:
+        """Answer a request with the response of the handler."""
+        with self._lock:
+            self.requests.append(request)
+        result = self.handler(request)
+        if isinstance(result, requests.Response):
+            result.request = result.request or request
+            response = result
+        else:
+            status_code, document = (
+                result if isinstance(result, tuple) else (200, result)
+            )
+            response = make_response(status_code, document, request)
+        return stream_response(response) if kwargs.get("stream") else response
+
+    def transport(self) -> t.Any:
+        """Return an httpx transport answering the requests of an async client.
+
+        The handler runs on a worker thread, so that requests are answered
+        concurrently.
+        """
+        import httpx
+
+        async def handle(request: httpx.Request) -> httpx.Response:
+            prepared_request = requests.Request(
+                request.method, str(request.url), headers=dict(request.headers)
+            ).prepare()
+            response = await asyncio.to_thread(self.send, prepared_request)
+            # The content of the response is already decoded.
+            headers = {
+                key: value
+                for key, value in response.headers.items()
+                if key.lower() not in {"content-encoding", "content-length"}
+            }
+            return httpx.Response(
+                response.status_code, headers=headers, content=response.content
+            )
+
+        return httpx.MockTransport(handle)
+
+
+@pytest.fixture
+def fake_api(monkeypatch: pytest.MonkeyPatch) -> FakeAPI:
+    """Return the fake API answering every request sent during the test.
+
+    Requests prefetched through httpx, if installed, are answered too.
+    """
+    api = FakeAPI()
+    monkeypatch.setattr(requests.Session, "send", api.send)
+    if importlib.util.find_spec("httpx") is not None:
+        monkeypatch.setattr(
+            prefetch,
+            "Prefetcher",
+            functools.partial(prefetch.Prefetcher, transport=api.transport()),
+        )
+    return api
@@ -0,0 +1,131 @@
+"""Tests for the circuit breaker of failing endpoints."""
+
+from __future__ import annotations
+
+import json
+import time
+
+import pytest
+from singer_sdk.exceptions import FatalAPIError
+
+from tap_olo_omnivore.breaker import CircuitBreaker, CircuitOpenError
+from tap_olo_omnivore.concurrency import iter_descendents
+from tap_olo_omnivore.tap import TapOloOmnivore
+from tests.conftest import SAMPLE_CONFIG, FakeAPI
+
+KEY = ("L1", "employees")
+
+
+def test_circuit_breaker():
+    now = [0.0]
+    breaker = CircuitBreaker(3, 10, clock=lambda: now[0])
+    error = RuntimeError("503 Server Error")
+
+    assert not breaker.record_failure(KEY, error)
+    breaker.record_success(KEY)
+    assert [breaker.record_failure(KEY, error) for _ in range(3)] == [
+        False,
+        False,
+        True,
+    ]
+    assert breaker.is_open(KEY)
+    assert not breaker.is_open(("L2", "employees"))
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request(KEY)
+
+    # After the cooldown, one request probes the endpoint while others are skipped.
+    now[0] = 10
+    breaker.before_request(KEY)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request(KEY)
+    assert breaker.record_failure(KEY, error)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request(KEY)
+
+    # A probe which ends without an outcome is released for the next request.
+    now[0] = 20
+    assert breaker.before_request(KEY)
+    breaker.release(KEY)
+    assert breaker.before_request(KEY)
+    breaker.record_success(KEY)
+    assert not breaker.before_request(KEY)
+    assert not breaker.is_open(KEY)
+    assert breaker.skipped == {KEY: 3}
+
+
+@pytest.mark.parametrize("max_concurrent_locations", [1, 2])
+def test_failing_endpoint_skipped(
+    fake_api: FakeAPI, monkeypatch: pytest.MonkeyPatch, max_concurrent_locations: int
+):
+    def handler(request):
+        path = request.path_url.split("?")[0]
+        if path == "/1.0/locations":
+            return {"_embedded": {"locations": [{"id": "L1"}, {"id": "L2"}]}}
+        if path == "/1.0/locations/L1/employees":
+            return 503, {}
+        return {"_embedded": {"employees": [{"id": "1"}]}}
+
+    fake_api.handler = handler
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+    tap = TapOloOmnivore(
+        config={
+            **SAMPLE_CONFIG,
+            "circuit_breaker_threshold": 2,
+            "max_concurrent_locations": max_concurrent_locations,
+        },
+        parse_env_config=False,
+    )
+    stream = tap.streams["locations"]
+    for child in iter_descendents(stream.child_streams):
+        child.selected = child.name == "employees"
+    stream.sync()
+
+    # The second failure opens the circuit, instead of retrying up to 7 times.
+    assert fake_api.paths.count("/1.0/locations/L1/employees") == 2
+    assert fake_api.paths.count("/1.0/locations/L2/employees") == 1
+    employees = tap.streams["employees"]
+    skipped = employees.get_context_state({"location_id": "L1"})["circuit_open"]
+    assert skipped["skipped_requests"] == 1
+    assert "503" in skipped["error"]
+    assert "circuit_open" not in employees.get_context_state({"location_id": "L2"})
+    assert tap.circuit_breaker.skipped == {KEY: 1}
+
+    # The next run retries the skipped partitions.
+    next_tap = TapOloOmnivore(
+        config=SAMPLE_CONFIG, state=tap.state, parse_env_config=False
+    )
+    assert "circuit_open" not in json.dumps(next_tap.state)
+
+
+def test_probe_ending_with_fatal_error_is_released(
+    fake_api: FakeAPI, monkeypatch: pytest.MonkeyPatch
+):
+    statuses = [503, 503, 404, 200]
+
+    def handler(request):
+        status = statuses.pop(0)
+        return status, {"_embedded": {"employees": [{"id": "1"}]}}
+
+    fake_api.handler = handler
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+    tap = TapOloOmnivore(
+        config={**SAMPLE_CONFIG, "circuit_breaker_threshold": 2},
+        parse_env_config=False,
+    )
+    now = [0.0]
+    tap.circuit_breaker._clock = lambda: now[0]
+    stream = tap.streams["employees"]
+    stream.context = {"location_id": "L1"}
+    assert list(stream.request_records(stream.context)) == []
+    assert tap.circuit_breaker.is_open(KEY)
+
+    # The probe fails with a 4xx response, which is not counted: it is released.
+    now[0] = 300
+    with pytest.raises(FatalAPIError):
+        list(stream.request_records(stream.context))
+    assert not tap.circuit_breaker.is_open(KEY)
+
+    # The next request probes the endpoint again, and closes the circuit.
+    assert [record["id"] for record in stream.request_records(stream.context)] == ["1"]
+    assert not tap.circuit_breaker.is_open(KEY)
+    assert fake_api.paths.count("/1.0/locations/L1/employees") == 4
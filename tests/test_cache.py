@@ -0,0 +1,78 @@
+"""Tests for the response cache of slow changing streams."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from tap_olo_omnivore.tap import TapOloOmnivore
+from tests.conftest import SAMPLE_CONFIG, FakeAPI, make_response
+
+BODY = {"_embedded": {"employees": [{"id": "E1"}]}}
+
+
+@pytest.fixture
+def api(fake_api: FakeAPI) -> FakeAPI:
+    def handler(request):
+        if request.headers.get("If-None-Match") == '"v1"':
+            return make_response(304, b"", request)
+        return make_response(200, BODY, request, headers={"ETag": '"v1"'})
+
+    fake_api.handler = handler
+    return fake_api
+
+
+def etags_sent(api: FakeAPI) -> list[str | None]:
+    return [request.headers.get("If-None-Match") for request in api.requests]
+
+
+def request_employees(config: dict) -> tuple[list, TapOloOmnivore]:
+    tap = TapOloOmnivore(config={**SAMPLE_CONFIG, **config}, parse_env_config=False)
+    stream = tap.streams["employees"]
+    stream.context = {"location_id": "L1"}
+    return list(stream.request_records(stream.context)), tap
+
+
+def test_fresh_responses_are_served_from_cache(api: FakeAPI, tmp_path: Path):
+    config = {"response_cache_dir": str(tmp_path)}
+    records, _ = request_employees(config)
+    assert records == [{"id": "E1"}]
+    records, tap = request_employees(config)
+    assert records == [{"id": "E1"}]
+    assert etags_sent(api) == [None]
+    assert tap.response_cache.counters["hits"] == 1
+
+
+def test_stale_responses_are_revalidated(api: FakeAPI, tmp_path: Path):
+    config = {"response_cache_dir": str(tmp_path), "cache_ttls": {"employees": 0}}
+    request_employees(config)
+    records, tap = request_employees(config)
+    assert records == [{"id": "E1"}]
+    assert etags_sent(api) == [None, '"v1"']
+    assert tap.response_cache.counters["not_modified"] == 1
+
+
+def test_uncached_streams(api: FakeAPI, tmp_path: Path):
+    config = {"response_cache_dir": str(tmp_path)}
+    tap = TapOloOmnivore(config={**SAMPLE_CONFIG, **config}, parse_env_config=False)
+    assert tap.streams["tickets"].get_cache_ttl() is None
+    request_employees({})
+    request_employees({})
+    assert etags_sent(api) == [None, None]
+    assert not list(tmp_path.iterdir())
+
+
+def test_accounts_do_not_share_entries(api: FakeAPI, tmp_path: Path):
+    config = {"response_cache_dir": str(tmp_path)}
+    request_employees(config)
+    request_employees({**config, "api_key": "yyyyyyyyyyyyyyyyyyyyyyyy"})
+    assert etags_sent(api) == [None, None]
+    assert [request.headers["Api-Key"] for request in api.requests] == [
+        SAMPLE_CONFIG["api_key"],
+        "yyyyyyyyyyyyyyyyyyyyyyyy",
+    ]
+    # Each account is then served its own entry.
+    _, tap = request_employees({**config, "api_key": "yyyyyyyyyyyyyyyyyyyyyyyy"})
+    assert tap.response_cache.counters["hits"] == 1
+    assert len(api.requests) == 2
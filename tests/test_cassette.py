@@ -0,0 +1,132 @@
+"""Tests for recording and replaying the API responses of a run."""
+
+from __future__ import annotations
+
+import json
+import time
+import zipfile
+
+import pytest
+import requests
+
+from tap_olo_omnivore.cassette import CASSETTE_MODES, INDEX_NAME, CassetteMissError
+from tap_olo_omnivore.tap import TapOloOmnivore
+from tests.conftest import SAMPLE_CONFIG, FakeAPI, make_response
+
+PAGES = [
+    {"_embedded": {"tickets": [{"id": "1", "opened_at": 1}]}},
+    {"_embedded": {"tickets": [{"id": "1", "opened_at": 1}, {"id": "2", "opened_at": 2}]}},
+]
+
+
+def offline(request):
+    raise requests.exceptions.ConnectionError("offline")
+
+
+def sync_tickets(tap: TapOloOmnivore, location_id: str = "L1") -> list[dict]:
+    stream = tap.streams["tickets"]
+    stream.context = {"location_id": location_id}
+    return list(stream.get_records(stream.context))
+
+
+def test_record_and_replay(tmp_path, fake_api: FakeAPI):
+    path = tmp_path / "run.zip"
+    sent = fake_api.requests
+    fake_api.handler = lambda request: make_response(
+        200,
+        PAGES[min(len(sent) - 1, 1)],
+        request,
+        headers={"Content-Encoding": "gzip", "X-RateLimit-Remaining": "10"},
+    )
+
+    config = {**SAMPLE_CONFIG, "cassette_path": str(path), "track_open_tickets": False}
+    recorder = TapOloOmnivore(
+        config={**config, "cassette_mode": "record"}, parse_env_config=False
+    )
+    recorded = [sync_tickets(recorder), sync_tickets(recorder), sync_tickets(recorder)]
+    recorder.cassette.close()
+    assert len(sent) == 3
+    assert "Api-Key" in sent[0].headers
+
+    with zipfile.ZipFile(path) as archive:
+        index = json.loads(archive.read(INDEX_NAME))
+        # Identical bodies are stored once.
+        assert len([name for name in archive.namelist() if name != INDEX_NAME]) == 2
+    (response, *_) = index["responses"]
+    assert response["url"] == sent[0].url
+    assert response["headers"] == {"X-RateLimit-Remaining": "10"}
+    assert "xxxxxxxxxxxxxxxxxxxxxxxx" not in json.dumps(index)
+
+    fake_api.handler = offline
+    player = TapOloOmnivore(config=config, parse_env_config=False)
+    # Responses to the same request are replayed in order, then the last one again.
+    assert [sync_tickets(player) for _ in range(4)] == [*recorded, recorded[-1]]
+    assert player.cassette.served == 4
+
+    with pytest.raises(CassetteMissError):
+        sync_tickets(player, "L2")
+
+
+
+def test_replay_rejected_page_size(tmp_path, fake_api: FakeAPI):
+    path = tmp_path / "run.zip"
+    limits = []
+
+    def handler(request):
+        limit = int(request.url.rsplit("limit=", 1)[1].split("&")[0])
+        limits.append(limit)
+        if limit > 100:
+            return 400, {"error": "limit too large"}
+        return PAGES[0]
+
+    fake_api.handler = handler
+    config = {
+        **SAMPLE_CONFIG,
+        "cassette_path": str(path),
+        "page_size": 400,
+        "track_open_tickets": False,
+    }
+    recorder = TapOloOmnivore(
+        config={**config, "cassette_mode": "record"}, parse_env_config=False
+    )
+    recorded = sync_tickets(recorder)
+    recorder.cassette.close()
+    assert limits == [400, 200, 100]
+
+    fake_api.handler = offline
+    player = TapOloOmnivore(config=config, parse_env_config=False)
+    # The rejections are replayed, and the same page size is negotiated again.
+    assert sync_tickets(player) == recorded
+    assert player.page_sizes == {"tickets": 100}
+
+
+
+def test_replay_closed_at_lookback(tmp_path, fake_api: FakeAPI, monkeypatch):
+    path = tmp_path / "run.zip"
+    fake_api.handler = lambda request: PAGES[0]
+    config = {
+        **SAMPLE_CONFIG,
+        "cassette_path": str(path),
+        "closed_at_lookback_hours": 24,
+        "start_date": str(int(time.time()) - 3 * 86400),
+        "ticket_window_days": 1,
+    }
+    recorder = TapOloOmnivore(
+        config={**config, "cassette_mode": "record"}, parse_env_config=False
+    )
+    recorded = sync_tickets(recorder)
+    recorder.cassette.close()
+    assert any("closed_at" in request.url for request in fake_api.requests)
+
+    # Replayed later: the lookback and the windows start from the recorded clock.
+    fake_api.handler = offline
+    later = time.time() + 2 * 86400
+    monkeypatch.setattr(time, "time", lambda: later)
+    player = TapOloOmnivore(config=config, parse_env_config=False)
+    assert sync_tickets(player) == recorded
+
+
+def test_cassette_modes_setting():
+    # The tap spells the modes out, so that it does not import the cassette module.
+    setting = TapOloOmnivore.config_jsonschema["properties"]["cassette_mode"]
+    assert tuple(setting["enum"]) == CASSETTE_MODES
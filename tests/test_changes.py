@@ -0,0 +1,216 @@
+"""Tests for emitting the new or changed menu records only."""
+
+from __future__ import annotations
+
+import copy
+import json
+import time
+import typing as t
+
+import pytest
+from singer_sdk import _singerlib as singer
+from singer_sdk.exceptions import ConfigValidationError
+
+from tap_olo_omnivore.changes import FingerprintIndex, FingerprintStore
+from tap_olo_omnivore.client import OloOmnivoreStream
+from tap_olo_omnivore.tap import TapOloOmnivore
+from tests.conftest import SAMPLE_CONFIG, FakeAPI
+
+CONFIG = {**SAMPLE_CONFIG, "emit_changes_only": True, "emit_tombstones": True}
+
+MENU_ITEMS: dict[str, dict] = {}
+
+REQUEST_RECORDS = OloOmnivoreStream.request_records
+
+
+def fake_request_records(
+    self: OloOmnivoreStream, context: dict | None
+) -> t.Iterable[dict]:
+    if self.name == "locations":
+        yield {"id": "L1"}
+    elif self.name == "menu_items":
+        yield from copy.deepcopy(list(MENU_ITEMS.values()))
+    elif self.name == "menu_item_price_levels":
+        yield {"id": "1", "price_per_unit": 100}
+
+
+@pytest.fixture(autouse=True)
+def _fake_requests(monkeypatch: pytest.MonkeyPatch, tmp_path):
+    monkeypatch.setattr(OloOmnivoreStream, "request_records", fake_request_records)
+    monkeypatch.setitem(CONFIG, "fingerprints_dir", str(tmp_path))
+
+
+def run_sync(state: dict, messages: list | None = None) -> tuple[list, dict]:
+    tap = TapOloOmnivore(config=CONFIG, state=state, parse_env_config=False)
+    messages = [] if messages is None else messages
+    tap.write_message = messages.append
+    tap.sync_all()
+    records = [
+        (message.stream, message.record)
+        for message in messages
+        if isinstance(message, singer.RecordMessage)
+        and message.stream.startswith("menu_item")
+    ]
+    return records, copy.deepcopy(tap.state)
+
+
+def load_fingerprints(stream: str, partition: dict) -> dict:
+    store = FingerprintStore(CONFIG["fingerprints_dir"])
+    return store.load(stream, "L1", partition["fingerprints_version"])
+
+
+def test_fingerprint_index():
+    scopes: dict = {}
+    index = FingerprintIndex(scopes, "", ["id"])
+    assert index.has_changed({"id": "1", "name": "Burger"})
+    assert not index.has_changed({"id": "1", "name": "Burger"})
+    assert index.has_changed({"id": "1", "name": "Cheeseburger"})
+    index = FingerprintIndex(scopes, "", ["id"])
+    assert index.pop_deleted() == [{"id": "1"}]
+    assert scopes == {"": {}}
+
+
+def test_fingerprint_store(tmp_path):
+    store = FingerprintStore(tmp_path)
+    assert store.load("menu_items", "L1", None) == {}
+    first = store.save("menu_items", "L1", {"": {"A": "1"}}, None)
+    assert store.load("menu_items", "L1", first) == {"": {"A": "1"}}
+    assert store.load("menu_items", "L2", first) == {}
+
+    # A later run keeps the version it read, for a state which was not committed.
+    store = FingerprintStore(tmp_path)
+    second = store.save("menu_items", "L1", {"": {"B": "2"}}, first)
+    assert store.load("menu_items", "L1", first) == {"": {"A": "1"}}
+    assert store.load("menu_items", "L1", second) == {"": {"B": "2"}}
+    third = FingerprintStore(tmp_path).save("menu_items", "L1", {}, second)
+    assert store.load("menu_items", "L1", first) == {}
+    assert store.load("menu_items", "L1", third) == {}
+
+
+def test_fingerprints_dir_required(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.delitem(CONFIG, "fingerprints_dir")
+    with pytest.raises(ConfigValidationError, match="fingerprints_dir"):
+        run_sync({})
+
+
+def test_emit_changes_only():
+    MENU_ITEMS.clear()
+    MENU_ITEMS["A"] = {"id": "A", "name": "Burger", "price_per_unit": 1099}
+    MENU_ITEMS["B"] = {"id": "B", "name": "Fries", "price_per_unit": 399}
+    records, state = run_sync({})
+    assert sorted((stream, record["id"]) for stream, record in records) == [
+        ("menu_item_price_levels", "1"),
+        ("menu_item_price_levels", "1"),
+        ("menu_items", "A"),
+        ("menu_items", "B"),
+    ]
+    (partition,) = state["bookmarks"]["menu_item_price_levels"]["partitions"]
+    assert partition["context"] == {"location_id": "L1"}
+
+    MENU_ITEMS["B"]["price_per_unit"] = 449
+    MENU_ITEMS["C"] = {"id": "C", "name": "Shake", "price_per_unit": 599}
+    records, state = run_sync(state)
+    # Price levels are tracked per menu item, so only those of C are new.
+    assert sorted((stream, record["id"]) for stream, record in records) == [
+        ("menu_item_price_levels", "1"),
+        ("menu_items", "B"),
+        ("menu_items", "C"),
+    ]
+
+    del MENU_ITEMS["B"]
+    records, state = run_sync(state)
+    # The price levels of B are forgotten along with it.
+    child_tombstone, tombstone = sorted(records, key=lambda record: record[0])
+    assert tombstone[0] == "menu_items"
+    assert tombstone[1]["id"] == "B"
+    assert tombstone[1]["location_id"] == "L1"
+    assert tombstone[1]["_sdc_deleted_at"]
+    assert child_tombstone[0] == "menu_item_price_levels"
+    assert child_tombstone[1]["id"] == "1"
+    assert child_tombstone[1]["menu_item_id"] == "B"
+    assert child_tombstone[1]["_sdc_deleted_at"]
+    (partition,) = state["bookmarks"]["menu_item_price_levels"]["partitions"]
+    assert sorted(load_fingerprints("menu_item_price_levels", partition)) == [
+        '{"menu_item_id": "A"}',
+        '{"menu_item_id": "C"}',
+    ]
+
+
+def test_cut_short_context_keeps_fingerprints(
+    fake_api: FakeAPI, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(OloOmnivoreStream, "request_records", REQUEST_RECORDS)
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+    outage = []
+
+    def handler(request):
+        path = request.path_url.split("?")[0]
+        if path == "/1.0/locations":
+            return {"_embedded": {"locations": [{"id": "L1"}]}}
+        if path == "/1.0/locations/L1/menu/categories":
+            categories = [{"id": "1", "name": "Mains"}, {"id": "2", "name": "Sides"}]
+            return 503 if outage else 200, {"_embedded": {"categories": categories}}
+        return {"_embedded": {"records": []}}
+
+    fake_api.handler = handler
+
+    def sync_categories(state: dict) -> tuple[list, dict]:
+        tap = TapOloOmnivore(config=CONFIG, state=state, parse_env_config=False)
+        messages: list = []
+        tap.write_message = messages.append
+        tap.sync_all()
+        records = [
+            message.record
+            for message in messages
+            if isinstance(message, singer.RecordMessage)
+            and message.stream == "menu_categories"
+        ]
+        return records, copy.deepcopy(tap.state)
+
+    records, state = sync_categories({})
+    assert [record["id"] for record in records] == ["1", "2"]
+    (partition,) = state["bookmarks"]["menu_categories"]["partitions"]
+    fingerprints = load_fingerprints("menu_categories", partition)
+    assert len(fingerprints["{}"]) == 2
+
+    # An outage opens the circuit: no tombstones, and the fingerprints are kept.
+    outage.append(True)
+    records, state = sync_categories(state)
+    assert records == []
+    (partition,) = state["bookmarks"]["menu_categories"]["partitions"]
+    assert load_fingerprints("menu_categories", partition) == fingerprints
+    assert partition["circuit_open"]["skipped_requests"] == 1
+
+
+def test_fingerprints_of_earlier_versions_are_read():
+    MENU_ITEMS.clear()
+    MENU_ITEMS["A"] = {"id": "A", "name": "Burger", "price_per_unit": 1099}
+    _, state = run_sync({})
+    (partition,) = state["bookmarks"]["menu_items"]["partitions"]
+    fingerprints = load_fingerprints("menu_items", partition)
+    # As written by earlier versions, with the fingerprints in the state.
+    partition["fingerprints"] = fingerprints
+    del partition["fingerprints_version"]
+
+    records, state = run_sync(state)
+    assert [record for record in records if record[0] == "menu_items"] == []
+    (partition,) = state["bookmarks"]["menu_items"]["partitions"]
+    assert "fingerprints" not in partition
+    assert load_fingerprints("menu_items", partition) == fingerprints
+
+
+def test_state_size_is_bounded():
+    MENU_ITEMS.clear()
+    for number in range(500):
+        MENU_ITEMS[str(number)] = {"id": str(number), "price_per_unit": number}
+    messages: list = []
+    records, _ = run_sync({}, messages)
+    assert len(records) == 1000
+    sizes = [
+        len(json.dumps(message.value))
+        for message in messages
+        if isinstance(message, singer.StateMessage)
+    ]
+    # The fingerprints of the 1000 records are not in the state, so each STATE
+    # message stays small however many records a location has.
+    assert max(sizes) < 5_000
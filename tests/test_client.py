@@ -0,0 +1,197 @@
+"""Tests for the OloOmnivoreStream base class helpers."""
+
+from __future__ import annotations
+
+import decimal
+import json
+
+import pytest
+
+from tap_olo_omnivore import decoding
+from tap_olo_omnivore.client import extract_embedded_collection, load_schema
+from tap_olo_omnivore.concurrency import iter_descendents
+from tap_olo_omnivore.pagination import CustomHATEOASPaginator
+from tap_olo_omnivore.tap import TapOloOmnivore
+from tests.conftest import SAMPLE_CONFIG, make_response
+
+
+TICKET = {
+    "id": "100",
+    "opened_at": 1700000000,
+    "_embedded": {
+        "items": [
+            {"id": "1", "name": "Burger", "price": 1099},
+            {"id": "2", "name": "Fries", "price": 399},
+        ],
+        "payments": {
+            "_links": {"next": {"href": "https://api.omnivore.io/1.0/next"}},
+            "_embedded": {"payments": [{"id": "9"}]},
+        },
+    },
+}
+
+
+@pytest.fixture
+def tap() -> TapOloOmnivore:
+    return TapOloOmnivore(config=SAMPLE_CONFIG, parse_env_config=False)
+
+
+def test_extract_embedded_collection():
+    assert extract_embedded_collection(TICKET, "items") == TICKET["_embedded"]["items"]
+    # Truncated collections carry their own next link.
+    assert extract_embedded_collection(TICKET, "payments") is None
+    assert extract_embedded_collection(TICKET, "discounts") is None
+    wrapped = {"_embedded": {"discounts": {"_embedded": {"discounts": [{"id": "3"}]}}}}
+    assert extract_embedded_collection(wrapped, "discounts") == [{"id": "3"}]
+
+
+def test_embedded_harvest(tap: TapOloOmnivore, monkeypatch: pytest.MonkeyPatch):
+    tickets = tap.streams["tickets"]
+    items = tap.streams["ticket_items"]
+    payments = tap.streams["ticket_payments"]
+    requested = []
+    monkeypatch.setattr(
+        type(payments),
+        "request_records",
+        lambda self, context: requested.append(self.name) or iter([{"id": "9"}]),
+    )
+
+    tickets.context = {"location_id": "L1"}
+    (child_context,) = tickets.generate_child_contexts(TICKET, tickets.context)
+
+    records = list(items.get_records(child_context))
+    assert [record["id"] for record in records] == ["1", "2"]
+    assert all(record["location_id"] == "L1" for record in records)
+    # The parent payload is left untouched.
+    assert "location_id" not in TICKET["_embedded"]["items"][0]
+
+    assert list(payments.get_records(child_context)) == [
+        {"id": "9", "location_id": "L1"}
+    ]
+    assert requested == ["ticket_payments"]
+
+
+def test_response_decoded_once(tap: TapOloOmnivore, monkeypatch: pytest.MonkeyPatch):
+    response = make_response(
+        200,
+        {
+            "_links": {"next": {"href": "https://api.omnivore.io/1.0/next"}},
+            "_embedded": {"tickets": [{"id": "1", "opened_at": 1}]},
+        },
+    )
+    decodes = []
+    monkeypatch.setattr(
+        decoding,
+        "get_decoder",
+        lambda name: lambda body: decodes.append(name) or json.loads(body),
+    )
+
+    records = list(tap.streams["tickets"].parse_response(response))
+    next_url = CustomHATEOASPaginator().get_next_url(response)
+
+    assert records == [{"id": "1", "opened_at": 1}]
+    assert next_url == "https://api.omnivore.io/1.0/next"
+    assert len(decodes) == 1
+
+
+def test_schema_loaded_once(tap: TapOloOmnivore):
+    tickets = tap.streams["tickets"]
+    assert tickets.schema is tickets.schema
+    tickets.schema["properties"].pop("id")
+    # Each stream owns a private copy of the cached schema.
+    assert "id" in load_schema("tickets")["properties"]
+    assert tickets.property_types["open"] == frozenset({"boolean", "null"})
+
+
+def test_conform_record(tap: TapOloOmnivore):
+    tickets = tap.streams["tickets"]
+    record = {"id": "1", "open": 0, "void": None, "_links": {}, "unknown": 1}
+    assert tickets.conform_record(record) == {"id": "1", "open": False, "void": None}
+
+
+def test_conform_record_numbers(tap: TapOloOmnivore):
+    # Floats decoded natively, e.g. by orjson, are written as exact decimals.
+    items = tap.streams["ticket_items"]
+    record = items.conform_record({"id": "1", "quantity": 0.0825})
+    assert record["quantity"] == decimal.Decimal("0.0825")
+    assert isinstance(record["quantity"], decimal.Decimal)
+    assert items.conform_record({"id": "1", "quantity": 2})["quantity"] == 2
+
+
+def test_menu_embedded_harvest(tap: TapOloOmnivore, monkeypatch: pytest.MonkeyPatch):
+    menu_items = tap.streams["menu_items"]
+    price_levels = tap.streams["menu_item_price_levels"]
+    categories = tap.streams["menu_item_categories"]
+    requested = []
+    monkeypatch.setattr(
+        type(categories),
+        "request_records",
+        lambda self, context: requested.append(self.name) or iter([]),
+    )
+    menu_item = {
+        "id": "M1",
+        "name": "Burger",
+        "_embedded": {"price_levels": [{"id": "1", "price_per_unit": 1099}]},
+    }
+
+    menu_items.context = {"location_id": "L1"}
+    (child_context,) = menu_items.generate_child_contexts(menu_item, menu_items.context)
+    assert child_context == {"location_id": "L1", "menu_item_id": "M1"}
+
+    records = list(price_levels.get_records(child_context))
+    assert [record["id"] for record in records] == ["1"]
+    # Categories are not embedded, so they are requested.
+    assert list(categories.get_records(child_context)) == []
+    assert requested == ["menu_item_categories"]
+
+
+def test_child_state_partitioned_by_location(tap: TapOloOmnivore):
+    ticket_items = tap.streams["ticket_items"]
+    state = ticket_items.get_context_state({"location_id": "L1", "ticket_id": "1"})
+    other = ticket_items.get_context_state({"location_id": "L1", "ticket_id": "2"})
+    assert state is other
+    assert state["context"] == {"location_id": "L1"}
+    # Incremental streams keep their own partitioning.
+    assert tap.streams["tickets"].state_partitioning_keys is None
+
+
+def test_record_partitions_dropped():
+    ticket_partition = {"context": {"location_id": "L1", "ticket_id": "1"}}
+    location_partition = {"context": {"location_id": "L1"}}
+    state = {
+        "bookmarks": {
+            "ticket_items": {"partitions": [ticket_partition, location_partition]}
+        }
+    }
+    tap = TapOloOmnivore(config=SAMPLE_CONFIG, state=state, parse_env_config=False)
+    tap.streams["ticket_items"]
+    assert tap.state["bookmarks"]["ticket_items"]["partitions"] == [location_partition]
+
+
+def test_unselected_parent(tap: TapOloOmnivore):
+    tickets = tap.streams["tickets"]
+    items = tap.streams["ticket_items"]
+    for stream in iter_descendents([tickets]):
+        stream.selected = stream is items
+
+    assert tickets.synced_child_streams == [items]
+    record = tickets.post_process(
+        {**TICKET, "_links": {"employee": {"href": "/employees/5"}}, "open": True},
+        {"location_id": "L1"},
+    )
+    # Only the keys and the embedded collections of the synced children are kept.
+    assert record == {
+        "id": "100",
+        "location_id": "L1",
+        "opened_at": 1700000000,
+        "_embedded": TICKET["_embedded"],
+    }
+
+
+def test_schema_written_once(tap: TapOloOmnivore, monkeypatch: pytest.MonkeyPatch):
+    messages = []
+    monkeypatch.setattr(tap, "write_message", messages.append)
+    items = tap.streams["ticket_items"]
+    items._write_schema_message()
+    items._write_schema_message()
+    assert [message.stream for message in messages] == ["ticket_items"]
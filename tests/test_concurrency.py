@@ -0,0 +1,193 @@
+"""Tests for concurrent per-location syncing."""
+
+from __future__ import annotations
+
+import copy
+import json
+import time
+import typing as t
+
+import pytest
+from singer_sdk import _singerlib as singer
+from singer_sdk.exceptions import FatalAPIError
+
+from tap_olo_omnivore.client import OloOmnivoreStream
+from tap_olo_omnivore.tap import TapOloOmnivore
+from tests.conftest import SAMPLE_CONFIG
+
+DAY = 24 * 3600
+
+
+def fake_request_records(
+    self: OloOmnivoreStream, context: dict | None
+) -> t.Iterable[dict]:
+    if self.name == "locations":
+        yield from ({"id": f"L{i}"} for i in range(5))
+    elif self.name == "employees":
+        yield {"id": f"{context['location_id']}-employee"}
+    elif self.name == "tickets":
+        yield {
+            "id": f"{context['location_id']}-ticket",
+            "opened_at": 1700000000,
+            "_embedded": {"items": [{"id": "1"}, {"id": "2"}]},
+        }
+
+
+def run_sync(config: dict, state: dict | None = None) -> tuple[list, dict]:
+    tap = TapOloOmnivore(config=config, state=state, parse_env_config=False)
+    messages: list = []
+    tap.write_message = messages.append
+    tap.sync_all()
+    return messages, tap.state
+
+
+@pytest.fixture(autouse=True)
+def _fake_requests(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(OloOmnivoreStream, "request_records", fake_request_records)
+
+
+def test_concurrent_sync_matches_serial_sync():
+    serial_messages, serial_state = run_sync(SAMPLE_CONFIG)
+    messages, state = run_sync({**SAMPLE_CONFIG, "max_concurrent_locations": 3})
+
+    def records(messages: list) -> list:
+        return sorted(
+            (message.stream, sorted(message.record.items()))
+            for message in messages
+            if isinstance(message, singer.RecordMessage)
+        )
+
+    assert records(messages) == records(serial_messages)
+    assert len(records(messages)) == 5 * 5
+
+    def partitions(state: dict, stream: str) -> list:
+        return sorted(
+            (partition["context"]["location_id"], partition.get("replication_key_value"))
+            for partition in state["bookmarks"][stream]["partitions"]
+        )
+
+    for stream in ("tickets", "employees", "ticket_items"):
+        assert partitions(state, stream) == partitions(serial_state, stream)
+
+
+def test_concurrent_sync_does_not_interleave_locations():
+    messages, _ = run_sync({**SAMPLE_CONFIG, "max_concurrent_locations": 3})
+    # The child records written between two checkpoints belong to one location.
+    blocks: list[set] = [set()]
+    for message in messages:
+        if isinstance(message, singer.StateMessage):
+            blocks.append(set())
+        elif isinstance(message, singer.RecordMessage) and message.stream != "locations":
+            blocks[-1].add(message.record["location_id"])
+    assert all(len(block) <= 1 for block in blocks)
+    assert set().union(*blocks) == {f"L{i}" for i in range(5)}
+
+
+def test_concurrent_sync_writes_window_checkpoints(monkeypatch: pytest.MonkeyPatch):
+    start = int(time.time()) - 3 * DAY - 60
+    windows: list[str] = []
+
+    def failing_request_records(
+        self: OloOmnivoreStream, context: dict | None
+    ) -> t.Iterable[dict]:
+        # The second ticket window of L1 fails, after the first was checkpointed.
+        if self.name == "tickets" and context["location_id"] == "L1":
+            windows.append("L1")
+            if len(windows) == 2:
+                raise FatalAPIError("window failed")
+        yield from fake_request_records(self, context)
+
+    monkeypatch.setattr(OloOmnivoreStream, "request_records", failing_request_records)
+    tap = TapOloOmnivore(
+        config={
+            **SAMPLE_CONFIG,
+            "start_date": str(start),
+            "ticket_window_days": 1,
+            "max_concurrent_locations": 2,
+        },
+        parse_env_config=False,
+    )
+    messages: list = []
+    # State messages hold the live state, which keeps changing.
+    tap.write_message = lambda message: messages.append(copy.deepcopy(message))
+    with pytest.raises(FatalAPIError):
+        tap.sync_all()
+
+    bookmarks = [
+        partition.get("replication_key_value")
+        for message in messages
+        if isinstance(message, singer.StateMessage)
+        for partition in message.value["bookmarks"]
+        .get("tickets", {})
+        .get("partitions", [])
+        if partition["context"]["location_id"] == "L1"
+    ]
+    assert start + DAY in bookmarks
+    assert any(
+        isinstance(message, singer.RecordMessage)
+        and message.stream == "tickets"
+        and message.record["location_id"] == "L1"
+        for message in messages
+    )
+
+
+@pytest.mark.parametrize("max_concurrent_locations", [1, 3])
+def test_record_partitions_of_earlier_states_are_dropped(max_concurrent_locations: int):
+    # As written by earlier versions, with one partition per ticket.
+    state = {
+        "bookmarks": {
+            "tickets": {
+                "partitions": [
+                    {
+                        "context": {"location_id": "L0"},
+                        "replication_key": "opened_at",
+                        "replication_key_value": 1800000000,
+                    }
+                ]
+            },
+            "ticket_items": {
+                "partitions": [
+                    {"context": {"location_id": f"L{i}", "ticket_id": f"L{i}-{n}"}}
+                    for i in range(5)
+                    for n in range(3)
+                ]
+            },
+        }
+    }
+    config = {**SAMPLE_CONFIG, "max_concurrent_locations": max_concurrent_locations}
+    tap = TapOloOmnivore(
+        config=config, state=copy.deepcopy(state), parse_env_config=False
+    )
+    assert tap.state["bookmarks"]["ticket_items"]["partitions"] == []
+    # The bookmarks of incremental streams are kept.
+    assert tap.state["bookmarks"]["tickets"] == state["bookmarks"]["tickets"]
+
+    _, state = run_sync(config, state)
+    partitions = state["bookmarks"]["ticket_items"]["partitions"]
+    assert sorted(partition["context"]["location_id"] for partition in partitions) == [
+        f"L{i}" for i in range(5)
+    ]
+    assert all(set(partition["context"]) == {"location_id"} for partition in partitions)
+
+
+def test_child_state_does_not_grow_with_parent_records(monkeypatch: pytest.MonkeyPatch):
+    def many_tickets(self: OloOmnivoreStream, context: dict | None) -> t.Iterable[dict]:
+        if self.name == "tickets":
+            for n in range(50):
+                yield {
+                    "id": f"{context['location_id']}-{n}",
+                    "opened_at": 1700000000,
+                    "_embedded": {"items": [{"id": "1"}]},
+                }
+        else:
+            yield from fake_request_records(self, context)
+
+    monkeypatch.setattr(OloOmnivoreStream, "request_records", many_tickets)
+    messages, state = run_sync(SAMPLE_CONFIG)
+    assert len(state["bookmarks"]["ticket_items"]["partitions"]) == 5
+    sizes = [
+        len(json.dumps(message.value))
+        for message in messages
+        if isinstance(message, singer.StateMessage)
+    ]
+    assert max(sizes) < 5_000
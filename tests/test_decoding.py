@@ -0,0 +1,49 @@
+"""Tests for JSON decoding of API responses."""
+
+from __future__ import annotations
+
+import decimal
+import importlib.util
+
+import pytest
+import requests
+
+from tap_olo_omnivore import decoding
+from tap_olo_omnivore.decoding import decode_response, get_decoder
+from tests.conftest import make_response
+
+BODY = b'{"_embedded": {"tickets": [{"id": "1", "price": 1099, "rate": 0.0825}]}}'
+
+
+@pytest.mark.parametrize("name", ["stdlib", "msgspec", "orjson"])
+def test_decoders_agree(name: str):
+    if name != "stdlib" and importlib.util.find_spec(name) is None:
+        pytest.skip(f"{name} is not installed")
+    (ticket,) = decode_response(make_response(200, BODY), name)["_embedded"]["tickets"]
+    assert ticket["price"] == 1099
+    assert isinstance(ticket["price"], int)
+    # orjson keeps floats native, whose repr is the literal sent by the API.
+    assert str(ticket["rate"]) == "0.0825"
+
+
+def test_exact_decimals():
+    document = get_decoder("stdlib")(b'{"value": 0.12345678901234567890}')
+    assert document["value"] == decimal.Decimal("0.12345678901234567890")
+
+
+def test_missing_backend_falls_back(monkeypatch: pytest.MonkeyPatch):
+    def missing():
+        raise ImportError
+
+    monkeypatch.setitem(decoding._DECODER_FACTORIES, "msgspec", missing)
+    get_decoder.cache_clear()
+    try:
+        document = get_decoder("msgspec")(b'{"value": 1.5}')
+    finally:
+        get_decoder.cache_clear()
+    assert document == {"value": decimal.Decimal("1.5")}
+
+
+def test_invalid_json():
+    with pytest.raises(requests.exceptions.JSONDecodeError):
+        decode_response(make_response(200, b"<html>"), "stdlib")
@@ -0,0 +1,109 @@
+"""Tests for the registry of the locations synced by a run."""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+
+import pytest
+
+from tap_olo_omnivore.concurrency import iter_descendents
+from tap_olo_omnivore.locations import LocationRegistry, unavailable_reason
+from tap_olo_omnivore.tap import TapOloOmnivore
+from tests.conftest import SAMPLE_CONFIG, FakeAPI
+
+LOCATIONS = [{"id": f"L{i}", "name": f"Location {i}"} for i in range(5)]
+
+
+def test_registry_filters_locally():
+    fetches = []
+
+    def fetch():
+        fetches.append(1)
+        time.sleep(0.01)
+        return iter(LOCATIONS)
+
+    registry = LocationRegistry(
+        fetch,
+        location_ids=["L3", "L1", "L9", "L3"],
+        owns_location=lambda location_id: location_id != "L1",
+    )
+    messages = []
+    handler = logging.Handler()
+    handler.emit = lambda record: messages.append(record.getMessage())
+    logger = logging.getLogger("tap_olo_omnivore.locations")
+    logger.addHandler(handler)
+    try:
+        threads = [threading.Thread(target=lambda: registry.locations) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        logger.removeHandler(handler)
+
+    assert len(fetches) == 1
+    assert registry.locations == [LOCATIONS[3]]
+    assert messages == ["Configured locations not found in /locations, skipped: L9"]
+
+    assert LocationRegistry(lambda: iter(LOCATIONS)).locations == LOCATIONS
+
+
+def test_configured_locations_listed_once(fake_api: FakeAPI):
+    fake_api.handler = lambda request: {"_embedded": {"locations": LOCATIONS}}
+    tap = TapOloOmnivore(
+        config={**SAMPLE_CONFIG, "locations": [{"id": "L4"}, {"id": "L2"}]},
+        parse_env_config=False,
+    )
+    stream = tap.streams["locations"]
+    records = list(stream.get_records(None))
+    assert [record["id"] for record in records] == ["L4", "L2"]
+    assert list(stream.get_records(None)) == records
+    assert [request.path_url for request in fake_api.requests] == [
+        "/1.0/locations?limit=100"
+    ]
+    assert stream.path == "/locations"
+
+
+def test_unavailable_reason():
+    assert unavailable_reason({"id": "L1"}) is None
+    assert unavailable_reason({"status": "online", "health": {"healthy": True}}) is None
+    assert unavailable_reason({"status": "offline"}) == "status offline"
+    # The API may still answer for unhealthy locations.
+    assert unavailable_reason({"status": "online", "health": {"healthy": False}}) is None
+    assert unavailable_reason({"status": "degraded"}) is None
+
+
+@pytest.mark.parametrize("skip_unavailable", [True, False, None])
+def test_unavailable_locations_skipped(
+    fake_api: FakeAPI, skip_unavailable: bool | None
+):
+    locations = [
+        {"id": "L1", "status": "online", "health": {"healthy": False}},
+        {"id": "L2", "status": "offline", "health": {"healthy": False}},
+    ]
+
+    def handler(request):
+        if request.path_url.startswith("/1.0/locations?"):
+            return {"_embedded": {"locations": locations}}
+        return {"_embedded": {"employees": []}}
+
+    fake_api.handler = handler
+    config = dict(SAMPLE_CONFIG)
+    if skip_unavailable is not None:
+        config["skip_unavailable_locations"] = skip_unavailable
+    tap = TapOloOmnivore(config=config, parse_env_config=False)
+    stream = tap.streams["locations"]
+    for child in iter_descendents(stream.child_streams):
+        child.selected = child.name == "employees"
+    stream.sync()
+
+    requested = set(fake_api.paths)
+    assert "/1.0/locations/L1/employees" in requested
+    # Locations are all synced by default.
+    assert ("/1.0/locations/L2/employees" in requested) is not bool(skip_unavailable)
+    assert [record["id"] for record in tap.location_registry.locations] == ["L1", "L2"]
+    assert tap.location_registry.unavailable == (
+        {"L2": "status offline"} if skip_unavailable else {}
+    )
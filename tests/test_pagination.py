@@ -0,0 +1,151 @@
+"""Tests for pagination of API responses."""
+
+from __future__ import annotations
+
+import pytest
+from singer_sdk.exceptions import FatalAPIError
+
+from tap_olo_omnivore.pagination import (
+    CustomHATEOASPaginator,
+    PageSizeRejectedError,
+    is_page_size_error,
+    set_page_size,
+    smaller_page_size,
+)
+from tap_olo_omnivore.tap import TapOloOmnivore
+from tests.conftest import SAMPLE_CONFIG, FakeAPI, make_response
+
+NEXT = "https://api.omnivore.io/1.0/locations/L1/employees?limit=100&start=100"
+
+
+def test_set_page_size():
+    assert set_page_size(NEXT, 50) == (
+        "https://api.omnivore.io/1.0/locations/L1/employees?start=100&limit=50"
+    )
+
+
+@pytest.mark.parametrize(
+    ("message", "blames_page_size"),
+    [
+        ("limit too large", True),
+        ("limit must be at most 100", True),
+        ("Maximum limit is 100", True),
+        ("page_size exceeds 100", True),
+        ("rate limit exceeded", False),
+        ("Rate limit exceeds the quota of the account", False),
+        ("limit reached for account", False),
+        ("Invalid where clause", False),
+    ],
+)
+def test_page_size_error(message: str, blames_page_size: bool):
+    assert is_page_size_error(message) is blames_page_size
+
+
+def test_paginator_follows_every_page():
+    page = make_response(200, {"_links": {"next": {"href": NEXT}}})
+    paginator = CustomHATEOASPaginator()
+    for _ in range(20):
+        assert paginator.get_next_url(page) == NEXT
+    assert not paginator.truncated
+
+    paginator = CustomHATEOASPaginator(max_pagination=2)
+    assert paginator.get_next_url(page) == NEXT
+    assert paginator.get_next_url(page) is None
+    assert paginator.truncated
+
+
+def test_rejected_page_size_is_halved(fake_api: FakeAPI):
+    tap = TapOloOmnivore(
+        config={**SAMPLE_CONFIG, "page_size": 400},
+        parse_env_config=False,
+    )
+    stream = tap.streams["employees"]
+    limits = []
+
+    def handler(request):
+        limit = int(request.url.rsplit("limit=", 1)[1])
+        limits.append(limit)
+        if limit > 100:
+            return 400, {"error": "limit too large"}
+        employees = [{"id": str(i)} for i in range(3)]
+        return {"_embedded": {"employees": employees}}
+
+    fake_api.handler = handler
+    stream.context = {"location_id": "L1"}
+    records = list(stream.request_records(stream.context))
+
+    assert len(records) == 3
+    assert limits == [400, 200, 100]
+    assert stream.page_size == 100
+    assert stream._page_stats["pages"] == 1
+
+
+def test_smaller_page_size():
+    assert smaller_page_size(400, 100) == 200
+    assert smaller_page_size(125, 100) == 100
+    assert smaller_page_size(100, 100) == 50
+    assert smaller_page_size(15, 100) == 10
+
+
+@pytest.mark.parametrize(
+    ("largest_accepted", "limits"),
+    [
+        (5000, [1000]),
+        (300, [1000, 500, 250]),
+        (120, [1000, 500, 250, 125, 100]),
+        (60, [1000, 500, 250, 125, 100, 50]),
+    ],
+)
+def test_largest_page_size_is_probed(
+    fake_api: FakeAPI, largest_accepted: int, limits: list[int]
+):
+    tap = TapOloOmnivore(
+        config={**SAMPLE_CONFIG, "max_page_size": 1000},
+        parse_env_config=False,
+    )
+    stream = tap.streams["employees"]
+    requested = []
+
+    def handler(request):
+        limit = int(request.url.rsplit("limit=", 1)[1])
+        requested.append(limit)
+        if limit > largest_accepted:
+            return 400, {"error": f"limit must be at most {largest_accepted}"}
+        return {"_embedded": {"employees": [{"id": "1"}]}}
+
+    fake_api.handler = handler
+    for location_id in ["L1", "L2"]:
+        stream.context = {"location_id": location_id}
+        assert len(list(stream.request_records(stream.context))) == 1
+
+    # Probed once, then the size accepted is requested.
+    assert requested == [*limits, limits[-1]]
+    assert stream.page_size == limits[-1]
+
+
+def test_unrelated_bad_request_is_fatal(fake_api: FakeAPI):
+    tap = TapOloOmnivore(config=SAMPLE_CONFIG, parse_env_config=False)
+    stream = tap.streams["employees"]
+    fake_api.handler = lambda request: (400, {"error": "Invalid where clause"})
+    stream.context = {"location_id": "L1"}
+    with pytest.raises(FatalAPIError) as excinfo:
+        list(stream.request_records(stream.context))
+
+    assert not isinstance(excinfo.value, PageSizeRejectedError)
+    assert [request.url.rsplit("limit=", 1)[1] for request in fake_api.requests] == [
+        "100"
+    ]
+    assert tap.page_sizes == {}
+
+
+def test_rate_limit_bad_request_is_fatal(fake_api: FakeAPI):
+    tap = TapOloOmnivore(config=SAMPLE_CONFIG, parse_env_config=False)
+    stream = tap.streams["employees"]
+    fake_api.handler = lambda request: (400, {"error": "rate limit exceeded"})
+    stream.context = {"location_id": "L1"}
+    with pytest.raises(FatalAPIError) as excinfo:
+        list(stream.request_records(stream.context))
+
+    assert not isinstance(excinfo.value, PageSizeRejectedError)
+    assert len(fake_api.requests) == 1
+    assert tap.page_sizes == {}
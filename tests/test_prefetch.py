@@ -0,0 +1,109 @@
+"""Tests for prefetching the requests of child streams."""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import threading
+import time
+
+import pytest
+from singer_sdk import _singerlib as singer
+
+from tap_olo_omnivore import prefetch
+from tap_olo_omnivore.tap import TapOloOmnivore
+from tests.conftest import SAMPLE_CONFIG, FakeAPI
+
+CONFIG = {**SAMPLE_CONFIG, "locations": [{"id": "L1"}], "embedded_harvest": False}
+
+
+@pytest.fixture(params=["threads", "httpx"], autouse=True)
+def backend(request: pytest.FixtureRequest, monkeypatch: pytest.MonkeyPatch) -> str:
+    """Prefetch on threads, and through httpx when it is installed."""
+    if request.param == "httpx":
+        pytest.importorskip("httpx")
+    else:
+        monkeypatch.setattr(
+            prefetch, "Prefetcher", functools.partial(prefetch.Prefetcher, use_httpx=False)
+        )
+    return request.param
+
+
+@pytest.fixture
+def sent(fake_api: FakeAPI) -> dict:
+    sent = {"paths": [], "in_flight": 0, "max_in_flight": 0}
+    lock = threading.Lock()
+
+    def handler(request):
+        path = request.path_url.split("?", 1)[0].removeprefix("/1.0/locations/L1")
+        with lock:
+            sent["paths"].append(path)
+            sent["in_flight"] += 1
+            sent["max_in_flight"] = max(sent["max_in_flight"], sent["in_flight"])
+        time.sleep(0.005)
+        parts = path.strip("/").split("/")
+        if path == "/1.0/locations":
+            document = {"_embedded": {"locations": [{"id": "L1"}]}}
+        elif parts == ["tickets"]:
+            tickets = [{"id": f"T{i}", "opened_at": i} for i in range(6)]
+            document = {"_embedded": {"tickets": tickets}}
+        elif parts[-1] == "items" and parts[0] == "tickets":
+            items = [{"id": f"{parts[1]}-I{i}", "name": "Burger"} for i in range(2)]
+            document = {"_embedded": {"items": items}}
+        elif parts[-1] == "modifiers" and parts[0] == "tickets":
+            document = {"_embedded": {"modifiers": [{"id": f"{parts[3]}-M"}]}}
+        else:
+            document = {"_embedded": {parts[-1]: []}}
+        with lock:
+            sent["in_flight"] -= 1
+        return document
+
+    fake_api.handler = handler
+    return sent
+
+
+def run_sync(config: dict) -> list:
+    tap = TapOloOmnivore(config={**CONFIG, **config}, parse_env_config=False)
+    messages: list = []
+    tap.write_message = messages.append
+    tap.sync_all()
+    return [
+        (message.stream, message.record["id"])
+        for message in messages
+        if isinstance(message, singer.RecordMessage)
+    ]
+
+
+def test_prefetch_keeps_record_order(sent: dict, fake_api: FakeAPI):
+    serial = run_sync({})
+    serial_paths = sorted(sent["paths"])
+    assert sent["max_in_flight"] == 1
+    assert ("ticket_item_modifiers", "T5-I1-M") in serial
+
+    sent["paths"].clear()
+    assert run_sync({"max_concurrent_child_requests": 8}) == serial
+    # Every prefetched response is used, none is requested twice.
+    assert sorted(sent["paths"]) == serial_paths
+    assert sent["max_in_flight"] > 1
+    # Prefetched requests are authenticated like the others.
+    assert {request.headers["Api-Key"] for request in fake_api.requests} == {
+        SAMPLE_CONFIG["api_key"]
+    }
+
+
+def test_prefetch_keeps_event_loop(sent: dict, monkeypatch: pytest.MonkeyPatch):
+    loops = []
+    new_event_loop = asyncio.new_event_loop
+
+    def track_new_event_loop():
+        loops.append(new_event_loop())
+        return loops[-1]
+
+    monkeypatch.setattr(asyncio, "new_event_loop", track_new_event_loop)
+    monkeypatch.setattr(prefetch, "PREFETCH_BATCH_SIZE", 2)
+    assert ("ticket_item_modifiers", "T5-I1-M") in run_sync(
+        {"max_concurrent_child_requests": 8}
+    )
+    # Every batch of every level of the tree ran on the same loop, closed at the end.
+    assert len(loops) == 1
+    assert loops[0].is_closed()
@@ -0,0 +1,71 @@
+"""Tests for the registry of streams."""
+
+from __future__ import annotations
+
+import subprocess
+import sys
+
+from singer_sdk._singerlib import Catalog
+
+from tap_olo_omnivore.registry import STREAMS, load_stream_class, required_streams
+from tap_olo_omnivore.tap import TapOloOmnivore
+from tests.conftest import SAMPLE_CONFIG
+
+
+def test_registry_matches_stream_classes():
+    for name, (_, _, parent) in STREAMS.items():
+        stream_class = load_stream_class(name)
+        assert stream_class.name == name
+        parent_class = stream_class.parent_stream_type
+        assert (parent_class.name if parent_class else None) == parent
+
+
+def selective_catalog(selected: str) -> Catalog:
+    """Return the discovered catalog with a single stream selected."""
+    tap = TapOloOmnivore(config=SAMPLE_CONFIG, parse_env_config=False)
+    catalog = Catalog.from_dict(tap.catalog_dict)
+    for entry in catalog.values():
+        entry.metadata.root.selected = entry.tap_stream_id == selected
+    return catalog
+
+
+def test_required_streams():
+    assert required_streams(None) == list(STREAMS)
+    catalog = selective_catalog("ticket_item_modifiers")
+    expected = ["locations", "tickets", "ticket_items", "ticket_item_modifiers"]
+    assert required_streams(catalog) == expected
+
+    tap = TapOloOmnivore(
+        config=SAMPLE_CONFIG,
+        catalog=catalog.to_dict(),
+        parse_env_config=False,
+    )
+    assert set(tap.streams) == set(expected)
+    assert list(tap.streams["ticket_items"].child_streams) == [
+        tap.streams["ticket_item_modifiers"]
+    ]
+
+    # Streams missing from the catalog are selected by default.
+    del catalog["employees"]
+    assert "employees" in required_streams(catalog)
+
+
+def test_streams_do_not_import_optional_features():
+    # In a fresh interpreter, as the modules are already imported by other tests.
+    code = (
+        "import sys\n"
+        "from tap_olo_omnivore.registry import load_stream_class\n"
+        "load_stream_class('ticket_items')\n"
+        "print(sorted(name for name in sys.modules if name in OPTIONAL))\n"
+    )
+    optional = [
+        f"tap_olo_omnivore.{name}"
+        for name in ("cache", "cassette", "changes", "prefetch", "streaming")
+    ]
+    output = subprocess.run(
+        [sys.executable, "-c", f"OPTIONAL = {optional!r}\n{code}"],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    assert output.strip() == "[]"
@@ -0,0 +1,86 @@
+"""Tests for the HTTP session shared by all streams."""
+
+from __future__ import annotations
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from tap_olo_omnivore.session import build_session, connection_stats
+from tap_olo_omnivore.tap import TapOloOmnivore
+from tests.conftest import SAMPLE_CONFIG
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:  # noqa: N802
+        body = b'{"_embedded": {}}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/hal+json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def base_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_streams_share_session():
+    tap = TapOloOmnivore(
+        config={**SAMPLE_CONFIG, "max_concurrent_locations": 16},
+        parse_env_config=False,
+    )
+    sessions = {id(stream.requests_session) for stream in tap.streams.values()}
+    assert sessions == {id(tap.requests_session)}
+    assert tap.requests_session.get_adapter("https://")._pool_maxsize == 17
+
+
+@pytest.mark.parametrize(
+    ("config", "pool_size"),
+    [
+        ({"max_concurrent_locations": 4}, 10),
+        ({"max_concurrent_locations": 4, "ticket_window_days": 1}, 17),
+        ({"max_concurrent_locations": 4, "max_concurrent_child_requests": 8}, 33),
+        ({"max_concurrent_locations": 4, "http_pool_size": 5}, 5),
+    ],
+)
+def test_pool_size(config: dict, pool_size: int):
+    tap = TapOloOmnivore(config={**SAMPLE_CONFIG, **config}, parse_env_config=False)
+    assert tap.requests_session.get_adapter("https://")._pool_maxsize == pool_size
+
+
+def test_compression_header():
+    assert build_session().headers["Accept-Encoding"] == "gzip, deflate"
+    session = build_session(compression=False)
+    assert session.headers["Accept-Encoding"] == "identity"
+
+
+def test_connections_are_reused(base_url: str):
+    tap = TapOloOmnivore(
+        config={**SAMPLE_CONFIG, "base_url": base_url},
+        parse_env_config=False,
+    )
+    for name in ("employees", "tables", "tender_types"):
+        stream = tap.streams[name]
+        stream.context = {"location_id": "L1"}
+        request = stream.prepare_request({"location_id": "L1"}, None)
+        assert request.headers["Api-Key"] == SAMPLE_CONFIG["api_key"]
+        stream._request(request, None)
+
+    assert connection_stats(tap.requests_session) == {
+        "requests": 3,
+        "connections": 1,
+        "reused": 2,
+    }
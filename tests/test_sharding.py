@@ -0,0 +1,142 @@
+"""Tests for sharding locations across processes and merging their states."""
+
+from __future__ import annotations
+
+import json
+
+import pytest
+from singer_sdk.exceptions import ConfigValidationError
+
+from tap_olo_omnivore.sharding import (
+    drop_foreign_partitions,
+    main,
+    merge_states,
+    shard_of,
+)
+from tap_olo_omnivore.tap import TapOloOmnivore
+from tests.conftest import SAMPLE_CONFIG
+
+
+LOCATION_IDS = [f"L{i}" for i in range(200)]
+
+
+def tickets_partition(location_id: str, opened_at: int) -> dict:
+    return {
+        "context": {"location_id": location_id},
+        "replication_key": "opened_at",
+        "replication_key_value": opened_at,
+    }
+
+
+def test_shard_of():
+    shards = [shard_of(location_id, 3) for location_id in LOCATION_IDS]
+    assert shards == [shard_of(location_id, 3) for location_id in LOCATION_IDS]
+    assert all(40 < shards.count(shard) < 90 for shard in range(3))
+    # Adding a shard only moves locations to the new one.
+    for location_id, shard in zip(LOCATION_IDS, shards):
+        assert shard_of(location_id, 4) in {shard, 3}
+
+
+def test_sharded_locations(monkeypatch: pytest.MonkeyPatch):
+    config = {
+        **SAMPLE_CONFIG,
+        "locations": [{"id": location_id} for location_id in LOCATION_IDS[:20]],
+        "shard_count": 2,
+    }
+    synced = []
+    for shard_index in range(2):
+        tap = TapOloOmnivore(
+            config={**config, "shard_index": shard_index}, parse_env_config=False
+        )
+        stream = tap.streams["locations"]
+        monkeypatch.setattr(
+            stream,
+            "request_records",
+            lambda context: iter([{"id": location_id} for location_id in LOCATION_IDS]),
+        )
+        location_ids = [record["id"] for record in stream.get_records(None)]
+        assert all(shard_of(location_id, 2) == shard_index for location_id in location_ids)
+        synced.extend(location_ids)
+    assert sorted(synced) == sorted(LOCATION_IDS[:20])
+
+    with pytest.raises(ConfigValidationError):
+        TapOloOmnivore(config={**config, "shard_index": 2}, parse_env_config=False)
+
+
+def test_merge_states(tmp_path):
+    state = {
+        "bookmarks": {
+            "tickets": {
+                "partitions": [
+                    tickets_partition(location_id, 100) for location_id in LOCATION_IDS
+                ]
+            },
+            "locations": {},
+        }
+    }
+    shard_states = []
+    for shard_index in range(2):
+        tap = TapOloOmnivore(
+            config={**SAMPLE_CONFIG, "shard_count": 2, "shard_index": shard_index},
+            state=json.loads(json.dumps(state)),
+            parse_env_config=False,
+        )
+        partitions = tap.state["bookmarks"]["tickets"]["partitions"]
+        assert all(
+            tap.owns_location(partition["context"]["location_id"])
+            for partition in partitions
+        )
+        for partition in partitions:
+            partition["replication_key_value"] = 200 + shard_index
+        shard_states.append(tap.state)
+
+    merged = merge_states(shard_states)
+    merged_partitions = merged["bookmarks"]["tickets"]["partitions"]
+    assert sorted(p["context"]["location_id"] for p in merged_partitions) == sorted(
+        LOCATION_IDS
+    )
+    assert {
+        p["context"]["location_id"]: p["replication_key_value"]
+        for p in merged_partitions
+    } == {
+        location_id: 200 + shard_of(location_id, 2) for location_id in LOCATION_IDS
+    }
+
+    # A partition found in several states keeps the later bookmark.
+    assert merge_states(
+        [
+            {"bookmarks": {"tickets": {"partitions": [tickets_partition("L1", 300)]}}},
+            {"bookmarks": {"tickets": {"partitions": [tickets_partition("L1", 200)]}}},
+        ]
+    )["bookmarks"]["tickets"]["partitions"] == [tickets_partition("L1", 300)]
+
+    first = tmp_path / "shard-0.json"
+    first.write_text(json.dumps(shard_states[0]))
+    second = tmp_path / "shard-1.jsonl"
+    second.write_text(
+        "\n".join(
+            json.dumps(message)
+            for message in [
+                {"type": "STATE", "value": {}},
+                {"type": "RECORD", "stream": "tickets", "record": {}},
+                {"type": "STATE", "value": shard_states[1]},
+            ]
+        )
+    )
+    output = tmp_path / "state.json"
+    main([str(first), str(second), "-o", str(output)])
+    assert json.loads(output.read_text()) == merged
+
+
+def test_drop_foreign_partitions():
+    state = {
+        "bookmarks": {
+            "tickets": {
+                "partitions": [tickets_partition("L1", 1), tickets_partition("L2", 1)]
+            },
+            "employees": {"partitions": [{"context": {}}]},
+        }
+    }
+    assert drop_foreign_partitions(state, lambda location_id: location_id == "L1") == 1
+    assert state["bookmarks"]["tickets"]["partitions"] == [tickets_partition("L1", 1)]
+    assert state["bookmarks"]["employees"]["partitions"] == [{"context": {}}]
@@ -0,0 +1,191 @@
+"""Tests for incremental parsing of API responses."""
+
+from __future__ import annotations
+
+import decimal
+import http.client
+import io
+import json
+import time
+
+import pytest
+import requests
+import urllib3
+
+from tap_olo_omnivore.streaming import CHUNK_SIZE, iter_embedded_records
+from tap_olo_omnivore.tap import TapOloOmnivore
+from tests.conftest import SAMPLE_CONFIG, FakeAPI, make_response, stream_response
+
+pytest.importorskip("ijson")
+
+NEXT = "https://api.omnivore.io/1.0/next"
+
+
+@pytest.fixture(params=[False, True], ids=["decode", "streaming"])
+def tickets(request: pytest.FixtureRequest):
+    config = {**SAMPLE_CONFIG, "streaming_parse": request.param}
+    tap = TapOloOmnivore(config=config, parse_env_config=False)
+    return tap.streams["tickets"]
+
+
+def test_parse_response(tickets):
+    document = {
+        "_embedded": {
+            "tickets": [
+                {"id": "1", "totals": {"tax": 0.0825}, "_embedded": {"items": []}},
+                {"id": "2", "totals": {"tax": 1}},
+            ]
+        },
+        "_links": {"next": {"href": NEXT}},
+    }
+    response = make_response(200, document)
+    records = list(tickets.parse_response(response))
+    assert [record["id"] for record in records] == ["1", "2"]
+    assert records[0]["_embedded"] == {"items": []}
+    assert records[0]["totals"]["tax"] == decimal.Decimal("0.0825")
+    assert tickets.get_new_paginator().get_next_url(response) == NEXT
+
+
+def test_parse_response_prefers_stream_collection(tickets):
+    document = {
+        "_embedded": {
+            "employees": [{"id": "E1"}],
+            "tickets": [{"id": "1", "_embedded": {"items": [{"id": "I1"}]}}],
+        }
+    }
+    records = list(tickets.parse_response(make_response(200, document)))
+    assert [record["id"] for record in records] == ["1"]
+
+    document = {"_embedded": {"ticket_list": [{"id": "1"}], "employees": []}}
+    records = list(tickets.parse_response(make_response(200, document)))
+    assert [record["id"] for record in records] == ["1"]
+
+
+def test_parse_response_without_collection(tickets):
+    response = make_response(200, b'{"id": "1", "_links": {}}')
+    assert list(tickets.parse_response(response)) == [{"id": "1", "_links": {}}]
+    assert tickets.get_new_paginator().get_next_url(response) is None
+
+
+def test_parse_invalid_response(tickets):
+    response = make_response(200, b'{"_embedded": {"tickets": [{"id": "1"}, {"id"')
+    records = list(tickets.parse_response(response))
+    assert records in ([], [{"id": "1"}])
+
+
+class TrackedBody(io.BytesIO):
+    """A response body which records the bytes read, and the largest read."""
+
+    bytes_read = 0
+    largest_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = super().read(size)
+        self.bytes_read += len(data)
+        self.largest_read = max(self.largest_read, len(data))
+        return data
+
+
+def test_streamed_body_parsed_in_one_pass():
+    tickets = [{"id": str(i), "name": "x" * 100} for i in range(5000)]
+    body = json.dumps(
+        {"_embedded": {"tickets": tickets}, "_links": {"next": {"href": NEXT}}}
+    ).encode()
+    tracked = TrackedBody(body)
+    response = make_response(200, b"")
+    response.raw = urllib3.HTTPResponse(body=tracked, preload_content=False)
+    response._content = False
+
+    records = iter_embedded_records(response, "tickets")
+    assert next(records) == tickets[0]
+    # The first record is parsed from the first chunk of the body.
+    assert tracked.bytes_read < len(body)
+    assert [record["id"] for record in records] == [str(i) for i in range(1, 5000)]
+    assert tracked.largest_read <= CHUNK_SIZE
+    assert tracked.bytes_read == len(body)
+    assert response._streamed_size == len(body)
+    # The next link was picked up by the same pass.
+    assert TapOloOmnivore(
+        config={**SAMPLE_CONFIG, "streaming_parse": True}, parse_env_config=False
+    ).streams["tickets"].get_new_paginator().get_next_url(response) == NEXT
+
+
+def test_streamed_body_without_collection():
+    response = stream_response(make_response(200, {"id": "1", "_links": {}}))
+    with pytest.raises(LookupError):
+        list(iter_embedded_records(response, "tickets"))
+    # The document built by the pass is used as if decoded.
+    assert response._decoded_document == {"id": "1", "_links": {}}
+
+
+def test_sync_streams_bodies(fake_api: FakeAPI, monkeypatch: pytest.MonkeyPatch):
+    page = {"_embedded": {"employees": [{"id": "1"}, {"id": "2"}]}}
+    fake_api.handler = lambda request: page
+    streamed = []
+
+    def send(session, request, **kwargs):
+        streamed.append(kwargs.get("stream", False))
+        return fake_api.send(request, **kwargs)
+
+    monkeypatch.setattr(requests.Session, "send", send)
+    tap = TapOloOmnivore(
+        config={**SAMPLE_CONFIG, "streaming_parse": True}, parse_env_config=False
+    )
+    stream = tap.streams["employees"]
+    stream.context = {"location_id": "L1"}
+    records = list(stream.request_records(stream.context))
+
+    assert [record["id"] for record in records] == ["1", "2"]
+    assert streamed == [True]
+    # Streamed bodies are counted once read.
+    assert stream._page_stats["bytes"] == len(json.dumps(page))
+    (partition,) = tap.telemetry.summary()
+    assert partition["bytes"] == len(json.dumps(page))
+
+
+class BrokenBody(TrackedBody):
+    """A response body whose connection breaks after some bytes."""
+
+    def __init__(self, body: bytes, broken_at: int) -> None:
+        super().__init__(body)
+        self.broken_at = broken_at
+
+    def read(self, size: int = -1) -> bytes:
+        if self.tell() >= self.broken_at:
+            raise http.client.IncompleteRead(b"")
+        return super().read(min(size, self.broken_at - self.tell()))
+
+
+def test_body_broken_while_read_is_requested_again(
+    fake_api: FakeAPI, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+    employees = [{"id": str(i), "name": "x" * 100} for i in range(2000)]
+    body = json.dumps({"_embedded": {"employees": employees}}).encode()
+    bodies = [BrokenBody(body, len(body) // 2), TrackedBody(body)]
+    complete = bodies[1]
+
+    def send(session, request, **kwargs):
+        fake_api.requests.append(request)
+        response = make_response(200, b"", request)
+        response.raw = urllib3.HTTPResponse(body=bodies.pop(0), preload_content=False)
+        response._content = False
+        return response
+
+    monkeypatch.setattr(requests.Session, "send", send)
+    tap = TapOloOmnivore(
+        config={**SAMPLE_CONFIG, "streaming_parse": True}, parse_env_config=False
+    )
+    stream = tap.streams["employees"]
+    stream.context = {"location_id": "L1"}
+    records = stream.request_records(stream.context)
+    first = next(records)
+    # The page was read to its end before its first record is synced, and requested
+    # again from its start once the connection broke, without duplicates.
+    assert len(fake_api.requests) == 2
+    assert complete.bytes_read == len(body)
+    ids = [first["id"]] + [record["id"] for record in records]
+    assert ids == [str(i) for i in range(2000)]
+    (partition,) = tap.telemetry.summary()
+    assert partition["retries"] == 1
+    assert partition["bytes"] == len(body)
@@ -0,0 +1,160 @@
+"""Tests for the performance metrics of streams and locations."""
+
+from __future__ import annotations
+
+import concurrent.futures
+import json
+import logging
+
+from tap_olo_omnivore.tap import TapOloOmnivore
+from tap_olo_omnivore.telemetry import RESERVOIR_SIZE, Telemetry, percentile
+from tests.conftest import SAMPLE_CONFIG, FakeAPI
+
+
+def test_percentile():
+    samples = [float(i) for i in range(1, 101)]
+    assert percentile(samples, 50) == 50.0
+    assert percentile(samples, 99) == 99.0
+    assert percentile([3.0], 95) == 3.0
+    assert percentile([], 50) == 0.0
+
+
+def test_summary_and_files(tmp_path):
+    telemetry = Telemetry()
+    for seconds in (0.1, 0.2, 0.3):
+        telemetry.record_request("tickets", "L1", seconds, 100)
+    telemetry.record_request("locations", None, 0.05, 10)
+    telemetry.count("tickets", "L1", "retries")
+    with telemetry.timer("tickets", "L1", "decode_seconds"):
+        pass
+    assert list(telemetry.timer("tickets", "L2", "decode_seconds").iterate("ab")) == [
+        "a",
+        "b",
+    ]
+
+    summary = telemetry.summary()
+    assert [(p["stream"], p["location_id"]) for p in summary] == [
+        ("tickets", "L1"),
+        ("locations", None),
+        ("tickets", "L2"),
+    ]
+    tickets = summary[0]
+    assert tickets["requests"] == 3
+    assert tickets["retries"] == 1
+    assert tickets["bytes"] == 300
+    assert tickets["latency_p50"] == 0.2
+    assert tickets["latency_p99"] == 0.3
+    assert tickets["decode_seconds"] > 0
+
+    messages = []
+    logger = logging.getLogger("test_telemetry")
+    logger.setLevel(logging.INFO)
+    handler = logging.Handler()
+    handler.emit = lambda record: messages.append(record.getMessage())
+    logger.addHandler(handler)
+    try:
+        telemetry.log_metrics(logger)
+    finally:
+        logger.removeHandler(handler)
+    points = [json.loads(message.removeprefix("METRIC: ")) for message in messages]
+    assert {
+        "type": "counter",
+        "metric": "requests",
+        "value": 3,
+        "tags": {"stream": "tickets", "location_id": "L1"},
+    } in points
+
+    telemetry.write(tmp_path / "metrics.json")
+    assert json.loads((tmp_path / "metrics.json").read_text()) == summary
+    telemetry.write(tmp_path / "metrics.prom")
+    text = (tmp_path / "metrics.prom").read_text()
+    assert 'tap_olo_omnivore_http_requests_total{stream="tickets",location_id="L1"} 3' in text
+    assert (
+        'tap_olo_omnivore_http_request_duration_seconds{stream="tickets",'
+        'location_id="L1",quantile="0.95"} 0.3'
+    ) in text
+    assert 'tap_olo_omnivore_http_requests_total{stream="locations"} 1' in text
+
+
+def test_counters_merged_across_threads():
+    telemetry = Telemetry()
+
+    def count_records(location_id: str) -> None:
+        for _ in range(1000):
+            telemetry.count("tickets", location_id, "records")
+        telemetry.flush()
+        # Left in the buffer of the thread, until the summary.
+        telemetry.count("tickets", location_id, "skipped")
+
+    with concurrent.futures.ThreadPoolExecutor(4) as executor:
+        list(executor.map(count_records, ["L1", "L2"] * 4))
+
+    summary = telemetry.summary()
+    assert sorted(
+        (p["location_id"], p["records"], p["skipped"]) for p in summary
+    ) == [("L1", 4000, 4), ("L2", 4000, 4)]
+    assert telemetry.summary() == summary
+
+
+def test_released_buffers_are_dropped():
+    telemetry = Telemetry()
+
+    def count_records(location_id: str) -> None:
+        try:
+            telemetry.count("tickets", location_id, "records")
+        finally:
+            telemetry.release()
+
+    # A pool per location, as the ticket windows do.
+    for location_id in ["L1", "L2"] * 10:
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            list(executor.map(count_records, [location_id] * 4))
+    assert not telemetry._buffers
+    assert sorted((p["location_id"], p["records"]) for p in telemetry.summary()) == [
+        ("L1", 40),
+        ("L2", 40),
+    ]
+    # Nothing to release, or counted again after a release.
+    telemetry.release()
+    telemetry.count("tickets", "L1", "records")
+    telemetry.release()
+    assert telemetry.summary()[0]["records"] == 41
+
+
+def test_latency_samples_are_bounded():
+    telemetry = Telemetry()
+    for index in range(RESERVOIR_SIZE * 10):
+        telemetry.record_request("tickets", "L1", (index % 100) / 100, 1)
+    (latencies,) = telemetry._latencies.values()
+    assert len(latencies.samples) == RESERVOIR_SIZE
+    (partition,) = telemetry.summary()
+    assert partition["requests"] == RESERVOIR_SIZE * 10
+    assert 0.4 <= partition["latency_p50"] <= 0.6
+    assert partition["latency_p99"] >= 0.9
+
+
+def test_stream_telemetry(fake_api: FakeAPI):
+    tap = TapOloOmnivore(config=SAMPLE_CONFIG, parse_env_config=False)
+    stream = tap.streams["tickets"]
+    page = {
+        "_embedded": {
+            "tickets": [{"id": "1", "opened_at": 1}, {"id": "2", "opened_at": None}]
+        },
+    }
+
+    fake_api.handler = lambda request: page
+    stream.context = {"location_id": "L1"}
+    records = list(stream.get_records(stream.context))
+    for record in records:
+        list(stream._generate_record_messages(record))
+
+    (partition,) = tap.telemetry.summary()
+    assert partition["stream"] == "tickets"
+    assert partition["location_id"] == "L1"
+    assert partition["requests"] == 1
+    assert partition["bytes"] == len(json.dumps(page))
+    # The ticket without opened_at is dropped by post-processing.
+    assert partition["records"] == 1
+    assert partition["skipped"] == 1
+    assert partition["decode_seconds"] > 0
+    assert partition["post_process_seconds"] > 0
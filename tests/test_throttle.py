@@ -0,0 +1,84 @@
+"""Tests for rate limiting of API requests."""
+
+from __future__ import annotations
+
+import time
+
+import pytest
+import requests
+from singer_sdk.exceptions import FatalAPIError, RetriableAPIError
+
+from tap_olo_omnivore.tap import TapOloOmnivore
+from tap_olo_omnivore.throttle import RequestScheduler, rate_limit_delay
+from tests.conftest import SAMPLE_CONFIG
+
+
+def make_response(status_code: int, headers: dict | None = None) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    response._content = b"{}"
+    response.url = "https://api.omnivore.io/1.0/locations"
+    return response
+
+
+def test_rate_limit_delay():
+    assert rate_limit_delay(make_response(429, {"Retry-After": "3"})) == 3.0
+    past = {"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}
+    assert rate_limit_delay(make_response(429, past)) == 0.0
+    spent = {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "5"}
+    assert rate_limit_delay(make_response(200, spent)) == 5.0
+    left = {"X-RateLimit-Remaining": "10", "X-RateLimit-Reset": "5"}
+    assert rate_limit_delay(make_response(200, left)) is None
+    assert rate_limit_delay(make_response(429)) is None
+    for malformed in ("soon", "Wed, 99 Foo 2015"):
+        assert rate_limit_delay(make_response(429, {"Retry-After": malformed})) is None
+
+
+def test_scheduler_rate():
+    scheduler = RequestScheduler(requests_per_second=50, burst=2)
+    start = time.monotonic()
+    for _ in range(6):
+        scheduler.acquire()
+    # Two requests go out at once, the next four wait 20ms each.
+    assert time.monotonic() - start >= 0.07
+    assert scheduler.counters["requests"] == 6
+
+
+def test_scheduler_pause():
+    scheduler = RequestScheduler()
+    scheduler.record_rate_limited(0.05)
+    assert scheduler.acquire() >= 0.04
+    assert scheduler.counters["rate_limited"] == 1
+
+
+def test_validate_response():
+    tap = TapOloOmnivore(config=SAMPLE_CONFIG, parse_env_config=False)
+    stream = tap.streams["locations"]
+    stream.validate_response(make_response(200))
+    with pytest.raises(RetriableAPIError):
+        stream.validate_response(make_response(429, {"Retry-After": "0"}))
+    with pytest.raises(RetriableAPIError):
+        stream.validate_response(make_response(503))
+    with pytest.raises(FatalAPIError):
+        stream.validate_response(make_response(404))
+    assert tap.request_scheduler.counters["rate_limited"] == 1
+
+
+def test_retry_after_is_honored(monkeypatch: pytest.MonkeyPatch):
+    tap = TapOloOmnivore(config=SAMPLE_CONFIG, parse_env_config=False)
+    stream = tap.streams["locations"]
+    responses = [make_response(429, {"Retry-After": "0.01"}), make_response(200)]
+    sleeps = []
+    monkeypatch.setattr(
+        requests.Session, "send", lambda self, request, **kwargs: responses.pop(0)
+    )
+    monkeypatch.setattr(time, "sleep", sleeps.append)
+    monkeypatch.setattr(stream, "backoff_jitter", lambda value: value)
+
+    request = requests.Request("GET", "https://api.omnivore.io/1.0/locations").prepare()
+    response = stream.request_decorator(stream._request)(request, None)
+
+    assert response.status_code == 200
+    assert 0.01 in sleeps
+    assert tap.request_scheduler.counters["retries"] == 1
@@ -0,0 +1,264 @@
+"""Tests for windowed ticket extraction."""
+
+from __future__ import annotations
+
+import copy
+import re
+import time
+import typing as t
+
+import pytest
+import requests
+from singer_sdk import _singerlib as singer
+
+from tap_olo_omnivore.streams import tickets
+from tap_olo_omnivore.streams.tickets import split_windows
+from tap_olo_omnivore.tap import TapOloOmnivore
+from tests.conftest import SAMPLE_CONFIG, FakeAPI
+
+DAY = 86400
+
+CONFIG = {**SAMPLE_CONFIG, "locations": [{"id": "L1"}], "track_open_tickets": True}
+
+
+def test_split_windows():
+    assert split_windows(0, 250, 100) == [(0, 100), (100, 200), (200, None)]
+    assert split_windows(0, 50, 100) == [(0, None)]
+
+
+@pytest.fixture
+def filters(fake_api: FakeAPI) -> list:
+    filters = []
+
+    def handler(request):
+        if request.path_url.startswith("/1.0/locations/L1/tickets?"):
+            where = requests.utils.unquote(request.url.split("where=", 1)[1])
+            filters.append(where)
+            start = int(re.search(r"gte\(opened_at,(\d+)\)", where)[1])
+            tickets = [{"id": str(start), "opened_at": start + 1, "open": True}]
+            return {"_embedded": {"tickets": tickets}}
+        if request.path_url.startswith("/1.0/locations?"):
+            return {"_embedded": {"locations": [{"id": "L1"}]}}
+        return {"_embedded": {"items": []}}
+
+    fake_api.handler = handler
+    return filters
+
+
+@pytest.mark.parametrize(
+    ("max_concurrent_windows", "max_buffered_records"), [(1, 5000), (3, 5000), (3, 1)]
+)
+def test_windowed_sync(
+    filters: list,
+    monkeypatch: pytest.MonkeyPatch,
+    max_concurrent_windows: int,
+    max_buffered_records: int,
+):
+    monkeypatch.setattr(tickets, "MAX_BUFFERED_RECORDS", max_buffered_records)
+    clones = []
+    clone_stream = tickets.clone_stream
+
+    def track_clone_stream(*args, **kwargs):
+        clones.append(clone_stream(*args, **kwargs))
+        return clones[-1]
+
+    monkeypatch.setattr(tickets, "clone_stream", track_clone_stream)
+    start = int(time.time()) - 5 * DAY - 60
+    tap = TapOloOmnivore(
+        config={
+            **CONFIG,
+            "start_date": str(start),
+            "ticket_window_days": 1,
+            "max_concurrent_windows": max_concurrent_windows,
+        },
+        parse_env_config=False,
+    )
+    messages: list = []
+    # State messages hold the live state, which keeps changing.
+    tap.write_message = lambda message: messages.append(copy.deepcopy(message))
+    tap.sync_all()
+
+    assert sorted(filters) == sorted(
+        [
+            f"and(gte(opened_at,{start + i * DAY}),lt(opened_at,{start + (i + 1) * DAY}))"
+            for i in range(5)
+        ]
+        + [f"gte(opened_at,{start + 5 * DAY})"]
+    )
+
+    # Tickets are written in window order, each window followed by its checkpoint.
+    written = []
+    checkpoints = []
+    for message in messages:
+        if isinstance(message, singer.RecordMessage) and message.stream == "tickets":
+            written.append(message.record["opened_at"])
+        elif isinstance(message, singer.StateMessage):
+            partitions = message.value["bookmarks"].get("tickets", {}).get("partitions")
+            bookmark = partitions and partitions[0].get("replication_key_value")
+            if bookmark and bookmark not in checkpoints:
+                checkpoints.append(bookmark)
+                assert len(written) == len(checkpoints)
+                # Tickets left open are checkpointed with the windows they were in.
+                assert partitions[0]["open_ticket_ids"] == sorted(
+                    str(opened_at - 1) for opened_at in written
+                )
+    assert written == [start + i * DAY + 1 for i in range(6)]
+    assert checkpoints[:5] == [start + (i + 1) * DAY for i in range(5)]
+    # The windows are requested by copies of the stream, without its children.
+    assert len(clones) == max_concurrent_windows
+    assert all(clone.child_streams == [] for clone in clones)
+    # Only the buffer of the main thread is left, the workers released theirs.
+    assert len(tap.telemetry._buffers) <= 1
+
+
+def test_open_tickets_are_refreshed(fake_api: FakeAPI):
+    tickets = {
+        "T1": {"id": "T1", "opened_at": 100, "open": True},
+        "T2": {"id": "T2", "opened_at": 200, "open": False, "closed_at": 250},
+    }
+    requested = []
+
+    def handler(request):
+        path = request.path_url.split("?", 1)[0]
+        query = requests.utils.unquote(request.path_url)
+        if path == "/1.0/locations":
+            return {"_embedded": {"locations": [{"id": "L1"}]}}
+        if path == "/1.0/locations/L1/tickets":
+            requested.append(query.split("where=", 1)[1])
+            if "closed_at" in query:
+                found = [t for t in tickets.values() if t.get("closed_at")]
+            else:
+                bookmark = int(re.search(r"gte\(opened_at,(\d+)\)", query)[1])
+                found = [t for t in tickets.values() if t["opened_at"] >= bookmark]
+            return {"_embedded": {"tickets": found}}
+        if path.startswith("/1.0/locations/L1/tickets/") and path.count("/") == 5:
+            requested.append(path.rsplit("/", 1)[1])
+            return tickets[path.rsplit("/", 1)[1]]
+        return {"_embedded": {"items": []}}
+
+    fake_api.handler = handler
+
+    def run_sync(state: dict, **config: t.Any) -> tuple[list, dict]:
+        # Settings passed as None are left unset.
+        config = {**CONFIG, "start_date": "1", **config}
+        tap = TapOloOmnivore(
+            config={key: value for key, value in config.items() if value is not None},
+            state=state,
+            parse_env_config=False,
+        )
+        messages: list = []
+        tap.write_message = messages.append
+        tap.sync_all()
+        records = [
+            message.record["id"]
+            for message in messages
+            if isinstance(message, singer.RecordMessage) and message.stream == "tickets"
+        ]
+        return records, copy.deepcopy(tap.state)
+
+    records, state = run_sync({}, closed_at_lookback_hours=24)
+    # T2 is found again by the closed_at lookback, but written once.
+    assert records == ["T1", "T2"]
+    assert requested[1].startswith("gte(closed_at,")
+    (partition,) = state["bookmarks"]["tickets"]["partitions"]
+    assert partition["open_ticket_ids"] == ["T1"]
+    assert partition["replication_key_value"] == 200
+
+    # T1 gets closed and T3 is opened after the bookmark.
+    tickets["T1"] = {"id": "T1", "opened_at": 100, "open": False, "closed_at": 300}
+    tickets["T3"] = {"id": "T3", "opened_at": 400, "open": True}
+    requested.clear()
+    records, state = run_sync(state)
+
+    assert records == ["T2", "T3", "T1"]
+    assert requested == ["gte(opened_at,200)", "T1"]
+    (partition,) = state["bookmarks"]["tickets"]["partitions"]
+    assert partition["open_ticket_ids"] == ["T3"]
+    assert partition["replication_key_value"] == 400
+
+    # Open tickets are not tracked by default.
+    requested.clear()
+    records, state = run_sync(state, track_open_tickets=None)
+    assert records == ["T3"]
+    assert requested == ["gte(opened_at,400)"]
+    (partition,) = state["bookmarks"]["tickets"]["partitions"]
+    assert partition["open_ticket_ids"] == ["T3"]
+
+
+@pytest.mark.parametrize("max_concurrent_windows", [1, 3])
+def test_window_cut_short_keeps_bookmark(
+    fake_api: FakeAPI, monkeypatch: pytest.MonkeyPatch, max_concurrent_windows: int
+):
+    start = int(time.time()) - 5 * DAY - 60
+
+    def handler(request):
+        path = request.path_url.split("?", 1)[0]
+        if path == "/1.0/locations":
+            return {"_embedded": {"locations": [{"id": "L1"}]}}
+        if path == "/1.0/locations/L1/tickets":
+            where = requests.utils.unquote(request.url.split("where=", 1)[1])
+            window_start = int(re.search(r"gte\(opened_at,(\d+)\)", where)[1])
+            if window_start > start:
+                return 503, {}
+            ticket = {"id": "T1", "opened_at": window_start + 1, "open": True}
+            return {"_embedded": {"tickets": [ticket]}}
+        return {"_embedded": {"items": []}}
+
+    fake_api.handler = handler
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+    tap = TapOloOmnivore(
+        config={
+            **CONFIG,
+            "start_date": str(start),
+            "ticket_window_days": 1,
+            "max_concurrent_windows": max_concurrent_windows,
+            "circuit_breaker_threshold": 2,
+        },
+        parse_env_config=False,
+    )
+    tap.write_message = lambda message: None
+    tap.sync_all()
+
+    # Only the first window was requested: the bookmark stays at its end.
+    (partition,) = tap.state["bookmarks"]["tickets"]["partitions"]
+    assert partition["replication_key_value"] == start + DAY
+    assert "progress_markers" not in partition
+    assert partition["circuit_open"]["skipped_requests"] >= 1
+    assert partition["open_ticket_ids"] == ["T1"]
+
+
+def test_open_tickets_kept_when_cut_short(
+    fake_api: FakeAPI, monkeypatch: pytest.MonkeyPatch
+):
+    def handler(request):
+        if request.path_url.startswith("/1.0/locations?"):
+            return {"_embedded": {"locations": [{"id": "L1"}]}}
+        return 503, {}
+
+    fake_api.handler = handler
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+    state = {
+        "bookmarks": {
+            "tickets": {
+                "partitions": [
+                    {
+                        "context": {"location_id": "L1"},
+                        "replication_key": "opened_at",
+                        "replication_key_value": 100,
+                        "open_ticket_ids": ["T9"],
+                    }
+                ]
+            }
+        }
+    }
+    tap = TapOloOmnivore(
+        config={**CONFIG, "circuit_breaker_threshold": 1},
+        state=state,
+        parse_env_config=False,
+    )
+    tap.write_message = lambda message: None
+    tap.sync_all()
+
+    (partition,) = tap.state["bookmarks"]["tickets"]["partitions"]
+    assert partition["open_ticket_ids"] == ["T9"]
+    assert partition["replication_key_value"] == 100
@@ -0,0 +1,56 @@
+"""Tests for the compiled record transformer."""
+
+from __future__ import annotations
+
+import copy
+
+from tap_olo_omnivore.transform import (
+    RecordTransformer,
+    extract_id_from_href,
+    flatten_nested_objects,
+)
+
+TICKET = {
+    "id": "100",
+    "open": False,
+    "totals": {"sub_total": 2599, "tax": 300, "nested": {"deep": 1}},
+    "tags": ["a", {"name": "b"}],
+    "employee_id": "stale",
+    "_links": {
+        "self": {"href": "https://api.omnivore.io/1.0/locations/L1/tickets/100/"},
+        "employee": {"href": "https://api.omnivore.io/1.0/locations/L1/employees/200/"},
+        "items": {"href": "https://api.omnivore.io/1.0/locations/L1/tickets/100/items/"},
+        "order_type": {"href": "https://api.omnivore.io/1.0/locations/L1/order_types/3"},
+    },
+    "_embedded": {"items": [{"id": "1"}]},
+}
+
+
+def legacy_transform(row: dict) -> dict:
+    """The link extraction and flattening previously done in post_process."""
+    for key, link_obj in row.get("_links", {}).items():
+        if key == "self" or key.endswith("s"):
+            continue
+        if isinstance(link_obj, dict) and "href" in link_obj:
+            row[f"{key}_id"] = extract_id_from_href(link_obj["href"])
+    return flatten_nested_objects(row)
+
+
+def test_matches_legacy_transform():
+    expected = legacy_transform(copy.deepcopy(TICKET))
+    transformer = RecordTransformer(expected)
+    assert transformer.transform(copy.deepcopy(TICKET)) == expected
+    assert expected["employee_id"] == "200"
+    assert expected["order_type_id"] == "3"
+    assert expected["totals_nested_deep"] == 1
+    assert expected["tags_1_name"] == "b"
+
+
+def test_drops_unwanted_properties():
+    transformer = RecordTransformer(["id", "totals_tax", "employee_id", "tags_0"])
+    assert transformer.transform(copy.deepcopy(TICKET)) == {
+        "id": "100",
+        "totals_tax": 300,
+        "employee_id": "200",
+        "tags_0": "a",
+    }